@@ -448,6 +448,11 @@ Lime_5 = "\033[38;5;442m"
 Pale_Green_4 = "\033[38;5;443m"
 Deep_Pink_5 = "\033[38;5;444m"
 #-------------------------------------------------------------------------------------
+# وضع غير تفاعلي: python "Tool Decode Itsh.py" decode --mode auto PATH...
+# أو watch DIR... (بدون banner ولا قائمة، نفس python -m itsh_decode)
+if __name__ == "__main__" and sys.argv[1:2] in (["decode"], ["watch"]):
+    from itsh_decode.cli import main as cli_main
+    sys.exit(cli_main(sys.argv[1:]))
 print('-' * 60)
 print('TOOL DECODE ITSH')
 print('-' * 60)
@@ -461,6 +466,7 @@ try:
 except:
     os.system('pip install render')
     os.system('pip install python-cfonts')
+    from cfonts import render, say
 din = render(f'TOOL DECODE ITSH', colors=['red', 'yellow'], align='center')
 a=f'''
                        {din}
@@ -476,286 +482,105 @@ print(f'Decode base64 [5]')
 print(f'Decode zlip_base64_pro [6]')
 print(f'Decode ninjapy [7]')
 print(f'Decode exee(lamed___evel(lamed [8]')
-print(f'Decode bz2 [9]')
+print(f'Decode bz2/gzip/xz/zip/tar (nested) [9]')
 print(f'Decode B__ [10]')
 print(f'Decode marshal_zlib_base64 [11]')
 print(f'Decode base64pro [12]')
+print(f'Decode auto (all schemes) [13]')
+print(f'Watch folder (auto decode new files) [14]')
+print(f'Static fold exec/eval args (no execution) [15]')
 DECODE = input(f'enter numper:      ')
 if DECODE == "1":
-    MAX_LAYERS = 10
-    MAX_FILE_BYTES = 10 * 1024 * 1024  # تجاهل الملفات الأكبر من 10MB افتراضياً
-    MIN_B64_MATCH_LEN = 80
-    def try_b16_rev(data: bytes) -> Optional[bytes]:
-        try:
-            m = re.search(rb"b['\"]([0-9A-Fa-f]+)['\"]", data)
-            if m:
-                hexs = m.group(1)
-            else:
-                m2 = re.search(rb"([0-9A-Fa-f]{64,})", data)
-                hexs = m2.group(1) if m2 else None
-            if not hexs:
-                return None
-            rev = hexs[::-1]
-            return binascii.unhexlify(rev)
-        except Exception:
-            return None
-
-
-    def try_b16(data: bytes) -> Optional[bytes]:
-        try:
-            m = re.search(rb"b['\"]([0-9A-Fa-f]+)['\"]", data)
-            hexs = m.group(1) if m else None
-            if not hexs:
-                m2 = re.search(rb"([0-9A-Fa-f]{64,})", data)
-                hexs = m2.group(1) if m2 else None
-            if not hexs:
-                return None
-            return binascii.unhexlify(hexs)
-        except Exception:
-            return None
-
-
-    def try_base64(data: bytes) -> Optional[bytes]:
-        try:
-            m = re.search(rb"([A-Za-z0-9+/]{%d,}={0,2})" % MIN_B64_MATCH_LEN, data)
-            if not m:
-                return None
-            b64 = m.group(1)
-            return base64.b64decode(b64)
-        except Exception:
-            return None
-
-
-    def try_zlib(data: bytes) -> Optional[bytes]:
-        try:
-            return zlib.decompress(data)
-        except Exception:
-            return None
-
+    from itsh_decode.layered import (MAX_FILE_BYTES, MAX_LAYERS, decode_file_entries, decode_many,
+                                     iter_py_files, readable_path_for_zip)
+    from contextlib import contextmanager
 
-    def try_marshal(data: bytes) -> Optional[Tuple[object, str]]:
-        try:
-            obj = marshal.loads(data)
-            return obj, repr(obj)
-        except Exception:
-            return None
+    from itsh_decode.cache import format_stats, open_cache
+    from itsh_decode.cli import print_telemetry_summary
+    from itsh_decode.similarity import final_layer, format_stats as format_similarity_stats
+    from itsh_decode.similarity import open_index as open_similarity
+    from itsh_decode.sinks import Sink, open_sink, shared_sink
 
 
-    def readable_path_for_zip(input_path: str, root_base: str) -> str:
+    @contextmanager
+    def open_output(spec: str):
         """
-        Returns a relative path used inside the ZIP to avoid absolute paths.
-        root_base is the base folder the user started from (or ''), used to keep structure sensible.
+        Sink for one run: the shared $ITSH_SINK when set, otherwise spec
+        (a .zip path keeps the original DEFLATE archive; dir:/tar:/shards:/
+        sqlite: pick another backend, see itsh_decode.sinks).
         """
-        # make relative if possible
-        try:
-            if root_base:
-                rel = os.path.relpath(input_path, root_base)
-            else:
-                rel = os.path.basename(input_path)
-        except Exception:
-            rel = os.path.basename(input_path)
-        return rel.replace(os.sep, "/")
+        shared = shared_sink()
+        if shared is not None:
+            yield shared
+            return
+        with open_sink(spec) as sink:
+            yield sink
 
 
-    def process_single_file_into_zip(input_path: str, ziph: zipfile.ZipFile, root_base: str = ""):
+    def process_single_file_into_zip(input_path: str, ziph: Sink, root_base: str = ""):
         """
-        Process one file and write all outputs into the open ZipFile handle (ziph).
+        Process one file and write all outputs into the open sink (ziph).
         All entries are created under a directory named after the input file (relative).
         """
-        # safety: skip large files
-        try:
-            st = os.stat(input_path)
-            if st.st_size > MAX_FILE_BYTES:
-                msg = f"[تخطي] {input_path} ({st.st_size} bytes) — أكبر من الحد ({MAX_FILE_BYTES} bytes)."
-                print(msg)
-                # write a small note inside the zip explaining skip
-                rel = readable_path_for_zip(input_path, root_base)
-                note_name = f"{rel}/SKIPPED_size_note.txt"
-                ziph.writestr(note_name, msg.encode("utf-8", errors="ignore"))
-                return
-        except Exception:
-            pass
+        ziph.write_entries(decode_file_entries(input_path, root_base))
 
-        try:
-            with open(input_path, "rb") as f:
-                original = f.read()
-        except Exception as e:
-            err = f"[خطأ] تعذّر قراءة الملف {input_path}: {e}"
-            print(err)
-            rel = readable_path_for_zip(input_path, root_base)
-            ziph.writestr(f"{rel}/ERROR_reading.txt", err)
-            return
-
-        rel = readable_path_for_zip(input_path, root_base)
-        report_lines = []
-        saved_entries = []
-
-        report_lines.append(f"Input file: {input_path}")
-        report_lines.append(f"Size: {len(original)} bytes\n")
-
-        # Save the original (only if not huge) as .original.txt for inspection
-        try:
-            ziph.writestr(f"{rel}/original.bin", original)
-            saved_entries.append(f"{rel}/original.bin")
-        except Exception as e:
-            report_lines.append(f"تعذّر إضافة النسخة الأصلية للأرشيف: {e}")
-
-        current = original
-        layer = 0
-
-        for i in range(MAX_LAYERS):
-            layer += 1
-            report_lines.append(f"\n--- محاولة طبقة {layer} ---")
-            succeeded = False
-
-            # reverse base16
-            res = try_b16_rev(current)
-            if res:
-                report_lines.append(f"وجدت سلسلة base16 محتملة مع عكس. حجم بعد unhex: {len(res)}")
-                # اختبر zlib
-                z = try_zlib(res)
-                if z:
-                    entry_name = f"{rel}/layer{layer:02d}.reverse_base16_then_zlib.bin"
-                    ziph.writestr(entry_name, z)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
-                    current = z
-                    succeeded = True
-                    continue
-                else:
-                    entry_name = f"{rel}/layer{layer:02d}.reverse_base16.bin"
-                    ziph.writestr(entry_name, res)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"حُفظت نتيجة reverse+base16: {entry_name}")
-                    current = res
-                    succeeded = True
-                    continue
-
-            # base16
-            res = try_b16(current)
-            if res:
-                report_lines.append(f"وجدت base16 (بدون عكس). حجم after unhex: {len(res)}")
-                z = try_zlib(res)
-                if z:
-                    entry_name = f"{rel}/layer{layer:02d}.base16_then_zlib.bin"
-                    ziph.writestr(entry_name, z)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
-                    current = z
-                    succeeded = True
-                    continue
-                else:
-                    entry_name = f"{rel}/layer{layer:02d}.base16.bin"
-                    ziph.writestr(entry_name, res)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"حُفظت نتيجة base16: {entry_name}")
-                    current = res
-                    succeeded = True
-                    continue
-
-            # base64
-            res = try_base64(current)
-            if res:
-                report_lines.append(f"وجدت base64. حجم بعد decode: {len(res)}")
-                z = try_zlib(res)
-                if z:
-                    entry_name = f"{rel}/layer{layer:02d}.base64_then_zlib.bin"
-                    ziph.writestr(entry_name, z)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
-                    current = z
-                    succeeded = True
-                    continue
-                else:
-                    entry_name = f"{rel}/layer{layer:02d}.base64.bin"
-                    ziph.writestr(entry_name, res)
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"حُفظت نتيجة base64: {entry_name}")
-                    current = res
-                    succeeded = True
-                    continue
-
-            # zlib directly
-            res = try_zlib(current)
-            if res:
-                entry_name = f"{rel}/layer{layer:02d}.zlib.bin"
-                ziph.writestr(entry_name, res)
-                saved_entries.append(entry_name)
-                report_lines.append(f"نجح zlib مباشرة -> حفظ في: {entry_name} (حجم: {len(res)})")
-                current = res
-                succeeded = True
-                continue
 
-            # marshal.loads attempt (ثابت فقط)
-            mres = try_marshal(current)
-            if mres:
-                obj, reprtext = mres
-                report_lines.append("نجح marshal.loads على البايتات.")
-                if hasattr(obj, "co_code"):
-                    # disassembly text
-                    sio = io.StringIO()
-                    sio.write(f"# disassembly of marshal code object (layer {layer})\n")
-                    try:
-                        for instr in dis.Bytecode(obj):
-                            sio.write(str(instr) + "\n")
-                        dis_text = sio.getvalue()
-                    except Exception as e:
-                        dis_text = f"# فشل الحصول على disassembly: {e}\n{reprtext}\n"
-                    entry_name = f"{rel}/layer{layer:02d}.marshal.dis.txt"
-                    ziph.writestr(entry_name, dis_text.encode("utf-8", errors="ignore"))
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"حُفظت disassembly: {entry_name}")
-                else:
-                    entry_name = f"{rel}/layer{layer:02d}.marshal_repr.txt"
-                    ziph.writestr(entry_name, reprtext.encode("utf-8", errors="ignore"))
-                    saved_entries.append(entry_name)
-                    report_lines.append(f"حُفظ تمثيل marshal: {entry_name}")
-                succeeded = True
-                # لا نغيّر current دائماً بعد marshal (قد يكون تمثيلا مستقلا)
+    def walk_and_process_into_zip(path: str, ziph: Sink, root_base: str = "", workers: int = 1,
+                                  cache_path: Optional[str] = None):
+        """
+        With workers > 1 files are decoded in a process pool; this thread stays
+        the only producer for the sink. A sharded sink compresses each shard
+        on its own thread. With $ITSH_SIMILARITY the final layer of every file
+        is fingerprinted into the cluster index.
+        """
+        similar = open_similarity()
+        for full, entries, err in decode_many(iter_py_files(path, root_base), workers, cache_path):
+            if err is not None:
+                print(f"[خطأ] أثناء معالجة {full}: {err}")
                 continue
+            final = final_layer(entries)
+            if similar is not None and final is not None:
+                similar.add(full, final)
+            ziph.submit(entries)
+
+
+    def pop_workers_arg(argv: List[str]) -> int:
+        """يسحب -j/--workers N من الوسيطات (الافتراضي 1 = بدون توازي)."""
+        workers = 1
+        for flag in ("-j", "--workers"):
+            if flag in argv:
+                i = argv.index(flag)
+                try:
+                    workers = max(1, int(argv[i + 1]))
+                except (IndexError, ValueError):
+                    print(f"قيمة غير صالحة لـ {flag}، سيتم استخدام عامل واحد.")
+                del argv[i:i + 2]
+        return workers
 
-            # لا شيء اكتُشف
-            report_lines.append("لم تُكتَشف أي عملية مفكوك معروفة (base16/reverse/base64/zlib/marshal). التوقف.")
-            break
-
-        # الخاتمة للتقرير
-        report_lines.append("\n=== الخلاصة ===")
-        report_lines.append(f"مجموع الطبقات المحاولة: {layer}")
-        if saved_entries:
-            report_lines.append("المدخلات المخزنة داخل الأرشيف:")
-            for s in saved_entries:
-                report_lines.append("  - " + s)
-        else:
-            report_lines.append("لم يُنتج أي مدخل مفكوك داخل الأرشيف.")
 
-        # احفظ التقرير داخل الأرشيف
-        report_text = "\n".join(report_lines)
-        report_entry = f"{rel}/report.txt"
-        ziph.writestr(report_entry, report_text.encode("utf-8", errors="ignore"))
-        print(f"[إنهاء] عالجت {input_path} -> التقرير داخل: {report_entry}")
+    def pop_cache_arg(argv: List[str]) -> Optional[str]:
+        """يسحب --cache PATH (كاش الطبقات)؛ بدونه يُستخدم ITSH_CACHE إن وُجد."""
+        if "--cache" not in argv:
+            return None
+        i = argv.index("--cache")
+        path = argv[i + 1] if i + 1 < len(argv) else None
+        del argv[i:i + 2]
+        return path
 
 
-    def walk_and_process_into_zip(path: str, ziph: zipfile.ZipFile, root_base: str = ""):
-        if os.path.isfile(path):
-            if path.lower().endswith(".py"):
-                print(f"[بدء] معالجة الملف: {path}")
-                process_single_file_into_zip(path, ziph, root_base)
-            else:
-                print(f"[تخطي] ليس ملف Python: {path}")
-            return
-
-        for root, dirs, files in os.walk(path):
-            for fn in files:
-                if fn.lower().endswith(".py"):
-                    full = os.path.join(root, fn)
-                    print(f"[بدء] معالجة الملف: {full}")
-                    try:
-                        process_single_file_into_zip(full, ziph, root)
-                    except Exception as e:
-                        print(f"[خطأ] أثناء معالجة {full}: {e}")
+    def print_cache_stats(cache_path: Optional[str], since: float = 0.0):
+        cache = open_cache(cache_path)
+        if cache:
+            print(format_stats(cache.stats()))
+        similar = open_similarity()
+        if similar:
+            print(format_similarity_stats(similar.stats()))
+        # أحداث ITSH_TELEMETRY لهذا التشغيل: أي التحويلات والملفات استهلكت الوقت
+        print_telemetry_summary(None, since)
 
 
-    def interactive_loop(default_out_zip: Optional[str] = None):
+    def interactive_loop(default_out_zip: Optional[str] = None, workers: int = 1,
+                         cache_path: Optional[str] = None):
         print("أدخل مسار ملف أو مجلد لتجربة فك التشفير (أدخل 'exit' أو اضغط Enter فارغ للخروج).")
         print("يمكنك أيضاً تمرير اسم أرشيف مخرجات افتراضي عبر الوسيط الثاني عند التشغيل.")
         while True:
@@ -780,22 +605,27 @@ if DECODE == "1":
                 out_zip = f"deobf_results_{base_name}_{timestamp}.zip"
 
             try:
-                with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as ziph:
+                started = time.time()
+                with open_output(out_zip) as ziph:
                     walk_and_process_into_zip(inp, ziph,
-                                              os.path.dirname(os.path.abspath(inp)) if os.path.isdir(inp) else "")
-                print(f"[نجاح] حُفظت النتائج في الأرشيف: {out_zip}\n")
+                                              os.path.dirname(os.path.abspath(inp)) if os.path.isdir(inp) else "",
+                                              workers, cache_path)
+                print(f"[نجاح] حُفظت النتائج في: {ziph!r}\n")
+                print_cache_stats(cache_path, started)
             except Exception as e:
                 print(f"[خطأ] تعذّر إنشاء الأرشيف {out_zip}: {e}")
 
 
     if __name__ == "__main__":
         # معالجة وسيطات سطر الأوامر
+        workers = pop_workers_arg(sys.argv)
+        cache_path = pop_cache_arg(sys.argv)
         if len(sys.argv) >= 2:
             target = sys.argv[1]
             if not os.path.exists(target):
                 print(f"المسار غير موجود: {target}")
                 sys.exit(1)
-            # اسم الأرشيف إن أعطي (وسيط ثانٍ) أو افتراضي برمز زمني
+            # اسم الأرشيف أو sink (وسيط ثانٍ، مثل out.zip أو dir:out/) أو افتراضي برمز زمني
             if len(sys.argv) >= 3:
                 out_zip = sys.argv[2]
             else:
@@ -803,23 +633,32 @@ if DECODE == "1":
                 base = os.path.basename(os.path.abspath(target)) or "results"
                 out_zip = f"deobf_results_{base}_{ts}.zip"
             try:
-                with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as ziph:
+                started = time.time()
+                with open_output(out_zip) as ziph:
                     if os.path.isdir(target):
-                        walk_and_process_into_zip(target, ziph, os.path.dirname(os.path.abspath(target)))
+                        walk_and_process_into_zip(target, ziph, os.path.dirname(os.path.abspath(target)), workers,
+                                                  cache_path)
                     else:
-                        walk_and_process_into_zip(target, ziph, "")
-                print(f"\nتم حفظ الأرشيف: {out_zip}")
+                        walk_and_process_into_zip(target, ziph, "", workers, cache_path)
+                print(f"\nتم حفظ المخرجات: {ziph!r}")
+                print_cache_stats(cache_path, started)
                 sys.exit(0)
             except Exception as e:
                 print(f"فشل إنشاء الأرشيف {out_zip}: {e}")
                 sys.exit(1)
         else:
-            interactive_loop()
+            interactive_loop(workers=workers, cache_path=cache_path)
 
 if DECODE == "2":
+    from itsh_decode.cache import layer_hash, open_cache
+    from itsh_decode.sinks import save_output
+    from itsh_decode.stream import decompress_bounded
+
+
     def deep_decrypt(path, max_layers=1000):
         text = Path(path).read_text(encoding="utf-8", errors="ignore")
         current = text.encode("utf-8", errors="ignore")
+        cache = open_cache()  # ITSH_CACHE
 
         layers = 0
         for layer in range(1, max_layers + 1):
@@ -830,8 +669,15 @@ if DECODE == "2":
                     break
 
                 b64_text = m.group(1).replace(b"\n", b"").replace(b"\r", b"")
-                decoded = base64.b64decode(b64_text)
-                decompressed = zlib.decompress(decoded)
+                key = layer_hash(b64_text) if cache else None
+                hit, decompressed = cache.lookup("b64_zlib", key) if cache else (False, None)
+                if not hit:
+                    decoded = base64.b64decode(b64_text)
+                    decompressed = decompress_bounded("zlib", decoded)
+                    if cache:
+                        cache.store("b64_zlib", key, decompressed)
+                elif decompressed is None:
+                    raise ValueError("فشل فك هذه الطبقة سابقاً (من الكاش)")
                 current = decompressed
                 layers += 1
                 print(f"✅ فكينا طبقة {layers}")
@@ -845,34 +691,28 @@ if DECODE == "2":
         except:
             result = current.decode("latin-1", errors="replace")
 
-        out_file = Path(path).with_suffix(".decoded.py")
-        out_file.write_text(result, encoding="utf-8", errors="replace")
+        out_file = save_output(Path(path).with_suffix(".decoded.py"), result, Path(path).name)
         print(f"\n📦 اكتمل الفك ({layers} طبقة) → الملف النهائي: {out_file}")
 if DECODE == "3":
-    def extract_bytes_from_ast(filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            tree = ast.parse(f.read(), filename=filepath)
+    from itsh_decode import pymarshal
+    from itsh_decode.cache import open_cache
+    from itsh_decode.disasm import disassembly_outputs
+    from itsh_decode.literals import index_file
+    from itsh_decode.nested import walk_code, write_tree
+
 
-        for node in ast.walk(tree):
-            # نبحث عن marshal.loads(...) أو base64.b64decode(...)
-            if isinstance(node, ast.Call):
+    def extract_bytes_from_ast(filepath):
+        # نبحث في فهرس الـ literals عن marshal.loads(...) أو marshal.loads(base64.b64decode(...))
+        for lit in index_file(filepath):
+            try:
                 # الحالة المباشرة: marshal.loads(b'...')
-                if isinstance(node.func, ast.Attribute) and node.func.attr == 'loads':
-                    if node.args:
-                        arg = node.args[0]
-                        # مباشرة: b'...'
-                        if isinstance(arg, ast.Constant) and isinstance(arg.value, bytes):
-                            return arg.value
-                        # مشفر base64: marshal.loads(base64.b64decode("..."))
-                        elif isinstance(arg, ast.Call):
-                            if isinstance(arg.func, ast.Attribute) and arg.func.attr == 'b64decode':
-                                base64_arg = arg.args[0]
-                                if isinstance(base64_arg, ast.Constant):
-                                    base64_str = base64_arg.value
-                                    try:
-                                        return base64.b64decode(base64_str)
-                                    except Exception as e:
-                                        print(f"[!] فشل في فك base64: {e}")
+                if lit.kind == "bytes" and lit.in_call("loads"):
+                    return lit.value()
+                # مشفر base64: marshal.loads(base64.b64decode("..."))
+                if lit.in_call("b64decode") and lit.in_call("loads", 1):
+                    return base64.b64decode(lit.value())
+            except Exception as e:
+                print(f"[!] فشل في فك base64: {e}")
         return None
 
 
@@ -880,16 +720,34 @@ if DECODE == "3":
         try:
             code_obj = marshal.loads(code_bytes)
         except Exception as e:
-            print(f"[!] خطأ في marshal.loads: {e}")
-            return
+            # ربما bytecode من إصدار بايثون آخر: القارئ المستقل عن الإصدار
+            try:
+                code_obj = pymarshal.loads(code_bytes)
+            except Exception:
+                print(f"[!] خطأ في marshal.loads: {e}")
+                return
 
         try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                for instr in dis.Bytecode(code_obj):
-                    f.write(str(instr) + '\n')
-            print(f"[+] تم حفظ التفكيك في: {output_path}")
+            # النص في المسار المطلوب، وتيار التعليمات JSON بجانبه (ITSH_DIS_FORMAT)
+            for name, data in disassembly_outputs(code_obj, os.path.splitext(output_path)[0]):
+                path = output_path if name.endswith(".dis.txt") else name
+                with open(path, 'wb') as f:
+                    f.write(data)
+                print(f"[+] تم حفظ التفكيك في: {path}")
         except Exception as e:
             print(f"[!] خطأ في dis: {e}")
+            return
+
+        write_nested_layers(code_obj, os.path.splitext(output_path)[0])
+
+
+    def write_nested_layers(code_obj, out_stem):
+        """الطبقات المتداخلة في co_consts (exec(marshal.loads(zlib...)) داخل exec...) كشجرة."""
+        tree = walk_code(code_obj, cache=open_cache())
+        if not tree["children"]:
+            return
+        for path in write_tree(tree, out_stem):
+            print(f"[+] طبقة متداخلة: {path}")
 
 
     if __name__ == "__main__":
@@ -910,9 +768,21 @@ if DECODE == "3":
 
         decode_and_dis(code_bytes, out_file)
 if DECODE == "4":
-    def decrypt(encoded_data, key):
+    from itsh_decode.locator import ALNUM, B64, scan_blobs
+    from itsh_decode.sinks import save_output
+    from itsh_decode.xorkey import recover_xor, xor_bytes
+
+    def decrypt(encoded_data, key=None):
+        """key=None: يُسترجَع المفتاح آلياً (بايت واحد أو مفتاح قصير متكرر)."""
         decoded_bytes = base64.b64decode(encoded_data)
-        decrypted = bytes([b ^ key for b in decoded_bytes])
+        if key is None:
+            candidates = recover_xor(decoded_bytes)
+            if not candidates:
+                raise Exception("تعذّر استرجاع مفتاح xor.")
+            best = candidates[0]
+            print(f"[i] المفتاح المسترجع: {best.key!r} (printable={best.printable:.2f}, compile={best.compiles})")
+            return best.plaintext.decode('utf-8', errors='ignore')
+        decrypted = xor_bytes(decoded_bytes, bytes([key]))
         return decrypted.decode('utf-8', errors='ignore')
 
 
@@ -927,21 +797,27 @@ if DECODE == "4":
             with open(path, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            # استخراج المفتاح
+            # استخراج المفتاح (إن لم يوجد يُسترجَع آلياً من البيانات)
+            key = None
             start_key = content.find("_loader_key_stub")
-            if start_key == -1:
-                raise Exception("لم يتم العثور على المفتاح.")
-
-            key_line = content[start_key:].splitlines()[0]
-            key = int(key_line.split("=")[-1].strip())
+            if start_key != -1:
+                key_line = content[start_key:].splitlines()[0]
+                key = int(key_line.split("=")[-1].strip())
+            else:
+                print("[i] لم يتم العثور على المفتاح، سيتم استرجاعه آلياً.")
 
-            # استخراج النص المشفر
+            # استخراج النص المشفر: بين """ أو أطول سلسلة base64 في الملف
             start_enc = content.find('"""')
             end_enc = content.find('"""', start_enc + 3)
-            if start_enc == -1 or end_enc == -1:
-                raise Exception("لم يتم العثور على النص المشفر.")
-
-            encoded_data = content[start_enc + 3:end_enc].strip()
+            if start_enc != -1 and end_enc != -1:
+                encoded_data = content[start_enc + 3:end_enc].strip()
+            else:
+                raw = content.encode('utf-8')
+                index = scan_blobs(raw)
+                run = index.longest((ALNUM, B64), min_len=16)
+                if run is None:
+                    raise Exception("لم يتم العثور على النص المشفر.")
+                encoded_data = index.text(run).decode('ascii')
 
             # فك التشفير
             decoded = decrypt(encoded_data, key)
@@ -949,10 +825,8 @@ if DECODE == "4":
             print("\n[✓] تم فك التشفير بنجاح:\n")
             print(decoded)
 
-            with open("decrypted_output.py", "w", encoding="utf-8") as out:
-                out.write(decoded)
-
-            print("\n[✓] تم حفظ الناتج في: decrypted_output.py")
+            out_path = save_output("decrypted_output.py", decoded, os.path.basename(path))
+            print(f"\n[✓] تم حفظ الناتج في: {out_path}")
 
         except Exception as e:
             print(f"[!] حدث خطأ أثناء فك التشفير: {e}")
@@ -961,59 +835,59 @@ if DECODE == "4":
     if __name__ == "__main__":
         main()
 if DECODE == "5":
-    def brute_decode_exec_base64(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            code = f.read()
+    from itsh_decode.literals import index_file
+    from itsh_decode.sinks import save_output
 
-        # البحث يدويًا عن أول b64 مشفّر داخل exec
-        start = code.find("exec(base64.b64decode(b'")
-        if start == -1:
-            print("❌ لم يتم العثور على exec(base64.b64decode(b'...'))")
-            return
 
-        # تحديد بداية ونهاية سلسلة base64
-        start_b64 = code.find("b'", start) + 2
-        end_b64 = code.find("')", start_b64)
-        if start_b64 == -1 or end_b64 == -1:
-            print("❌ لم يتم تحديد سلسلة base64 بشكل صحيح.")
+    def brute_decode_exec_base64(path):
+        # أول literal مشفّر داخل exec(base64.b64decode(...)) من فهرس الـ literals
+        found = [lit for lit in index_file(path).select(call="b64decode") if lit.in_call("exec", 1)]
+        if not found:
+            print("❌ لم يتم العثور على exec(base64.b64decode(b'...'))")
             return
 
-        b64_string = code[start_b64:end_b64]
-
         try:
-            decoded_code = base64.b64decode(b64_string).decode('utf-8', errors='replace')
+            decoded_code = base64.b64decode(found[0].value()).decode('utf-8', errors='replace')
         except Exception as e:
             print("❌ فشل في فك التشفير:", e)
             return
 
-        output_path = path.replace(".py", "_decoded.py")
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(decoded_code)
+        output_path = save_output(path.replace(".py", "_decoded.py"), decoded_code, os.path.basename(path))
 
         print(f"✅ تم فك التشفير بنجاح.\n📄 الملف الناتج: {output_path}")
 
 
     # مثال التشغيل:
-    brute_decode_exec_base64 = input("حط مسار : ")
+    brute_decode_exec_base64(input("حط مسار : ").strip())
 if DECODE == "6":
-    def try_decode_layer(data):
+    from itsh_decode.cache import NOT_CACHED, open_cache
+    from itsh_decode.literals import index_literals
+    from itsh_decode.sinks import save_output
+    from itsh_decode.limits import DecompressionLimit
+    from itsh_decode.stream import decompress_bounded
+
+
+    def _b64_zlib(data: bytes):
         try:
-            return zlib.decompress(base64.b64decode(data)).decode(errors='ignore')
+            return decompress_bounded("zlib", base64.b64decode(data))
+        except DecompressionLimit as e:
+            print(f"⚠️ أُوقف فك الطبقة عند حد فك الضغط: {e}")
+            return NOT_CACHED  # حد أعلى قد ينجح: لا يُخزَّن كفشل في الكاش
         except Exception:
             return None
 
 
+    def try_decode_layer(data):
+        cache = open_cache()  # ITSH_CACHE
+        raw = data.encode("latin-1", errors="ignore")
+        out = cache.memo("b64_zlib", _b64_zlib, raw) if cache else _b64_zlib(raw)
+        return out.decode(errors='ignore') if isinstance(out, bytes) else None
+
+
     def extract_encoded_from_exec(content):
-        try:
-            # نعزل الجزء داخل exec(...)
-            start = content.find("b64decode(")
-            if start == -1:
-                return None
-            start_quote = content.find("'", start)
-            end_quote = content.find("'", start_quote + 1)
-            return content[start_quote + 1:end_quote]
-        except:
-            return None
+        # أول literal داخل b64decode(...) في هذه الطبقة
+        found = index_literals(content).select(call="b64decode")
+        return found[0].compact() if found else None
 
 
     def full_decode(path):
@@ -1040,9 +914,8 @@ if DECODE == "6":
                 return
 
             output_name = "decode_" + os.path.basename(path)
-            output_path = os.path.join(os.path.dirname(path), output_name)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            output_path = save_output(os.path.join(os.path.dirname(path), output_name), content,
+                                      os.path.basename(path))
 
             print(f"\n📁 الملف النهائي المفكوك: {output_path}")
 
@@ -1054,34 +927,40 @@ if DECODE == "6":
     path = input("📂 eeأدخل مسار الملف المشفر: ").strip()
     full_decode(path)
 if DECODE == "7":
+    from itsh_decode.limits import DecompressionLimit
+    from itsh_decode.literals import index_file
+    from itsh_decode.sinks import save_output
+    from itsh_decode.stream import decompress_bounded
+
+
     def extract_and_decode(filepath, decode_loops=50):
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
+            index = index_file(filepath)
         except Exception as e:
             print(f"❌ خطأ في فتح الملف: {e}")
             return
 
         # استخراج السلسلة من المتغير C
-        match = re.search(r'C\s*=\s*["\'](.+?)["\']', content, re.DOTALL)
-        if not match:
+        literal = index.assigned("C")
+        if literal is None:
             print("❌ لم يتم العثور على المتغير C في الملف.")
             return
 
-        encoded = match.group(1)
+        encoded = literal.compact()
 
         try:
             for _ in range(decode_loops):
-                encoded = zlib.decompress(base64.b64decode(encoded))
+                encoded = decompress_bounded("zlib", base64.b64decode(encoded))
+        except DecompressionLimit as e:
+            print(f"❌ أُوقف الفك عند حد فك الضغط: {e}")
+            return
         except Exception as e:
             print(f"❌ خطأ أثناء فك التشفير: {e}")
             return
 
         # حفظ النتيجة في ملف جديد
-        output_path = "decoded_output.py"
         try:
-            with open(output_path, 'wb') as out_file:
-                out_file.write(encoded)
+            output_path = save_output("decoded_output.py", encoded, os.path.basename(filepath))
             print(f"✅ تم حفظ الكود المفكوك في: {output_path}")
         except Exception as e:
             print(f"❌ تعذر حفظ الملف: {e}")
@@ -1095,26 +974,35 @@ if DECODE == "7":
         else:
             extract_and_decode(path)
 if DECODE == "8":
-    def فك_تشفير(المسار):
+    from itsh_decode.limits import DecompressionLimit
+    from itsh_decode.literals import index_file
+    from itsh_decode.sinks import save_output
+    from itsh_decode.stream import decompress_bounded
+
+
+    def فك_zlib(literal):
         try:
-            # قراءة محتوى الملف
-            محتوى = Path(المسار).read_text(encoding="utf-8")
+            return decompress_bounded("zlib", literal.value())
+        except DecompressionLimit:
+            raise
+        except Exception:
+            return None
 
-            # نمط محدد بناءً على طريقة التشفير المستخدمة في الملف
-            نمط = re.search(r"\(b'(.*?)'\s*,compile\)", محتوى, re.DOTALL)
-            if not نمط:
+
+    def فك_تشفير(المسار):
+        try:
+            # literals الـ bytes داخل استدعاء (exec((...)(b'...'),compile) وأشباهه)، الأطول أولاً
+            مرشحات = sorted((lit for lit in index_file(المسار).select(kind="bytes") if lit.calls),
+                            key=lambda lit: len(lit.body), reverse=True)
+            بيانات = next((ناتج for ناتج in map(فك_zlib, مرشحات) if ناتج is not None), None)
+            if بيانات is None:
                 print("❌ لم يتم العثور على بيانات مشفرة.")
                 return
 
-            # تحويل النص المشفر إلى بايتات
-            بيانات = نمط.group(1).encode('utf-8').decode('unicode_escape').encode('latin1')
-
-            # فك الضغط
-            كود = zlib.decompress(بيانات).decode('utf-8')
+            كود = بيانات.decode('utf-8')
 
             # حفظ الناتج
-            اسم_الملف = "مفكوك_" + Path(المسار).stem + ".py"
-            Path(اسم_الملف).write_text(كود, encoding="utf-8")
+            اسم_الملف = save_output("مفكوك_" + Path(المسار).stem + ".py", كود, Path(المسار).name)
             print(f"✅ تم فك التشفير وحفظه في: {اسم_الملف}")
 
         except Exception as e:
@@ -1126,38 +1014,44 @@ if DECODE == "8":
         مسار = input("📂 yueأدخل مسار الملف المشفر: ").strip()
         فك_تشفير(مسار)
 if DECODE == "9":
-    def decompress_bz2_file(input_path, output_path=None):
+    from itsh_decode.unpack import format_result, unpack
+
+
+    def decompress_file(input_path, out_dir=None):
+        """
+        فك أي حاوية ضغط (gzip/bz2/xz/lzma/zlib/zip/tar) وكل ما بداخلها من حاويات
+        متداخلة، على دفعات مباشرة إلى القرص (النوع من الـ magic bytes لا من الامتداد).
+        """
         if not os.path.exists(input_path):
             print(f"[!] الملف غير موجود: {input_path}")
             return
 
         try:
-            # قراءة الملف المضغوط
-            with open(input_path, "rb") as f:
-                compressed_data = f.read()
-
-            # فك الضغط
-            decompressed_data = bz2.decompress(compressed_data)
-
-            # تحديد المسار للملف الناتج
-            if not output_path:
-                output_path = input_path.replace(".bz2", "")
-
-            # كتابة البيانات المفكوكة
-            with open(output_path, "wb") as f:
-                f.write(decompressed_data)
-
-            print(f"[+] تم فك الضغط بنجاح: {output_path}")
-
+            leaves = unpack(input_path, out_dir)
         except Exception as e:
             print(f"[!] حدث خطأ أثناء فك الضغط: {e}")
+            return
+
+        if not leaves:
+            print(f"[!] لم يُتعرّف على الملف كملف مضغوط (gzip/bz2/xz/lzma/zlib/zip/tar): {input_path}")
+            return
+        print(format_result(leaves))
+        truncated = sum(1 for leaf in leaves if leaf.truncated)
+        if truncated:
+            print(f"[!] {truncated} ناتج أُوقف عند حد فك الضغط؛ الناتج الجزئي مبتور.")
+        print(f"[+] تم فك الضغط بنجاح: {len(leaves)} ملف")
 
 
     if __name__ == "__main__":
-        input_file = input("ادخل مسار ملف BZ2: ").strip()
-        decompress_bz2_file(input_file)
+        input_file = input("ادخل مسار الملف المضغوط (gz/bz2/xz/zip/tar...): ").strip()
+        decompress_file(input_file)
 
 if DECODE == "10":
+    from itsh_decode.candidates import b64_decode, evaluate, first_success_mode
+    from itsh_decode.literals import index_file
+    from itsh_decode.payloads import format_stats as format_index_stats, open_index
+    from itsh_decode.unpack import unzip
+
     # ----- إعداد اللوج (سيُعاد تهيئته عند التشغيل التلقائي لكتابة لملف) -----
     logger = logging.getLogger("unpack_obf")
     logger.setLevel(logging.INFO)
@@ -1165,35 +1059,23 @@ if DECODE == "10":
     _console_handler.setFormatter(logging.Formatter("%(message)s"))
     logger.addHandler(_console_handler)
 
-    # ----- تعابير منتظمة للبحث عن blobs -----
-    BASE64_RE = re.compile(
-        r"""(?P<quote>['"]{1,3})                # opening quote (1..3)
-        (?P<data>(?:[A-Za-z0-9+/=\s\r\n]{200,})) # big base64-like blob (>=200 chars)
-        (?P=quote)""",
-        re.VERBOSE,
-    )
-
-    VAR_ASSIGN_RE = re.compile(
-        r"""(?P<var>[A-Za-z_][A-Za-z0-9_]*)\s*=\s*(?P<quote>['"]{1,3})(?P<data>[A-Za-z0-9+/=\s\r\n]{200,})(?P=quote)""",
-        re.VERBOSE,
-    )
-
-
-    def find_blobs(text: str) -> List[Tuple[str, Optional[str], str]]:
-        """جمع كل الـ blobs المحتملة (نوع, var, data)"""
-        results = []
-        for m in VAR_ASSIGN_RE.finditer(text):
-            results.append(("var", m.group("var"), m.group("data")))
-        for m in BASE64_RE.finditer(text):
-            results.append(("blob", None, m.group("data")))
-        seen = set()
+    # أقصر literal يُعدّ blob (أحرف base64 فقط)
+    MIN_BLOB_CHARS = 200
+
+
+    def find_blobs(index) -> List[Tuple[str, Optional[str], str]]:
+        """جمع كل الـ blobs المحتملة (نوع, var, data) من فهرس الـ literals"""
         out = []
-        for t, v, b in results:
-            key = (v, b[:80])
+        seen = set()
+        for lit in index.select(min_b64=1.0):
+            if len(lit.body) < MIN_BLOB_CHARS:
+                continue
+            b = lit.compact()
+            key = (lit.name, b[:80])
             if key in seen:
                 continue
             seen.add(key)
-            out.append((t, v, b))
+            out.append(("var" if lit.name else "blob", lit.name, b))
         return out
 
 
@@ -1219,17 +1101,18 @@ if DECODE == "10":
 
 
     def extract_zip(byts: bytes, outdir: str) -> Tuple[bool, Optional[str]]:
-        td = tempfile.mkdtemp(prefix="unpack_obf_")
-        p = os.path.join(td, "payload.zip")
-        write_file(p, byts)
+        """من الذاكرة مباشرة، الأعضاء بالتوازي، و zip المتداخل في نفس المرور (ضمن حدود limits)."""
         try:
-            with zipfile.ZipFile(p, "r") as z:
-                z.extractall(outdir)
-            shutil.rmtree(td, ignore_errors=True)
-            return True, None
+            res = unzip(byts, outdir)
         except Exception as e:
-            shutil.rmtree(td, ignore_errors=True)
             return False, str(e)
+        for name, reason in res.skipped:
+            logger.info("  -> تخطّيت %s: %s", name, reason)
+        truncated = sum(1 for _, cut in res.files if cut)
+        if truncated:
+            logger.info("  -> %d عضو أُوقف عند حد فك الضغط (مبتور).", truncated)
+        logger.info("  -> %d ملف مستخرج.", len(res.files))
+        return True, None
 
 
     # ----- واجهات أداة المساعدة -----
@@ -1244,22 +1127,30 @@ if DECODE == "10":
             print(f"الملف '{user_path}' غير موجود. جرّب مسار صحيح أو اكتب q للخروج.\n")
 
 
-    def process_file(fp: str, out_base: Optional[str] = None, keep_raw: bool = False, do_run: bool = False) -> None:
+    def process_file(fp: str, out_base: Optional[str] = None, keep_raw: bool = False, do_run: bool = False,
+                     first: bool = False) -> None:
         logger.info(f"فتح الملف: {fp}")
-        with open(fp, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
-
-        blobs = find_blobs(text)
+        blobs = find_blobs(index_file(fp))
         if not blobs:
             logger.info("ما لَقيت أيّ blob شبيهة بـ base64 داخل الملف.")
             return
 
-        logger.info(f"وجدت {len(blobs)} محتمل(ة). سأجرب فك كل واحدة بالترتيب.")
+        logger.info(f"وجدت {len(blobs)} محتمل(ة). سأفكها بالتوازي، الأرجح أولاً.")
         base_out = out_base or os.path.join(os.getcwd(), f"unpacked_{os.path.splitext(os.path.basename(fp))[0]}")
-        for idx, (typ, var, blob) in enumerate(blobs, 1):
+        # مع $ITSH_PAYLOAD_INDEX: كل blob يُفك مرة واحدة عبر كل الملفات
+        index = open_index()
+        labels = [var or f"{typ}_{idx}" for idx, (typ, var, _) in enumerate(blobs, 1)]
+        outcomes = evaluate([blob for _, _, blob in blobs], b64_decode, first_success=first,
+                            accept=lambda outcome: outcome.found and is_zip(outcome.output),
+                            index=index, path=fp, labels=labels)
+        for outcome in outcomes:
+            idx = outcome.index + 1
+            typ, var, blob = blobs[outcome.index]
             logger.info("-" * 60)
             logger.info(f"[{idx}] type={typ} var={var or '-'} size_text={len(blob)}")
-            decoded = try_decode(blob)
+            if outcome.reused:
+                logger.info(f"  -> نفس الـ payload مفكوك سابقاً ({outcome.key[:16]}، {len(index.files_for(outcome.key))} ملف)")
+            decoded = outcome.output if outcome.found else None
             if decoded is None:
                 logger.info("  -> فشل فك base64 لهذه القطعة.")
                 continue
@@ -1300,6 +1191,8 @@ if DECODE == "10":
                         logger.error("خطأ عند محاولة التشغيل: %s", e)
                 else:
                     logger.info("لم أجد main.py في المجلد لاشغاله.")
+        if open_index() is not None:
+            logger.info(format_index_stats(open_index().stats()))
         logger.info("انتهى الفحص.")
 
 
@@ -1311,6 +1204,8 @@ if DECODE == "10":
         parser.add_argument("--run", action="store_true",
                             help="تشغيل main.py داخل المجلد المستخرج بعد الاستخراج (خطر!)")
         parser.add_argument("--keep-raw", action="store_true", help="حفظ البايتات المفكوكة كملف raw إذا لم تكن zip")
+        parser.add_argument("--first", action="store_true", default=first_success_mode(),
+                            help="التوقف عند أول payload من نوع ZIP وإلغاء باقي الـ blobs ($ITSH_FIRST_SUCCESS)")
         args = parser.parse_args(argv)
 
         if args.path:
@@ -1325,7 +1220,7 @@ if DECODE == "10":
                 sys.exit(0)
             fp = chosen
 
-        process_file(fp, out_base=args.out, keep_raw=args.keep_raw, do_run=args.run)
+        process_file(fp, out_base=args.out, keep_raw=args.keep_raw, do_run=args.run, first=args.first)
 
 
     # ----- تشغيل تلقائي غير تفاعلي عند الاستيراد إذا DECODE == "10" -----
@@ -1405,53 +1300,45 @@ if DECODE == "11":
     import base64
     import zlib
     import marshal
-    import dis
     import sys
     import importlib.util
     import time
     from pathlib import Path
 
-    B64_PATTERN = re.compile(
-        r"base64\.b64decode\(\s*(?:b'([^']+)'|b\"([^\"]+)\")\s*\)", re.DOTALL
-    )
+    from itsh_decode import disasm, pymarshal
+    from itsh_decode.cache import open_cache
+    from itsh_decode.candidates import b64_zlib, first_accepted
+    from itsh_decode.literals import index_file
+    from itsh_decode.nested import walk_code, write_tree
+    from itsh_decode.payloads import open_index
 
 
-    def find_b64_strings(text):
-        candidates = []
-        for m in B64_PATTERN.finditer(text):
-            s = m.group(1) or m.group(2)
-            if s:
-                s_clean = "".join(s.split())
-                candidates.append(s_clean)
-        return candidates
+    def find_b64_strings(index):
+        # literals الـ bytes داخل base64.b64decode(...) من فهرس الـ literals
+        return [lit.compact() for lit in index.select(kind="bytes", call="b64decode") if lit.body]
 
 
-    def try_decode(b64_text):
+    def load_code(decompressed):
         try:
-            decoded = base64.b64decode(b64_text)
+            return marshal.loads(decompressed)
         except Exception as e:
-            raise RuntimeError(f"base64 decode failed: {e}")
-        try:
-            decompressed = zlib.decompress(decoded)
-        except Exception as e:
-            raise RuntimeError(f"zlib decompress failed: {e}")
-        try:
-            code_obj = marshal.loads(decompressed)
-        except Exception as e:
-            raise RuntimeError(f"marshal.loads failed: {e}")
-        return code_obj
+            try:
+                return pymarshal.loads(decompressed)
+            except Exception:
+                raise RuntimeError(f"marshal.loads failed: {e}")
 
 
-    def write_disassembly(code_obj, out_path):
+    def write_disassembly(code_obj, out_stem):
+        """<out_stem>.dis.txt و/أو <out_stem>.dis.json لكل code objects المتداخلة؛ يرجع المسارات."""
+        header = "# Disassembly output (do NOT execute blindly)\n\n"
+        if pymarshal.is_code(code_obj):
+            return disasm.write_disassembly(code_obj, str(out_stem), header=header)
+        out_path = f"{out_stem}.dis.txt"
         with open(out_path, "w", encoding="utf-8") as f:
-            f.write("# Disassembly output (do NOT execute blindly)\n\n")
-            if isinstance(code_obj, type((lambda: 0).__code__)):
-                dis_out = dis.Bytecode(code_obj)
-                for instr in dis_out:
-                    f.write(str(instr) + "\n")
-            else:
-                f.write("# Returned object is not a code object. repr:\n")
-                f.write(repr(code_obj))
+            f.write(header)
+            f.write("# Returned object is not a code object. repr:\n")
+            f.write(repr(code_obj))
+        return [out_path]
 
 
     def write_pyc(code_obj, pyc_path):
@@ -1486,25 +1373,52 @@ if DECODE == "11":
             print("خطأ: المسار غير موجود:", src_path, file=sys.stderr)
             sys.exit(2)
 
-        text = src_path.read_text(encoding="utf-8", errors="ignore")
-        candidates = find_b64_strings(text)
+        candidates = find_b64_strings(index_file(str(src_path)))
         if not candidates:
             print("لم أجد نمط base64.b64decode(...) داخل الملف. تأكد أن الملف يحتوي على b'...'.", file=sys.stderr)
             sys.exit(3)
 
         last_err = None
         out_stem = Path(out_name)
-        for i, c in enumerate(candidates, start=1):
+        codes = {}
+
+        def accept(outcome):
+            # base64->zlib في عمليات الـ pool؛ marshal هنا لأن code objects لا تنتقل بين العمليات
+            nonlocal last_err
+            i = outcome.index + 1
+            if not outcome.found:
+                last_err = "base64/zlib failed"
+                print(f"المرشح #{i} فشل: {last_err}")
+                return False
+            try:
+                codes[outcome.index] = load_code(outcome.output)
+                return True
+            except Exception as e:
+                last_err = e
+                print(f"المرشح #{i} فشل: {e}")
+                return False
+
+        print(f"تقييم {len(candidates)} مرشح بالتوازي (الأرجح أولاً) ...")
+        winner = first_accepted(candidates, b64_zlib, accept, index=open_index(),
+                                path=str(src_path.resolve()), labels=["b64decode"] * len(candidates))
+        if winner is not None:
+            i = winner.index + 1
             try:
-                print(f"محاولة فك المرشح #{i} ...")
-                code_obj = try_decode(c)
-                dis_path = out_stem.with_suffix(".dis.txt")
+                print(f"نجح المرشح #{i}.")
+                code_obj = codes[winner.index]
                 pyc_path = out_stem.with_suffix(".pyc")
-                write_disassembly(code_obj, dis_path)
-                write_pyc(code_obj, pyc_path)
+                dis_paths = write_disassembly(code_obj, out_stem.with_suffix(""))
                 print("نجحت! الملفات التالية تم انتاجها:")
-                print(" - disassembly:", dis_path.resolve())
-                print(" - pyc file:", pyc_path.resolve())
+                for dis_path in dis_paths:
+                    print(" - disassembly:", Path(dis_path).resolve())
+                # code object من إصدار آخر لا يُعاد كتابته بـ marshal المفسّر
+                if not isinstance(code_obj, pymarshal.Code):
+                    write_pyc(code_obj, pyc_path)
+                    print(" - pyc file:", pyc_path.resolve())
+                if pymarshal.is_code(code_obj):
+                    tree = walk_code(code_obj, cache=open_cache())
+                    if tree["children"]:
+                        print(" - nested layers:", len(write_tree(tree, str(out_stem))) - 1)
                 print("\nتحذير: لا تقم بتشغيل (exec) المحتوى المنتَج دون فحصه يدوياً.")
                 return
             except Exception as e:
@@ -1521,9 +1435,13 @@ if DECODE == "11":
 
         _auto_run_if_requested_noninteractive()
 if DECODE == "12":
+    from functools import partial
+
+    from itsh_decode.candidates import evaluate, first_success_mode, reverse_b64_chain
+    from itsh_decode.engine import is_python_source
+    from itsh_decode.literals import index_file
+    from itsh_decode.payloads import open_index
 
-    # Patterns for quoted strings (single/double/triple)
-    QUOTED_RE = re.compile(r"('{3}.*?'{3}|\"{3}.*?\"{3}|'[^']*'|\"[^\"]*\")", re.DOTALL)
     BASE64_CHARS = re.compile(r"[A-Za-z0-9+/=]+")
 
 
@@ -1552,17 +1470,11 @@ if DECODE == "12":
             return default
 
 
-    def gather_string_literals(text):
-        # returns list of (start, end, inner_content)
-        items = []
-        for m in QUOTED_RE.finditer(text):
-            token = m.group(0)
-            if token.startswith(("'''", "\"\"\"")):
-                inner = token[3:-3]
-            else:
-                inner = token[1:-1]
-            items.append((m.start(), m.end(), inner))
-        return items
+    def gather_string_literals(index, min_len=0):
+        # yields (start, end, inner_content) from the literal index; inner is None below min_len
+        for lit in index:
+            inner = lit.body.decode("latin1") if len(lit.body) >= min_len else None
+            yield lit.start, lit.end, inner
 
 
     def is_b64_like(s, min_len=200):
@@ -1571,56 +1483,45 @@ if DECODE == "12":
         return len(only) >= min_len, only
 
 
-    def try_decode_reversed(b64_like_bytes):
-        try:
-            # input is str of base64 chars -> encode then reverse
-            rev = b64_like_bytes[::-1].encode('latin1', errors='surrogatepass')
-            return base64.b64decode(rev)
-        except Exception:
-            return None
-
-
-    def decode_candidates(text, max_layers=20):
-        literals = gather_string_literals(text)
-        candidates = []
+    def decode_candidates(index, max_layers=20, src_path=""):
+        # index: فهرس الـ literals للملف
+        literals = gather_string_literals(index, min_len=200)
         # check each literal if it looks like base64 (long)
+        picked = []
         for i, (st, ed, inner) in enumerate(literals):
+            if inner is None:
+                continue
             ok, only = is_b64_like(inner, min_len=200)
-            if not ok:
+            if ok:
+                picked.append((i, st, ed, only))
+        verdicts = {}
+
+        def is_source(outcome):
+            if outcome.index not in verdicts:
+                verdicts[outcome.index] = outcome.found and is_python_source(outcome.output)
+            return verdicts[outcome.index]
+
+        # الفك في pool، الأرجح أولاً؛ مع $ITSH_FIRST_SUCCESS أول مصدر بايثون صالح ينهي الباقي.
+        # مع $ITSH_PAYLOAD_INDEX: كل literal يُفك مرة واحدة عبر كل الملفات
+        first = first_success_mode()
+        candidates = []
+        winner = None
+        for outcome in evaluate([only for _, _, _, only in picked], partial(reverse_b64_chain, max_layers=max_layers),
+                                accept=is_source, first_success=first, reverse=True, index=open_index(),
+                                path=src_path, labels=[f"literal{i}" for i, _, _, _ in picked]):
+            if outcome.output is None:
                 continue
-            # try iterative decoding: reverse -> b64decode -> if result contains another literal, continue
-            current = only  # only base64-like chars
-            layers = 0
-            last = None
-            while layers < max_layers:
-                dec = try_decode_reversed(current)
-                if dec is None:
-                    break
-                layers += 1
-                last = dec
-                # try find quoted literal inside decoded text to continue
-                try:
-                    decoded_text = dec.decode('utf-8', errors='replace')
-                except:
-                    decoded_text = None
-                if decoded_text:
-                    inner_matches = QUOTED_RE.search(decoded_text)
-                    if inner_matches:
-                        # take inner content of first quoted match and extract only base64-like chars
-                        token = inner_matches.group(0)
-                        if token.startswith(("'''", "\"\"\"")):
-                            inner2 = token[3:-3]
-                        else:
-                            inner2 = token[1:-1]
-                        ok2, only2 = is_b64_like(inner2, min_len=40)  # smaller threshold now
-                        if ok2:
-                            current = only2
-                            continue
-                break
-            if last is not None:
-                candidates.append({'index': i, 'start': st, 'end': ed, 'layers': layers, 'bytes': last})
+            i, st, ed, _ = picked[outcome.index]
+            cand = {'index': i, 'start': st, 'end': ed, 'layers': outcome.chain.count("reverse_base64"),
+                    'bytes': outcome.output}
+            candidates.append(cand)
+            if first and is_source(outcome):
+                winner = cand
         # sort by layers desc then length
         candidates.sort(key=lambda x: (x['layers'], len(x['bytes'] or b"")), reverse=True)
+        if winner is not None:
+            candidates.remove(winner)
+            candidates.insert(0, winner)
         return candidates
 
 
@@ -1629,11 +1530,11 @@ if DECODE == "12":
         infile = prompt_input_path()
         max_layers = prompt_max_layers(20)
         try:
-            text = infile.read_text(errors='surrogatepass')
-        except Exception as e:
+            candidates = decode_candidates(index_file(str(infile)), max_layers=max_layers,
+                                           src_path=str(infile.resolve()))
+        except OSError as e:
             print("خطأ بقراءة الملف:", e)
             sys.exit(2)
-        candidates = decode_candidates(text, max_layers=max_layers)
         if not candidates:
             print("ما لقيت سلاسل base64 مناسبة للفك.")
             sys.exit(1)
@@ -1659,4 +1560,92 @@ if DECODE == "12":
     if __name__ == '__main__':
         main()
     else:
-        _auto_run_if_requested_noninteractive()
\ No newline at end of file
+        _auto_run_if_requested_noninteractive()
+
+if DECODE == "13":
+    from itsh_decode import decode_file, write_result
+    from itsh_decode.cache import format_stats, open_cache
+    from itsh_decode.cli import print_similarity_stats, print_telemetry_summary
+    from itsh_decode.output import render_value
+    from itsh_decode.similarity import open_index as open_similarity
+    from itsh_decode.telemetry import open_telemetry
+
+
+    def auto_decode_path(path: str):
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = [os.path.join(root, fn) for root, _, fns in os.walk(path)
+                     for fn in fns if fn.lower().endswith(".py") and ".auto_decoded" not in fn]
+        cache = open_cache()  # ITSH_CACHE
+        telemetry = open_telemetry()  # ITSH_TELEMETRY
+        similar = open_similarity()  # ITSH_SIMILARITY
+        started = time.time()
+        for fp in files:
+            try:
+                res = decode_file(fp, cache=cache, telemetry=telemetry)
+            except Exception as e:
+                print(f"❌ {fp}: {e}")
+                continue
+            if not res["chain"]:
+                print(f"[تخطي] {fp}: لم تُكتشف أي طبقة مشفّرة.")
+                continue
+            out_path = write_result(res, fp)
+            mark = "✅" if res["ok"] else "⚠️"
+            family = f" [عائلة {similar.add(fp, render_value(res))[1]}]" if similar else ""
+            print(f"{mark} {fp}: {' -> '.join(res['chain'])} ({res['kind']}) → {out_path}{family}")
+        if cache:
+            print(format_stats(cache.stats()))
+        print_similarity_stats(similar)
+        print_telemetry_summary(None, started)
+
+
+    if __name__ == "__main__":
+        target = input("📂 أدخل مسار ملف أو مجلد: ").strip()
+        if not os.path.exists(target):
+            print(f"المسار غير موجود: {target}")
+        else:
+            auto_decode_path(target)
+if DECODE == "14":
+    from itsh_decode.watch import watch
+
+
+    if __name__ == "__main__":
+        target = input("📂 أدخل مسار المجلد المراقَب: ").strip()
+        if not os.path.isdir(target):
+            print(f"المجلد غير موجود: {target}")
+        else:
+            out_dir = input("📁 مجلد المخرجات [watch_out]: ").strip() or "watch_out"
+            # ITSH_CACHE / ITSH_TELEMETRY تُقرأ داخل عمليات الفك
+            watch([target], out_dir, workers=os.cpu_count() or 1)
+if DECODE == "15":
+    from itsh_decode.cli import iter_inputs
+    from itsh_decode.fold import fold_source, write_folded
+
+
+    def fold_path(path: str):
+        """وسائط exec/eval/compile/marshal.loads تُحسب من الـ AST بدون تشغيل العينة."""
+        files = found = 0
+        for fp in iter_inputs([path]):
+            files += 1
+            try:
+                with open(fp, "rb") as f:
+                    results = fold_source(f.read())
+            except OSError as e:
+                print(f"❌ {fp}: {e}")
+                continue
+            if not results:
+                print(f"[تخطي] {fp}: لا يوجد exec/eval بوسيط ثابت.")
+                continue
+            found += len(results)
+            for res, out in zip(results, write_folded(fp, results)):
+                print(f"✅ {fp}:{res.lineno} {res.sink} → {out}")
+        print(f"طُوي {found} وسيط من {files} ملف.")
+
+
+    if __name__ == "__main__":
+        target = input("📂 أدخل مسار ملف أو مجلد: ").strip()
+        if not os.path.exists(target):
+            print(f"المسار غير موجود: {target}")
+        else:
+            fold_path(target)
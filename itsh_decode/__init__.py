@@ -0,0 +1,35 @@
+"""
+itsh_decode
+مكتبة الفك المشتركة لأداة Tool Decode Itsh.
+
+الاستيراد بلا أي أثر جانبي: لا طباعة ولا إدخال، والوحدات الفرعية (ومعها
+zlib/bz2/lzma/sqlite3...) لا تُحمَّل إلا عند أول استخدام لاسم منها.
+"""
+
+from importlib import import_module
+
+_LAZY = {
+    "decode_bytes": ".engine",
+    "decode_file": ".engine",
+    "TRANSFORMS": ".transforms",
+    "collect_hints": ".transforms",
+    "write_result": ".output",
+    "walk_code": ".nested",
+    "fold_source": ".fold",
+    "index_literals": ".literals",
+}
+
+__all__ = ["decode_bytes", "decode_file", "TRANSFORMS", "collect_hints", "write_result", "walk_code", "fold_source",
+           "index_literals"]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,226 @@
+"""
+bench.py
+قياس سرعة الفك: MB/s و calls/s لكل تحويل في transforms.TRANSFORMS، و MB/s
+و layers/s لكل نقطة دخول (المحرّك، الخيار 1، الفك المتدفّق، ودوال فك الخيارات
+10/11/12) على عينات corpus.py. المخطط الذي لا تفكه نقطة دخول يُطبع بلا layers/s.
+
+    python -m itsh_decode.bench --sizes 1K,1M
+    python -m itsh_decode.bench --corpus samples/ --entry engine,layered -r 5 --json bench.json
+
+كل رقم هو أفضل زمن من --repeat محاولة، حتى لا يطغى ضجيج النظام على المقارنة.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import bz2
+import json
+import lzma
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+from contextlib import redirect_stdout
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .corpus import DEFAULT_LAYERS, escape_bytes, generate, load_manifest, make_source, parse_size
+
+DEFAULT_SIZES = "1K,64K,1M"
+DEFAULT_REPEAT = 3
+
+
+def best_time(fn: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    """(أفضل زمن, ناتج آخر استدعاء)."""
+    best, out = float("inf"), None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def transform_inputs(source: bytes) -> Dict[str, Tuple[bytes, dict]]:
+    """(input, hints) لكل تحويل، مبنية من نفس المصدر حتى تنجح كلها."""
+    from .xorkey import xor_bytes
+
+    packed = zlib.compress(source)
+    escaped = escape_bytes(packed)
+    return {
+        "zlib": (packed, {}),
+        "bz2": (bz2.compress(source), {}),
+        "lzma": (lzma.compress(source), {}),
+        "marshal": (marshal.dumps(compile(source, "<bench>", "exec")), {}),
+        "base64": (b"exec(b64decode(b'" + base64.b64encode(packed) + b"'))", {}),
+        "base16": (b"exec(unhexlify(b'" + binascii.hexlify(packed) + b"'))", {}),
+        "literal": (b"exec(decompress(b'" + escaped + b"'))", {}),
+        "reverse": (base64.b64encode(packed)[::-1], {}),
+        "xor": (xor_bytes(source, b"\x5a"), {"xor_keys": []}),
+    }
+
+
+def bench_transforms(sizes: List[int], repeat: int) -> List[dict]:
+    from .transforms import TRANSFORMS
+
+    rows = []
+    for size in sizes:
+        for name, (data, hints) in transform_inputs(make_source(size)).items():
+            seconds, out = best_time(lambda: TRANSFORMS[name](data, hints), repeat)
+            rows.append({"kind": "transform", "name": name, "size": len(data), "seconds": seconds,
+                         "ok": bool(out), "mb_s": len(data) / seconds / 1e6, "calls_s": 1 / seconds})
+    return rows
+
+
+def _engine(path: str) -> int:
+    from .engine import decode_file
+
+    return len(decode_file(path)["chain"])
+
+
+def _layered(path: str) -> int:
+    from .layered import decode_file_entries, write_entries
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        entries = decode_file_entries(path)
+    # مدخلات المسار (ملفات كبيرة) تُنظَّف كما يفعل كاتب الأرشيف
+    with tempfile.TemporaryFile() as tmp:
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as z:
+            write_entries(z, entries)
+    return sum(1 for name, _ in entries if name.rsplit("/", 1)[-1].startswith("layer"))
+
+
+def _stream(path: str) -> int:
+    from .stream import stream_decode_layers
+
+    workdir, layers = stream_decode_layers(path, 64)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return len(layers)
+
+
+def _is_marshal(output: bytes) -> bool:
+    from . import pymarshal
+
+    try:
+        marshal.loads(output)
+    except Exception:
+        try:
+            pymarshal.loads(output)
+        except Exception:
+            return False
+    return True
+
+
+def _option(name: str, path: str) -> int:
+    # دوال فك الخيارات 10/11/12 على كل كتلة في الملف كما تشغّلها القائمة: أكبر عدد طبقات لناتج مقبول
+    from . import candidates
+    from .payloads import Limited, iter_blobs, normalize
+
+    decode, accept, steps = {
+        # (دالة الفك, قبول الناتج كما في القائمة, عدد خطوات السلسلة لكل طبقة)
+        "option10": (candidates.b64_decode, lambda out: out.startswith(b"PK\x03\x04"), 1),
+        "option11": (candidates.b64_zlib, _is_marshal, 2),
+        "option12": (candidates.reverse_b64_chain, bool, 1),
+    }[name]
+    with open(path, "rb") as f:
+        data = f.read()
+    best = 0
+    for _, text in iter_blobs(data):
+        res = candidates._call(decode, normalize(text))
+        if res is None or isinstance(res, Limited) or not accept(res[1]):
+            continue
+        best = max(best, len(res[0].split("->")) // steps)
+    return best
+
+
+ENTRY_POINTS: Dict[str, Callable[[str], int]] = {
+    "engine": _engine,
+    "layered": _layered,
+    "stream": _stream,
+    "option10": partial(_option, "option10"),
+    "option11": partial(_option, "option11"),
+    "option12": partial(_option, "option12"),
+}
+
+
+def bench_entries(manifest: List[dict], entries: List[str], repeat: int) -> List[dict]:
+    rows = []
+    for row in manifest:
+        for name in entries:
+            try:
+                seconds, layers = best_time(lambda: ENTRY_POINTS[name](row["path"]), repeat)
+            except Exception as e:
+                rows.append({"kind": "entry", "name": name, "scheme": row["scheme"], "size": row["sample_size"],
+                             "error": str(e)})
+                continue
+            # مخطط لا تفكه نقطة الدخول: زمنها زمن الرفض، فلا معنى لـ layers/s (None)
+            rows.append({"kind": "entry", "name": name, "scheme": row["scheme"], "size": row["sample_size"],
+                         "seconds": seconds, "layers": layers, "expected_layers": row["layers"],
+                         "mb_s": row["sample_size"] / seconds / 1e6,
+                         "layers_s": layers / seconds if layers else None})
+    return rows
+
+
+def format_rows(rows: List[dict]) -> str:
+    lines = []
+    for r in rows:
+        if r["kind"] == "transform":
+            lines.append(f"transform {r['name']:<10} {r['size']:>11} B  {r['mb_s']:9.2f} MB/s  "
+                         f"{r['calls_s']:10.1f} calls/s  {'ok' if r['ok'] else 'FAIL'}")
+        elif "error" in r:
+            lines.append(f"entry     {r['name']:<10} {r['scheme']:<17} {r['size']:>11} B  error: {r['error']}")
+        elif r["layers_s"] is None:
+            lines.append(f"entry     {r['name']:<10} {r['scheme']:<17} {r['size']:>11} B  {'-':>9} MB/s  "
+                         f"{'-':>9} layers/s  (not decoded, {r['seconds'] * 1e3:.1f} ms)")
+        else:
+            lines.append(f"entry     {r['name']:<10} {r['scheme']:<17} {r['size']:>11} B  {r['mb_s']:9.2f} MB/s  "
+                         f"{r['layers_s']:9.1f} layers/s  ({r['layers']}/{r['expected_layers']} layers)")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.bench", description="decoder throughput benchmark")
+    parser.add_argument("--corpus", help="existing corpus.py output folder (default: generate a temporary one)")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"plaintext sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--layers", type=int, default=DEFAULT_LAYERS)
+    parser.add_argument("--entry", default=",".join(ENTRY_POINTS), help="entry points to time")
+    parser.add_argument("--no-transforms", action="store_true", help="skip per-transform timings")
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--json", help="also write all rows to this JSON file")
+    args = parser.parse_args(argv)
+
+    entries = [e for e in args.entry.split(",") if e]
+    unknown = [e for e in entries if e not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"unknown entry point: {', '.join(unknown)}")
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+
+    tmp = None
+    if args.corpus:
+        manifest = load_manifest(args.corpus)
+    else:
+        tmp = tempfile.mkdtemp(prefix="itsh_bench_")
+        manifest = generate(tmp, sizes, layers=args.layers)
+    try:
+        rows = [] if args.no_transforms else bench_transforms(sizes, args.repeat)
+        if rows:
+            print(format_rows(rows))
+        entry_rows = bench_entries(manifest, entries, args.repeat)
+        print(format_rows(entry_rows))
+        rows += entry_rows
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+cache.py
+كاش على القرص (SQLite) يربط sha256 كل طبقة وسيطة بالتحويل المطبّق عليها
+وناتجه، حتى لا تُعاد خطوات base64/zlib/... على نفس الطبقات بين العينات
+أو بين التشغيلات.
+
+يُفعَّل بتمرير مسار قاعدة البيانات (أو عبر متغير البيئة ITSH_CACHE).
+عرض الإحصائيات:
+    python -m itsh_decode.cache path/to/cache.sqlite
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+CACHE_ENV = "ITSH_CACHE"
+CACHE_MAX_ENV = "ITSH_CACHE_MAX_MB"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+# ناتج أكبر من هذا لا يُخزَّن إطلاقاً ويُعاد فكه في كل مرة: علامة "نجح" بلا ناتج
+# ستقرؤها lookup فشلاً (child=None)، والفشل نفسه (child=None) يُخزَّن دائماً
+MAX_ENTRY_BYTES = 64 * 1024 * 1024
+EVICT_EVERY = 256
+# يرجعه fn في memo لنتيجة لا تُخزَّن: خطوة أوقفها حد فك الضغط قد تنجح بحد أعلى
+NOT_CACHED = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS layers (
+    layer_hash TEXT NOT NULL,
+    transform TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    child BLOB,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (layer_hash, transform)
+);
+CREATE INDEX IF NOT EXISTS layers_last_used ON layers (last_used);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats VALUES ('hits', 0), ('misses', 0), ('evicted', 0);
+"""
+
+
+def layer_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class DecodeCache:
+    """
+    Content-addressed cache: (sha256(layer), transform) -> child bytes or a
+    stored negative result. Entries are evicted least-recently-used once the
+    stored child bytes exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            env = os.environ.get(CACHE_MAX_ENV)
+            max_bytes = int(env) * 1024 * 1024 if env else DEFAULT_MAX_BYTES
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._stored = 0
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def lookup(self, transform: str, key: str) -> Tuple[bool, Optional[bytes]]:
+        """(hit, child). child=None مع hit=True يعني أن التحويل فشل سابقاً."""
+        row = self.db.execute("SELECT found, child FROM layers WHERE layer_hash=? AND transform=?",
+                              (key, transform)).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self.db.execute("UPDATE layers SET last_used=? WHERE layer_hash=? AND transform=?",
+                        (time.time(), key, transform))
+        return True, row[1] if row[0] else None
+
+    def store(self, transform: str, key: str, child: Optional[bytes]) -> None:
+        if child is not None and len(child) > MAX_ENTRY_BYTES:
+            return
+        size = len(child) if child is not None else 0
+        self.db.execute("INSERT OR REPLACE INTO layers VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, transform, int(child is not None), child, size, time.time()))
+        self._stored += 1
+        if self._stored % EVICT_EVERY == 0:
+            self.evict()
+
+    def memo(self, transform: str, fn: Callable[[bytes], Optional[bytes]], data: bytes,
+             key: Optional[str] = None) -> Optional[bytes]:
+        """fn(data) مع الكاش: عند وجود النتيجة لا يُعاد الفك. NOT_CACHED من fn يرجع None دون تخزين."""
+        key = key or layer_hash(data)
+        hit, child = self.lookup(transform, key)
+        if hit:
+            return child
+        child = fn(data)
+        if child is NOT_CACHED:
+            return None
+        self.store(transform, key, child if isinstance(child, bytes) else None)
+        return child
+
+    def total_bytes(self) -> int:
+        return self.db.execute("SELECT COALESCE(SUM(size), 0) FROM layers").fetchone()[0]
+
+    def evict(self) -> int:
+        """يحذف الأقدم استخداماً حتى يصبح الحجم ضمن max_bytes. يرجع عدد المحذوف."""
+        total = self.total_bytes()
+        removed = 0
+        while total > self.max_bytes:
+            rows = self.db.execute("SELECT rowid, size FROM layers ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for rowid, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.db.execute("DELETE FROM layers WHERE rowid=?", (rowid,))
+                total -= size
+                removed += 1
+        if removed:
+            self.db.execute("UPDATE stats SET value=value+? WHERE name='evicted'", (removed,))
+        return removed
+
+    def flush(self) -> None:
+        """يضيف عدّادات hit/miss لهذه العملية إلى المجاميع المحفوظة."""
+        if self.hits or self.misses:
+            self.db.execute("UPDATE stats SET value=value+? WHERE name='hits'", (self.hits,))
+            self.db.execute("UPDATE stats SET value=value+? WHERE name='misses'", (self.misses,))
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        self.flush()
+        out = dict(self.db.execute("SELECT name, value FROM stats").fetchall())
+        out["entries"] = self.db.execute("SELECT COUNT(*) FROM layers").fetchone()[0]
+        out["bytes"] = self.total_bytes()
+        return out
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+
+_OPEN: Dict[str, DecodeCache] = {}
+
+
+def open_cache(path: Optional[str] = None) -> Optional[DecodeCache]:
+    """
+    Cache for path (or $ITSH_CACHE), opened once per process so worker
+    processes each get their own connection. None when caching is off.
+    """
+    path = path or os.environ.get(CACHE_ENV)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path not in _OPEN:
+        _OPEN[path] = DecodeCache(path)
+    return _OPEN[path]
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    lookups = stats["hits"] + stats["misses"]
+    ratio = 100.0 * stats["hits"] / lookups if lookups else 0.0
+    return (f"كاش الطبقات: hits={stats['hits']} misses={stats['misses']} ({ratio:.1f}% hit) "
+            f"entries={stats['entries']} size={stats['bytes'] / 1e6:.1f}MB evicted={stats['evicted']}")
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.environ.get(CACHE_ENV)
+    if not target or not os.path.exists(target):
+        print("استخدام: python -m itsh_decode.cache <cache.sqlite>")
+        sys.exit(1)
+    print(format_stats(DecodeCache(target).stats()))
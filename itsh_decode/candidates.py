@@ -0,0 +1,257 @@
+"""
+candidates.py
+تقييم مرشحي الـ blobs في الخيارات 10 و11 و12 بالتوازي. قبل أي فك كامل
+يُعطى كل مرشح درجة رخيصة (طول السلسلة وما تبدأ به أول بايتات بعد فك 64 حرفاً
+فقط: zlib/zip/marshal/...)، فتُجرَّب المرشحات الأرجح أولاً في pool من
+العمليات. في وضع "أول نتيجة جيدة تفوز" يُلغى باقي العمل فور قبول نتيجة.
+
+دوال الفك هنا (b64_decode، b64_zlib، reverse_b64_chain) على مستوى الوحدة
+حتى تُرسل إلى عمليات الـ pool، وبنفس شكل payloads.DecodeFn:
+fn(normalized_blob) -> (chain, output) أو None.
+
+    ITSH_CANDIDATE_WORKERS  عدد العمليات (الافتراضي os.cpu_count())
+    ITSH_FIRST_SUCCESS=1    أول نتيجة مقبولة تنهي التقييم (الخياران 10 و12)
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import math
+import os
+import re
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .classify import header_kind
+from .limits import DecompressionLimit
+from .payloads import DecodeFn, Limited, PayloadIndex, decoder_name, normalize
+from .stream import decompress_bounded
+
+WORKERS_ENV = "ITSH_CANDIDATE_WORKERS"
+FIRST_SUCCESS_ENV = "ITSH_FIRST_SUCCESS"
+PEEK_CHARS = 64
+# أقل من هذا (مجموع أحجام المرشحات) لا يستحق تكلفة تشغيل pool
+INLINE_BYTES = 256 * 1024
+_B64_ONLY = re.compile(rb"[^A-Za-z0-9+/=]")
+_QUOTED_RE = re.compile(r"('{3}.*?'{3}|\"{3}.*?\"{3}|'[^']*'|\"[^\"]*\")", re.DOTALL)
+_BASE64_CHARS = re.compile(r"[A-Za-z0-9+/=]+")
+# أولوية الترويسة بعد الفك الجزئي
+_HEADER_SCORE = {"zlib": 3.0, "zip": 3.0, "bz2": 3.0, "lzma": 3.0, "marshal": 1.5}
+
+
+class Outcome(NamedTuple):
+    index: int          # موضع المرشح في القائمة الأصلية
+    found: bool
+    chain: str
+    output: Optional[bytes]
+    reused: bool        # من فهرس الـ payloads بدون فك
+    key: str = ""       # مفتاح الفهرس (sha256) إن وُجد فهرس
+
+
+def workers_from_env() -> int:
+    value = os.environ.get(WORKERS_ENV)
+    return max(1, int(value)) if value else (os.cpu_count() or 1)
+
+
+def first_success_mode() -> bool:
+    return os.environ.get(FIRST_SUCCESS_ENV, "") not in ("", "0")
+
+
+def peek(blob: Union[str, bytes], reverse: bool = False) -> bytes:
+    """أول بايتات ناتج فك base64 للـ blob (أو لمعكوسه) من أول PEEK_CHARS حرفاً فقط."""
+    chars = blob[-PEEK_CHARS * 2:][::-1] if reverse else blob[:PEEK_CHARS * 2]
+    if isinstance(chars, str):
+        chars = chars.encode("latin-1", errors="ignore")
+    chars = _B64_ONLY.sub(b"", chars)[:PEEK_CHARS]
+    try:
+        return binascii.a2b_base64(chars[:len(chars) - len(chars) % 4])
+    except (binascii.Error, ValueError):
+        return b""
+
+
+def score(blob: Union[str, bytes], reverse: bool = False) -> float:
+    """
+    Cheap priority of a candidate blob: a recognised container or marshal
+    header in its first decoded bytes, or printable text (another encoded
+    layer), ranks above anything else; length breaks ties.
+    """
+    head = peek(blob, reverse)
+    kind = header_kind(head)
+    value = _HEADER_SCORE.get(kind, 0.0)
+    if not value and head and all(32 <= b < 127 or b in b"\t\r\n" for b in head):
+        value = 2.0
+    return value + math.log2(len(blob) + 1) / 64
+
+
+def b64_decode(data: bytes) -> Optional[Tuple[str, bytes]]:
+    """الخيار 10: base64 (صارم ثم متسامح)."""
+    try:
+        return "base64", base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        try:
+            return "base64", base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            return None
+
+
+def b64_zlib(data: bytes) -> Optional[Tuple[str, bytes]]:
+    """الخيار 11: base64 ثم zlib ضمن حدود limits."""
+    return "base64->zlib", decompress_bounded("zlib", base64.b64decode(data))
+
+
+def try_decode_reversed(b64_like: str) -> Optional[bytes]:
+    try:
+        # input is str of base64 chars -> encode then reverse
+        return base64.b64decode(b64_like[::-1].encode("latin1", errors="surrogatepass"))
+    except Exception:
+        return None
+
+
+def decode_reversed_layers(only: str, max_layers: int = 20) -> Tuple[int, Optional[bytes]]:
+    """
+    الخيار 12: reverse ثم b64decode، ويتكرر ما دام الناتج يحوي literal شبيهاً
+    بـ base64 (عتبة 40 حرفاً). يرجع (عدد الطبقات، آخر ناتج).
+    """
+    current = only
+    layers = 0
+    last = None
+    while layers < max_layers:
+        dec = try_decode_reversed(current)
+        if dec is None:
+            break
+        layers += 1
+        last = dec
+        inner = _QUOTED_RE.search(dec.decode("utf-8", errors="replace"))
+        if inner:
+            token = inner.group(0)
+            inner2 = token[3:-3] if token.startswith(("'''", '"""')) else token[1:-1]
+            only2 = "".join(_BASE64_CHARS.findall(inner2))
+            if len(only2) >= 40:
+                current = only2
+                continue
+        break
+    return layers, last
+
+
+def reverse_b64_chain(data: bytes, max_layers: int = 20) -> Optional[Tuple[str, bytes]]:
+    layers, last = decode_reversed_layers(data.decode("latin1"), max_layers)
+    return ("->".join(["reverse_base64"] * layers), last) if last is not None else None
+
+
+def _call(decode: DecodeFn, data: bytes):
+    # حد فك الضغط ليس فشلاً: Limited لا يُسجَّل في الفهرس فيُعاد بحدود أعلى
+    try:
+        return decode(data)
+    except DecompressionLimit as e:
+        return Limited(str(e))
+    except Exception:
+        return None
+
+
+def evaluate(blobs: Sequence[Union[str, bytes]], decode: DecodeFn, accept: Optional[Callable[[Outcome], bool]] = None,
+             first_success: bool = False, reverse: bool = False, workers: Optional[int] = None,
+             index: Optional[PayloadIndex] = None, path: str = "",
+             labels: Optional[Sequence[str]] = None) -> Iterator[Outcome]:
+    """
+    Decode every blob with decode (a module-level DecodeFn so it can run in
+    a worker process), highest score() first, and yield an Outcome for each
+    as it completes. accept(outcome) decides what counts as a good result
+    (default: found). With first_success the first accepted outcome is the
+    last one yielded and queued work is cancelled; breaking out of the loop
+    has the same effect. Blobs already in the payload index are answered
+    from it without decoding. Small inputs are decoded inline.
+    """
+    accept = accept or (lambda outcome: outcome.found)
+    # الدرجة من أول الـ blob فقط؛ التطبيع (نسخة كاملة) يتأجل حتى يُجرَّب المرشح فعلاً
+    order = sorted(range(len(blobs)), key=lambda i: score(blobs[i], reverse), reverse=True)
+    keys: Dict[int, str] = {}
+    sizes: Dict[int, int] = {}
+    # نفس الـ blob أكثر من مرة في الدفعة: يُفك مرة واحدة والبقية تأخذ نتيجته
+    copies: Dict[str, List[int]] = {}
+    decoder = decoder_name(decode)
+
+    def finish(i: int, res) -> List[Outcome]:
+        if index is None:
+            found = res is not None and not isinstance(res, Limited)
+            chain, output = res if found else ("", None)
+            return [Outcome(i, found, chain, output, False)]
+        p = index.record(keys[i], sizes[i], res, decoder)
+        same = copies.pop(p.key, [])
+        index.reused += len(same)
+        return [Outcome(i, p.found, p.chain, p.output, False, p.key)] + \
+            [Outcome(j, p.found, p.chain, p.output, True, p.key) for j in same]
+
+    todo = []
+    for i in order:
+        if index is not None:
+            data = normalize(blobs[i])
+            sizes[i] = len(data)
+            keys[i], payload = index.lookup(data, path, labels[i] if labels else f"blob{i}", decoder)
+            if payload is not None:
+                outcome = Outcome(i, payload.found, payload.chain, payload.output, True, payload.key)
+                yield outcome
+                if first_success and accept(outcome):
+                    return
+                continue
+            if keys[i] in copies:
+                copies[keys[i]].append(i)
+                continue
+            copies[keys[i]] = []
+        todo.append(i)
+
+    workers = workers or workers_from_env()
+    if workers <= 1 or len(todo) <= 1 or sum(len(blobs[i]) for i in todo) < INLINE_BYTES:
+        for i in todo:
+            for outcome in finish(i, _call(decode, normalize(blobs[i]))):
+                yield outcome
+                if first_success and accept(outcome):
+                    return
+        return
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # عدد محدود قيد التنفيذ: الإلغاء يوفّر الباقي، والـ blobs لا تُنسخ كلها دفعة واحدة
+        queue = iter(todo)
+        running: Dict[Future, int] = {}
+
+        def refill() -> None:
+            for i in queue:
+                running[pool.submit(_call, decode, normalize(blobs[i]))] = i
+                if len(running) >= workers * 2:
+                    break
+
+        refill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                for outcome in finish(running.pop(fut), fut.result()):
+                    yield outcome
+                    if first_success and accept(outcome):
+                        return
+            refill()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def first_accepted(blobs: Sequence[str], decode: DecodeFn,
+                   accept: Optional[Callable[[Outcome], bool]] = None, **kwargs) -> Optional[Outcome]:
+    """The first accepted Outcome of evaluate(..., first_success=True), or None."""
+    accept = accept or (lambda outcome: outcome.found)
+    verdicts: Dict[int, bool] = {}
+
+    def once(outcome: Outcome) -> bool:
+        # accept قد يكون مكلفاً (marshal.loads، compile): مرة واحدة لكل مرشح
+        if outcome.index not in verdicts:
+            verdicts[outcome.index] = accept(outcome)
+        return verdicts[outcome.index]
+
+    for outcome in evaluate(blobs, decode, once, first_success=True, **kwargs):
+        if once(outcome):
+            return outcome
+    return None
+
+
+def evaluate_all(blobs: Sequence[str], decode: DecodeFn, **kwargs) -> List[Outcome]:
+    """Every Outcome of evaluate(), back in the original blob order."""
+    return sorted(evaluate(blobs, decode, **kwargs), key=lambda outcome: outcome.index)
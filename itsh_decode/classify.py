@@ -0,0 +1,123 @@
+"""
+classify.py
+مصنّف سريع يختار التحويل التالي بدل تجربة كل التحويلات بالترتيب.
+
+يفحص بايتات الترويسة (zlib 78 xx، BZh، \\xfd7zXZ، PK\\x03\\x04، أكواد أنواع
+marshal)، ونسبة الأحرف المطبوعة والانتروبيا، وفهرس الـ blobs، ثم يرتّب
+التحويلات المرجّح نجاحها. كل قرار يحمل زمنه حتى يمكن قياس التوفير.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .fold import has_sink
+from .locator import ALNUM, B64, B64URL, ESCAPED, HEX, BlobIndex, scan_blobs
+
+ENTROPY_SAMPLE = 16 * 1024
+MIN_B64_LEN = 80
+MIN_HEX_LEN = 64
+
+_PRINTABLE = bytes(range(32, 127)) + b"\t\r\n"
+# أكواد أنواع marshal الصالحة كبايت أول (مع أو بدون FLAG_REF = 0x80)
+_MARSHAL_TYPES = frozenset(b"0NFTS.iIfgxylst([{><cu?RraA)zZ")
+
+
+def entropy(data: bytes) -> float:
+    if not data:
+        return 0.0
+    n = len(data)
+    return -sum(c / n * math.log2(c / n) for c in Counter(data).values())
+
+
+def header_kind(head: bytes) -> Optional[str]:
+    """نوع الحاوية من البايتات الأولى، أو None."""
+    if len(head) >= 2 and head[0] & 0x0F == 8 and head[0] >> 4 <= 7 and (head[0] * 256 + head[1]) % 31 == 0:
+        return "zlib"
+    if head.startswith(b"BZh"):
+        return "bz2"
+    if head.startswith(b"\xfd7zXZ\x00") or head.startswith(b"\x5d\x00\x00"):
+        return "lzma"
+    if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06"):
+        return "zip"
+    if head[:1] and head[0] & 0x7F in _MARSHAL_TYPES:
+        return "marshal"
+    return None
+
+
+def sniff(data: bytes, index: Optional[BlobIndex] = None) -> Dict[str, object]:
+    """الخصائص التي يبني عليها المصنّف قراره."""
+    sample = data[:ENTROPY_SAMPLE]
+    printable = 1.0 - len(sample.translate(None, _PRINTABLE)) / len(sample) if sample else 0.0
+    index = index if index is not None else scan_blobs(data)
+    longest_hex = index.longest((HEX,))
+    longest_b64 = index.longest((HEX, ALNUM, B64, B64URL))
+    return {
+        "header": header_kind(data[:8]),
+        "printable": printable,
+        "entropy": entropy(sample),
+        "hex_len": longest_hex.end - longest_hex.start if longest_hex else 0,
+        "quoted_hex": index.first((HEX,), quoted=True) is not None,
+        "b64_len": longest_b64.end - longest_b64.start if longest_b64 else 0,
+        "escaped": index.first((ESCAPED,)) is not None,
+        # مصدر فيه exec/eval/marshal.loads: وسيطه قد يُطوى ثابتاً (fold.py)
+        "sink": printable >= 0.9 and has_sink(data),
+    }
+
+
+def rank_transforms(data: bytes, index: Optional[BlobIndex] = None,
+                    hints: Optional[dict] = None) -> Dict[str, object]:
+    """
+    Rank the transforms that can plausibly succeed on data, best first.
+    Returns {"ranked": [(name, score), ...], "features": {...}, "elapsed": s}.
+    Transforms that are not listed are expected to fail and can be skipped.
+    """
+    t0 = time.perf_counter()
+    f = sniff(data, index)
+    ranked: List[Tuple[str, float]] = []
+
+    header = f["header"]
+    if header in ("zlib", "bz2", "lzma"):
+        ranked.append((header, 1.0))
+    if header == "marshal":
+        # كود code object (c / 0xe3) أرجح بكثير من باقي الأنواع
+        ranked.append(("marshal", 0.9 if data[0] & 0x7F == ord("c") else 0.3))
+    if header == "zip":
+        ranked.append(("zip", 0.9))
+
+    if f["sink"]:
+        ranked.append(("fold", 0.85))
+    # سلاسل hex/base64 الطويلة شبه مستحيلة عشوائياً في بايتات ثنائية، فلا نشترط نصاً مطبوعاً
+    if f["escaped"]:
+        ranked.append(("literal", 0.8))
+    if f["hex_len"] >= MIN_HEX_LEN or f["quoted_hex"]:
+        ranked.append(("base16", 0.7))
+    if f["b64_len"] >= MIN_B64_LEN:
+        ranked.append(("base64", 0.7 if f["b64_len"] > f["hex_len"] else 0.5))
+    if f["hex_len"] >= MIN_HEX_LEN or f["b64_len"] >= MIN_B64_LEN:
+        ranked.append(("reverse", 0.2))
+    if header not in ("zlib", "bz2", "lzma", "zip"):
+        payload = f["escaped"] or f["hex_len"] >= MIN_HEX_LEN or f["b64_len"] >= MIN_B64_LEN
+        if hints and hints.get("xor_keys"):
+            # بلا ترويسة حاوية معروفة: مرشّح لـ xor، وأرجح إن لم يكن نصاً مطبوعاً
+            ranked.append(("xor", 0.6 if f["printable"] < 0.75 else 0.3))
+        elif not payload and not f["sink"]:
+            # بلا تلميح: بايتات لا تحمل blob ولا ترويسة → استرجاع المفتاح آلياً
+            ranked.append(("xor", 0.25))
+
+    ranked.sort(key=lambda item: item[1], reverse=True)
+    return {"ranked": ranked, "features": f, "elapsed": time.perf_counter() - t0}
+
+
+def new_stats() -> Dict[str, float]:
+    return {"decisions": 0, "seconds": 0.0, "tried": 0, "skipped": 0}
+
+
+def record(stats: Dict[str, float], decision: Dict[str, object], tried: int, skipped: int) -> None:
+    stats["decisions"] += 1
+    stats["seconds"] += decision["elapsed"]
+    stats["tried"] += tried
+    stats["skipped"] += skipped
@@ -0,0 +1,294 @@
+"""
+cli.py
+واجهة سطر أوامر غير تفاعلية لمكتبة الفك، للاستخدام في السكربتات والـ pipelines:
+
+    python -m itsh_decode decode --mode auto PATH...
+    python -m itsh_decode decode --mode zlib-b64 --out decoded/ a.py b.py
+    python -m itsh_decode decode --mode layered --out layers.zip -j 4 samples/
+    python -m itsh_decode decode --mmap --out found/ memory.dmp
+    python -m itsh_decode watch drops/ --out watch_out/ -j 4
+    python -m itsh_decode filter < obf.py > decoded.py
+    find samples -name '*.py' -print0 | python -m itsh_decode filter -0 > results.jsonl
+
+لكل ملف يُطبع سطر واحد على stdout مفصول بـ tab:
+    status<TAB>path<TAB>chain<TAB>kind<TAB>output
+status هي ok أو partial أو truncated أو skip أو error. truncated تعني أن خطوة
+فك ضغط أوقفتها حدود --max-output-mb / --max-ratio (انظر limits.py).
+مع --mmap (أو تلقائياً للملفات الضخمة) يُطبع سطر لكل blob مفكوك بدل سطر
+للملف، ومساره يحمل موضعه مثل memory@1f00.dmp (انظر mapped.py).
+رمز الخروج 0 إذا لم يفشل أي ملف. الأمر watch يعمل باستمرار (انظر watch.py)،
+والأمر filter يقرأ من stdin ويكتب على stdout فقط (انظر pipe.py).
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# كل وضع = مجموعة التحويلات المسموح بها في المحرّك (None = الكل)
+MODES: Dict[str, Optional[Tuple[str, ...]]] = {
+    "auto": None,
+    "zlib-b64": ("base64", "zlib"),
+    "b16": ("base16", "reverse", "zlib"),
+    "marshal": ("base64", "base16", "literal", "zlib", "marshal"),
+    "bz2": ("base64", "bz2"),
+    "lzma": ("base64", "lzma"),
+    "xor": ("base64", "xor"),
+    "zip": ("base64", "zip"),
+    "literal": ("literal", "zlib", "bz2", "lzma"),
+    "layered": None,  # نفس مخرجات الخيار 1 (أرشيف ZIP لكل الطبقات)
+}
+
+
+def iter_inputs(paths: List[str]) -> Iterator[str]:
+    """الملفات المعطاة كما هي، وملفات .py داخل المجلدات (بدون مخرجات سابقة)."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, _, files in os.walk(path):
+            for fn in sorted(files):
+                if fn.lower().endswith(".py") and ".auto_decoded" not in fn:
+                    yield os.path.join(root, fn)
+
+
+def _emit(status: str, path: str, chain: str = "", kind: str = "", out: str = "", file=None) -> None:
+    print("\t".join((status, path, chain, kind, out)), file=file or sys.stdout, flush=True)
+
+
+def run_engine(args: argparse.Namespace) -> int:
+    from .cache import open_cache
+    from .engine import decode_file
+    from .mapped import decode_mapped, use_mmap
+    from .telemetry import open_telemetry
+    from .output import output_path_for, render_value, result_status, write_result
+    from .similarity import open_index as open_similarity
+    from .sinks import open_sink, shared_sink
+    from .transforms import TRANSFORMS
+
+    names = MODES[args.mode]
+    transforms = TRANSFORMS if names is None else {n: TRANSFORMS[n] for n in names}
+    cache = open_cache(args.cache)
+    telemetry = open_telemetry(args.telemetry)
+    # مع --sink / $ITSH_SINK تُجمع كل المخرجات في sink واحد بدل الكتابة بجانب كل ملف
+    sink = open_sink(args.sink) if args.sink else shared_sink()
+    similar = open_similarity(args.similarity)
+    failed = 0
+
+    def report(res: dict, fp: str) -> None:
+        chain = "->".join(res["chain"])
+        status = result_status(res)
+        if status == "truncated":
+            _emit(status, fp, chain, res["kind"], "; ".join(res["aborted"]))
+            return
+        if status == "skip":
+            _emit(status, fp)
+            return
+        if similar is not None:
+            similar.add(fp, render_value(res))
+        if args.dry_run:
+            out_path = "-"
+        elif sink is not None:
+            out_path = f"{sink!r}/" + sink.write(os.path.basename(output_path_for(res, fp)), render_value(res))
+        else:
+            out_path = write_result(res, fp, args.out)
+        _emit(status, fp, chain, res["kind"], out_path)
+
+    for fp in iter_inputs(args.paths):
+        try:
+            if use_mmap(fp, args.mmap):
+                # ملف ضخم: كل blob يُفك وحده من mmap، سطر لكل blob (المسار يحمل الموضع)
+                found = False
+                for res in decode_mapped(fp, transforms=transforms, cache=cache, telemetry=telemetry):
+                    found = True
+                    report(res, res["path"])
+                if not found:
+                    _emit("skip", fp)
+                continue
+            res = decode_file(fp, transforms=transforms, cache=cache, telemetry=telemetry)
+            # الكتابة داخل try أيضاً: فشلها (قرص ممتلئ، sink مغلق) سطر error لهذا الملف لا توقف للتشغيل
+            report(res, fp)
+        except Exception as e:
+            failed += 1
+            _emit("error", fp, out=str(e))
+    if args.sink:
+        sink.close()  # الـ sink المشترك ($ITSH_SINK) يُغلق عند الخروج
+    if cache:
+        from .cache import format_stats
+
+        print(format_stats(cache.stats()), file=sys.stderr)
+    print_similarity_stats(similar)
+    return 1 if failed else 0
+
+
+def run_layered(args: argparse.Namespace) -> int:
+    from .layered import decode_many, iter_py_files, layer_labels
+    from .similarity import final_layer, open_index as open_similarity
+    from .sinks import SINK_ENV, open_sink
+    from .stream import TRUNCATED
+
+    out_zip = args.out or "decoded_layers.zip"
+    if os.path.isdir(out_zip):
+        out_zip = os.path.join(out_zip, "decoded_layers.zip")
+    # الافتراضي كما كان: أرشيف ZIP واحد بضغط DEFLATE في --out
+    sink = open_sink(args.sink or os.environ.get(SINK_ENV) or "zip:" + out_zip)
+    similar = open_similarity(args.similarity)
+    failed = 0
+    results = sys.stdout
+    jobs = (job for path in args.paths for job in iter_py_files(path))
+    # رسائل التقدّم للـ stderr حتى يبقى stdout سطراً لكل ملف
+    with redirect_stdout(sys.stderr), sink:
+        for full, entries, err in decode_many(jobs, args.workers, args.cache, args.telemetry):
+            if err is not None:
+                failed += 1
+                _emit("error", full, out=str(err), file=results)
+                continue
+            labels = layer_labels(entries)
+            # قبل submit: الـ sink قد يحذف ملفات الطبقات المؤقتة بعد كتابتها
+            final = final_layer(entries)
+            if similar is not None and final is not None:
+                similar.add(full, final)
+            sink.submit(entries)
+            status = "ok" if labels else "skip"
+            if labels and labels[-1].endswith(TRUNCATED):
+                status = "truncated"
+            _emit(status, full, "->".join(labels), "layers", repr(sink), file=results)
+    print_similarity_stats(similar)
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="itsh_decode", description="Tool Decode Itsh — non-interactive decoder")
+    sub = parser.add_subparsers(dest="command", required=True)
+    dec = sub.add_parser("decode", help="decode files or folders")
+    dec.add_argument("paths", nargs="+", metavar="PATH")
+    dec.add_argument("--mode", choices=sorted(MODES), default="auto",
+                     help="transform set to search (default: auto = all schemes)")
+    dec.add_argument("-o", "--out", help="output folder (engine modes) or ZIP path (layered)")
+    dec.add_argument("-j", "--workers", type=int, default=1, help="worker processes (layered mode)")
+    dec.add_argument("--cache", help="layer cache database (default: $ITSH_CACHE)")
+    dec.add_argument("-n", "--dry-run", action="store_true", help="report chains without writing outputs")
+    dec.add_argument("--telemetry", help="append one JSON line per decode step to this file (default: $ITSH_TELEMETRY)")
+    dec.add_argument("--similarity", help="fingerprint every final layer into this cluster index "
+                                          "(default: $ITSH_SIMILARITY)")
+    dec.add_argument("--mmap", action="store_true",
+                     help="engine modes: decode each embedded blob separately from a memory-mapped file instead of reading "
+                          "the whole file (automatic past $ITSH_MMAP_MB, default 256)")
+    dec.add_argument("--sink", help="output backend: dir:PATH, zip:PATH, zip-stored:PATH, shards:PATH, "
+                                    "shards-stored:PATH, tar:PATH, tar.gz:PATH or sqlite:PATH (default: $ITSH_SINK)")
+    wat = sub.add_parser("watch", help="keep decoding new or changed files dropped into folders")
+    wat.add_argument("paths", nargs="+", metavar="DIR")
+    wat.add_argument("-o", "--out", default="watch_out", help="rolling output folder (default: watch_out)")
+    wat.add_argument("-j", "--workers", type=int, default=1, help="persistent worker processes")
+    wat.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds")
+    wat.add_argument("--poll", action="store_true", help="poll instead of using inotify")
+    wat.add_argument("--once", action="store_true", help="decode what is new now and exit")
+    wat.add_argument("--cache", help="layer cache database (default: $ITSH_CACHE)")
+    wat.add_argument("--telemetry", help="append one JSON line per decode step to this file (default: $ITSH_TELEMETRY)")
+    fil = sub.add_parser("filter", help="decode a sample from stdin (or NUL-delimited paths / JSONL records) to stdout")
+    fil.add_argument("--mode", choices=sorted(m for m in MODES if m != "layered"), default="auto",
+                     help="transform set to search (default: auto = all schemes)")
+    src = fil.add_mutually_exclusive_group()
+    src.add_argument("-0", "--null", action="store_true", help="stdin is a NUL-delimited path list (find -print0)")
+    src.add_argument("--jsonl-in", action="store_true", help="stdin is JSONL from another filter stage")
+    fil.add_argument("--jsonl", action="store_true",
+                     help="single sample: write a JSONL record instead of the raw final layer (always on with -0 "
+                          "and --jsonl-in)")
+    fil.add_argument("--label", default="-", help="path recorded for the stdin sample (default: -)")
+    fil.add_argument("--mmap", action="store_true", help="with -0: decode every listed file blob by blob from mmap")
+    fil.add_argument("--cache", help="layer cache database (default: $ITSH_CACHE)")
+    fil.add_argument("--telemetry", help="append one JSON line per decode step to this file (default: $ITSH_TELEMETRY)")
+    for p in (dec, wat, fil):
+        p.add_argument("--max-output-mb", type=float,
+                       help="abort any single decompression past this output size (default: $ITSH_MAX_OUTPUT_MB or 512)")
+        p.add_argument("--max-ratio", type=float,
+                       help="abort any decompression past this expansion ratio, 0 = off (default: $ITSH_MAX_RATIO or 1000)")
+    return parser
+
+
+def run_watch(args: argparse.Namespace) -> int:
+    from .watch import watch
+
+    watch(args.paths, args.out, args.workers, args.interval, args.poll, args.cache, args.telemetry, args.once)
+    return 0
+
+
+def run_filter(args: argparse.Namespace) -> int:
+    from .cache import open_cache
+    from .pipe import filter_paths, filter_records, filter_sample
+    from .telemetry import open_telemetry
+    from .transforms import TRANSFORMS
+
+    names = MODES[args.mode]
+    cache = open_cache(args.cache)
+    kwargs = dict(transforms=TRANSFORMS if names is None else {n: TRANSFORMS[n] for n in names},
+                  cache=cache, telemetry=open_telemetry(args.telemetry))
+    source, out = sys.stdin.buffer, sys.stdout.buffer
+    if args.null:
+        rows = filter_paths(source, out, args.mmap, **kwargs)
+    elif args.jsonl_in:
+        rows = filter_records(source, out, **kwargs)
+    else:
+        row = filter_sample(source, out, args.label, args.jsonl, **kwargs)
+        if not args.jsonl:
+            # stdout يحمل الطبقة نفسها: سطر الحالة على stderr
+            _emit(row["status"], row["path"], row["chain"], row["kind"], row.get("error", "-"), file=sys.stderr)
+        rows = [row]
+    # السجلات تُكتب فور فكها: هنا تُعدّ الأخطاء فقط (القائمة قد لا تنتهي)
+    failed = sum(row["status"] == "error" for row in rows)
+    if cache:
+        from .cache import format_stats
+
+        print(format_stats(cache.stats()), file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    missing = [p for p in getattr(args, "paths", []) if not os.path.exists(p)]
+    if missing:
+        parser.error(f"path not found: {', '.join(missing)}")
+    from .limits import configure
+
+    # عبر البيئة حتى ترثها عمليات الـ pool في الوضع layered
+    configure(args.max_output_mb, args.max_ratio)
+    started = time.time()
+    try:
+        if args.command == "watch":
+            return run_watch(args)
+        if args.command == "filter":
+            return run_filter(args)
+        if args.mode == "layered":
+            return run_layered(args)
+        return run_engine(args)
+    except BrokenPipeError:
+        # المستهلك (head مثلاً) أغلق الـ pipe: توقف بهدوء
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        print_telemetry_summary(args.telemetry, started)
+
+
+def print_similarity_stats(index) -> None:
+    if index is not None:
+        from .similarity import format_stats
+
+        print(format_stats(index.stats()), file=sys.stderr)
+
+
+def print_telemetry_summary(path: Optional[str], since: float) -> None:
+    """ملخّص أحداث هذا التشغيل فقط (الملف قد يحمل تشغيلات سابقة) على stderr."""
+    from .telemetry import TELEMETRY_ENV, format_summary, read_events, summarize
+
+    path = path or os.environ.get(TELEMETRY_ENV)
+    if path and os.path.exists(path):
+        print(format_summary(summarize(read_events(path, since))), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
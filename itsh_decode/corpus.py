@@ -0,0 +1,215 @@
+"""
+corpus.py
+مولّد عينات مشفّرة اصطناعية لكل مخطط تدعمه القائمة، لقياس سرعة الفك
+(انظر bench.py) ولتجربة التعديلات على مدخلات معروفة الناتج.
+
+    python -m itsh_decode.corpus OUT_DIR --sizes 1K,64K,1M,100M --layers 3
+
+كل عينة تُكتب في OUT_DIR مع سطر في manifest.jsonl يحمل المخطط والحجم وعدد
+الطبقات وsha256 للمصدر الأصلي، حتى يمكن التحقق من صحة الفك.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import binascii
+import bz2
+import hashlib
+import io
+import json
+import marshal
+import os
+import random
+import sys
+import zipfile
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SIZES = "1K,64K,1M"
+DEFAULT_LAYERS = 3
+XOR_KEY = 0x5A
+
+# كل مخطط: fn(source, layers) -> (امتداد الملف, بايتات العينة, عدد الطبقات الفعلي)
+SchemeFn = Callable[[bytes, int], Tuple[str, bytes, int]]
+
+_WORDS = ("data", "value", "item", "result", "buffer", "config", "user", "token", "path", "count",
+          "index", "name", "key", "payload", "session", "client", "handler", "cache", "state", "node")
+
+
+def parse_size(text: str) -> int:
+    """'64K' / '1M' / '100M' / '2048' -> بايتات."""
+    text = text.strip().upper().rstrip("B")
+    mult = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1:], 1)
+    return int(float(text[:-1] if mult > 1 else text) * mult)
+
+
+def make_source(size: int, seed: int = 0) -> bytes:
+    """
+    Valid Python source of about size bytes. Identifiers and numbers are
+    random so the text compresses like real code rather than a repeated
+    line.
+    """
+    rng = random.Random(seed)
+    out = io.StringIO()
+    out.write("import os\nimport sys\n\n")
+    n = 0
+    while out.tell() < size:
+        a, b = rng.choice(_WORDS), rng.choice(_WORDS)
+        n += 1
+        kind = rng.randrange(4)
+        if kind == 0:
+            out.write(f"def {a}_{n}({b}, limit={rng.randrange(1000)}):\n"
+                      f"    return [{b} * i for i in range(limit) if i % {rng.randrange(2, 9)}]\n\n")
+        elif kind == 1:
+            out.write(f"{a}_{n} = {{'{b}': {rng.randrange(10 ** 6)}, 'flag': {rng.random() < 0.5}}}\n")
+        elif kind == 2:
+            out.write(f"{a}_{n} = '{rng.getrandbits(64):016x}{rng.getrandbits(32):08x}'\n")
+        else:
+            out.write(f"if len(sys.argv) > {rng.randrange(5)}:\n    print('{a} {b} {n}')\n")
+    return out.getvalue().encode("ascii")
+
+
+def s_b64_zlib(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 2/6: exec(zlib.decompress(base64.b64decode(b'...'))) متداخلة layers مرة."""
+    data = source
+    for _ in range(layers):
+        blob = base64.b64encode(zlib.compress(data))
+        data = b"import base64, zlib\nexec(zlib.decompress(base64.b64decode(b'" + blob + b"')))\n"
+    return ".py", data, layers
+
+
+def s_rev_base16(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 1: b'<hex معكوس>' لطبقات zlib."""
+    data = source
+    for _ in range(layers):
+        hexs = binascii.hexlify(zlib.compress(data))[::-1]
+        data = (b"import zlib, binascii\n"
+                b"exec(zlib.decompress(binascii.unhexlify(b'" + hexs + b"'[::-1])))\n")
+    return ".py", data, layers
+
+
+def s_marshal_zlib_b64(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 11: exec(marshal.loads(zlib.decompress(base64.b64decode(b'...'))))."""
+    data = source
+    for _ in range(layers):
+        code = compile(data, "<sample>", "exec")
+        blob = base64.b64encode(zlib.compress(marshal.dumps(code)))
+        data = (b"import marshal, zlib, base64\n"
+                b"exec(marshal.loads(zlib.decompress(base64.b64decode(b'" + blob + b"'))))\n")
+    return ".py", data, layers
+
+
+def s_xor_b64(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 4: _loader_key_stub = N ثم base64 لبايتات xor بين ثلاث علامات تنصيص، متداخلة layers مرة."""
+    from .xorkey import xor_bytes
+
+    data = source
+    for _ in range(layers):
+        blob = base64.b64encode(xor_bytes(data, bytes([XOR_KEY])))
+        data = (b"_loader_key_stub = %d\n" % XOR_KEY +
+                b'_payload = """' + blob + b'"""\n')
+    return ".py", data, layers
+
+
+def s_bz2(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 9: ملف .bz2 خام."""
+    return ".bz2", bz2.compress(source, 9), 1
+
+
+def escape_bytes(data: bytes) -> bytes:
+    """\\x<hex> لكل بايت بعمليات على البافر كله (hexlify بفاصل x)، لا حلقة بايثون لكل بايت."""
+    if not data:
+        return b""
+    return b"\\x" + binascii.hexlify(data, b"x").replace(b"x", b"\\x")
+
+
+def s_exec_compile(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 8: (b'\\x78\\x9c...',compile) بهروب \\x لكل بايت."""
+    escaped = escape_bytes(zlib.compress(source))
+    data = (b"exec((lambda d, c: c(__import__('zlib').decompress(d), '<x>', 'exec'))(b'" + escaped +
+            b"',compile))\n")
+    return ".py", data, 1
+
+
+def s_rev_b64(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 12: سلاسل base64 معكوسة داخل literal، متداخلة layers مرة."""
+    data = source
+    for _ in range(layers):
+        blob = base64.b64encode(data)[::-1]
+        data = b"import base64\nexec(base64.b64decode('" + blob + b"'[::-1]))\n"
+    return ".py", data, layers
+
+
+def s_b64_zip(source: bytes, layers: int) -> Tuple[str, bytes, int]:
+    """الخيار 10: base64 لأرشيف ZIP فيه main.py."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("main.py", source)
+    blob = base64.b64encode(buf.getvalue())
+    return ".py", b'PAYLOAD = """' + blob + b'"""\n', 1
+
+
+SCHEMES: Dict[str, SchemeFn] = {
+    "b64_zlib": s_b64_zlib,
+    "rev_base16": s_rev_base16,
+    "marshal_zlib_b64": s_marshal_zlib_b64,
+    "xor_b64": s_xor_b64,
+    "bz2": s_bz2,
+    "exec_compile": s_exec_compile,
+    "rev_b64": s_rev_b64,
+    "b64_zip": s_b64_zip,
+}
+
+
+def generate(out_dir: str, sizes: Iterable[int], schemes: Optional[Iterable[str]] = None,
+             layers: int = DEFAULT_LAYERS, seed: int = 0) -> List[dict]:
+    """
+    Write one sample per (scheme, size) into out_dir and return the manifest
+    rows (also appended to out_dir/manifest.jsonl). The plaintext for a size
+    is generated once and shared by every scheme.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = list(schemes) if schemes else list(SCHEMES)
+    rows = []
+    with open(os.path.join(out_dir, "manifest.jsonl"), "a", encoding="utf-8") as manifest:
+        for size in sizes:
+            source = make_source(size, seed)
+            digest = hashlib.sha256(source).hexdigest()
+            for name in names:
+                ext, sample, n_layers = SCHEMES[name](source, layers)
+                path = os.path.join(out_dir, f"{name}_{size}{ext}")
+                with open(path, "wb") as f:
+                    f.write(sample)
+                row = {"path": path, "scheme": name, "size": len(source), "sample_size": len(sample),
+                       "layers": n_layers, "sha256": digest}
+                manifest.write(json.dumps(row) + "\n")
+                rows.append(row)
+    return rows
+
+
+def load_manifest(corpus_dir: str) -> List[dict]:
+    with open(os.path.join(corpus_dir, "manifest.jsonl"), encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.corpus", description="synthetic obfuscated-sample generator")
+    parser.add_argument("out_dir")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"plaintext sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--schemes", default="all", help="comma list of " + ",".join(SCHEMES))
+    parser.add_argument("--layers", type=int, default=DEFAULT_LAYERS, help="layers for nestable schemes")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    schemes = None if args.schemes == "all" else args.schemes.split(",")
+    unknown = [s for s in schemes or () if s not in SCHEMES]
+    if unknown:
+        parser.error(f"unknown scheme: {', '.join(unknown)}")
+    rows = generate(args.out_dir, [parse_size(s) for s in args.sizes.split(",")], schemes, args.layers, args.seed)
+    for row in rows:
+        print(f"{row['scheme']}\t{row['size']}\t{row['sample_size']}\t{row['path']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""
+disasm.py
+تصدير disassembly منظّم لكل code objects المتداخلة (الوحدة، الدوال، الـ
+lambdas، الأصناف...) كتيار تعليمات عمودي: offset و opname و arg و argrepr و
+line لكل code object، يُكتب JSON مضغوطاً دفعة واحدة. العرض النصي صار عرضاً
+اختيارياً يُولَّد من نفس التيار بدل str(instr) لكل تعليمة وكتابة سطر سطر.
+
+صيغة المخرجات عبر ITSH_DIS_FORMAT: text أو json أو both (الافتراضي both):
+    <name>.dis.txt   العرض النصي
+    <name>.dis.json  {"format": "itsh-dis/1", "python": "3.11", "codes": [...]}
+
+    python -m itsh_decode.disasm file.pyc [--json out.dis.json] [--text out.dis.txt]
+"""
+
+from __future__ import annotations
+
+import argparse
+import dis
+import json
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import pymarshal
+
+DIS_FORMAT_ENV = "ITSH_DIS_FORMAT"
+FORMATS = ("text", "json", "both")
+EXPORT_FORMAT = "itsh-dis/1"
+COLUMNS = ("offset", "opname", "arg", "argrepr", "line")
+CodeType = type((lambda: 0).__code__)
+
+
+def dis_format() -> str:
+    fmt = os.environ.get(DIS_FORMAT_ENV, "both").lower()
+    return fmt if fmt in FORMATS else "both"
+
+
+def iter_code_objects(code, prefix: str = "") -> Iterator[Tuple[str, object]]:
+    """(path, code) للـ code object وكل ما في co_consts، عمقاً أولاً؛ path مثل <module>/f/<lambda>."""
+    path = f"{prefix}/{code.co_name}" if prefix else code.co_name
+    yield path, code
+    for const in code.co_consts:
+        if isinstance(const, (CodeType, pymarshal.Code)):
+            yield from iter_code_objects(const, path)
+
+
+def _line_numbers(instrs: List[dis.Instruction]) -> List[Optional[int]]:
+    if not instrs:
+        return []
+    if hasattr(instrs[0], "line_number"):  # 3.13+
+        return [i.line_number for i in instrs]
+    if getattr(instrs[0], "positions", None) is not None:  # 3.11+
+        return [i.positions.lineno for i in instrs]
+    # حتى 3.10: starts_line على أول تعليمة في كل سطر فقط
+    out, line = [], None
+    for i in instrs:
+        if i.starts_line is not None:
+            line = i.starts_line
+        out.append(line)
+    return out
+
+
+def code_columns(code: CodeType) -> Dict[str, list]:
+    """تعليمات code object واحد (بدون المتداخل) كأعمدة COLUMNS."""
+    instrs = list(dis.get_instructions(code))
+    return {
+        "offset": [i.offset for i in instrs],
+        "opname": [i.opname for i in instrs],
+        "arg": [i.arg for i in instrs],
+        "argrepr": [i.argrepr for i in instrs],
+        "line": _line_numbers(instrs),
+    }
+
+
+def export(code) -> dict:
+    """
+    Structured disassembly of code and every nested code object. Host code
+    objects carry instruction columns; a pymarshal.Code from another Python
+    version cannot be decoded by the host dis, so it carries its raw
+    bytecode (hex) and names instead; its "python" is a range such as
+    "3.11-3.13" when the version was inferred from the marshal layout.
+    """
+    foreign = isinstance(code, pymarshal.Code)
+    version = pymarshal.version_label(code) if foreign else f"{sys.version_info[0]}.{sys.version_info[1]}"
+    codes = []
+    for path, c in iter_code_objects(code):
+        qualname = c.qualname if foreign else getattr(c, "co_qualname", c.co_name)
+        entry = {"path": path, "name": c.co_name, "qualname": qualname, "filename": c.co_filename,
+                 "firstlineno": c.co_firstlineno, "names": list(c.co_names)}
+        if foreign:
+            entry.update(argcount=c.argcount, flags=c.flags, bytecode=c.code.hex())
+        else:
+            entry.update(argcount=c.co_argcount, flags=c.co_flags)
+            entry["columns"] = code_columns(c)
+        codes.append(entry)
+    return {"format": EXPORT_FORMAT, "python": version, "foreign": foreign, "codes": codes}
+
+
+def to_json(exported: dict) -> bytes:
+    return json.dumps(exported, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def render_text(exported: dict) -> str:
+    """العرض النصي من التيار المصدَّر: ترويسة لكل code object ثم سطر لكل تعليمة."""
+    out = []
+    for c in exported["codes"]:
+        out.append(f"\n== {c['path']} ({c['filename']}:{c['firstlineno']}) argcount={c['argcount']} "
+                   f"flags=0x{c['flags']:x} ==")
+        if "columns" not in c:
+            out.append(f"names: {', '.join(c['names'])}")
+            out.append(f"code ({len(c['bytecode']) // 2} bytes): {c['bytecode']}")
+            continue
+        col = c["columns"]
+        out.extend(
+            f"{'' if line is None else line:>6} {offset:>6} {opname:<24} {'' if arg is None else arg:<6} {argrepr}"
+            for offset, opname, arg, argrepr, line in zip(col["offset"], col["opname"], col["arg"],
+                                                          col["argrepr"], col["line"]))
+    return f"# python {exported['python']} disassembly ({len(exported['codes'])} code objects)\n" + \
+        "\n".join(out) + "\n"
+
+
+def disassemble(code) -> str:
+    """Text view of code and all nested code objects."""
+    if isinstance(code, pymarshal.Code):
+        return pymarshal.format_code(code)
+    return render_text(export(code))
+
+
+def disassembly_outputs(code, stem: str, fmt: Optional[str] = None,
+                        header: str = "") -> List[Tuple[str, bytes]]:
+    """
+    (name, bytes) pairs for stem.dis.txt and/or stem.dis.json according to
+    fmt (default $ITSH_DIS_FORMAT). Both views come from one export.
+    """
+    fmt = fmt or dis_format()
+    if isinstance(code, pymarshal.Code) and fmt != "json":
+        text = header + pymarshal.format_code(code)
+        exported = export(code) if fmt == "both" else None
+    else:
+        exported = export(code)
+        text = header + render_text(exported) if fmt != "json" else None
+    out = []
+    if text is not None:
+        out.append((stem + ".dis.txt", text.encode("utf-8", errors="replace")))
+    if exported is not None and fmt != "text":
+        out.append((stem + ".dis.json", to_json(exported)))
+    return out
+
+
+def write_disassembly(code, stem: str, fmt: Optional[str] = None, header: str = "") -> List[str]:
+    """Write disassembly_outputs(code, stem) to disk and return the paths."""
+    written = []
+    for path, data in disassembly_outputs(code, stem, fmt, header):
+        with open(path, "wb") as f:
+            f.write(data)
+        written.append(path)
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.disasm", description="structured disassembly export")
+    parser.add_argument("path", help=".pyc or raw marshal file")
+    parser.add_argument("--json", help="write the JSON export here (default: stdout unless --text is given)")
+    parser.add_argument("--text", help="write the text view here")
+    args = parser.parse_args(argv)
+    with open(args.path, "rb") as f:
+        data = f.read()
+    code = pymarshal.load_any(data)
+    if not pymarshal.is_code(code):
+        print(f"not a code object: {type(code).__name__}", file=sys.stderr)
+        return 1
+    exported = export(code)
+    if args.text:
+        with open(args.text, "w", encoding="utf-8") as f:
+            f.write(disassemble(code))
+    if args.json:
+        with open(args.json, "wb") as f:
+            f.write(to_json(exported))
+    elif not args.text:
+        sys.stdout.write(to_json(exported).decode("utf-8") + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+engine.py
+محرّك فك موحّد: يعامل reverse/base16/base64/zlib/bz2/lzma/zip/marshal/xor/fold كعُقد
+في رسم تحويلات، ويبحث best-first عن سلسلة توصل إلى مصدر بايثون أو code object.
+يكتشف الدورات (نفس البايتات ظهرت سابقاً) ونقاط الثبات (التحويل لم يغيّر شيئاً).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import itertools
+import types
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional
+
+from .classify import new_stats, rank_transforms, record
+from .fold import fold_outputs, has_sink
+from .locator import BlobIndex, scan_blobs
+from .pymarshal import Code
+from .telemetry import Step, Telemetry
+from .transforms import MIN_B64_MATCH_LEN, MIN_HEX_MATCH_LEN, TRANSFORMS, collect_hints
+
+if TYPE_CHECKING:
+    from .cache import DecodeCache
+
+MAX_DEPTH = 64
+MAX_NODES = 4000
+# تحويلات تعتمد على البايتات فقط (بدون hints) فيصح تخزين ناتجها في الكاش
+CACHEABLE = ("base16", "base64", "literal", "zlib", "bz2", "lzma")
+# نفس الاسم في layered (الخيار 1) حساب مختلف: لكل تنفيذ مفاتيحه في الكاش
+CACHE_PREFIX = "engine:"
+# التحويلات التي يحكم عليها المصنّف؛ غير المرشّح منها يُتخطّى
+KNOWN_TRANSFORMS = frozenset(TRANSFORMS)
+
+_PRINTABLE = bytes(range(32, 127)) + b"\t\r\n"
+_COMPRESSED_MAGIC = (b"\x78\x01", b"\x78\x5e", b"\x78\x9c", b"\x78\xda", b"BZh", b"\xfd7zXZ")
+
+
+def printable_ratio(data: bytes, sample: int = 4096) -> float:
+    chunk = data[:sample]
+    if not chunk:
+        return 0.0
+    return 1.0 - len(chunk.translate(None, _PRINTABLE)) / len(chunk)
+
+
+def looks_encoded(data: bytes, index: Optional[BlobIndex] = None) -> bool:
+    """هل ما زال في البايتات blob مرمّز (base64/base16/\\x..) يستحق الفك؟"""
+    index = index if index is not None else scan_blobs(data)
+    return index.has_payload(MIN_B64_MATCH_LEN, MIN_HEX_MATCH_LEN)
+
+
+def is_python_source(data: bytes) -> bool:
+    if printable_ratio(data) < 0.95:
+        return False
+    try:
+        compile(data, "<layer>", "exec", dont_inherit=True)
+        return True
+    except Exception:
+        return False
+
+
+def classify(value: object) -> str:
+    if isinstance(value, (types.CodeType, Code)):
+        return "code"
+    if not isinstance(value, bytes):
+        return "object"
+    if is_python_source(value):
+        return "source"
+    return "bytes"
+
+
+def _estimate(value: object, kind: str, index: Optional[BlobIndex] = None) -> float:
+    """تقدير المسافة إلى الهدف (أصغر = أقرب)."""
+    if kind in ("code", "source"):
+        return 0.0
+    if kind == "object":
+        return 3.0
+    if value.startswith(_COMPRESSED_MAGIC):
+        return 1.0
+    if printable_ratio(value) > 0.9 and looks_encoded(value, index):
+        return 1.5
+    return 2.5
+
+
+def _is_goal(value: object, kind: str, index: Optional[BlobIndex] = None, folded: Optional[list] = None) -> bool:
+    # مصدر بلا blob لكن فيه exec/eval لقيمة تُطوى ثابتاً ليس نهاية السلسلة بعد
+    return kind == "code" or (kind == "source" and not folded and not looks_encoded(value, index))
+
+
+def _improves(h: float, kind: str, root_h: float) -> bool:
+    # عقدة بنفس تقدير الجذر (reverse لملف لم يُفك) ليست تقدماً، إلا مصدراً قُشرت عنه طبقة
+    return h < root_h or kind in ("source", "code")
+
+
+def improves(res: dict, data: bytes) -> bool:
+    """Whether res (from decode_bytes(data)) got closer to a goal than data itself."""
+    if res["ok"]:
+        return True
+    if not res["chain"]:
+        return False
+    return _improves(_estimate(res["value"], res["kind"]), res["kind"], _estimate(data, classify(data)))
+
+
+def _fold(value: object, kind: str, transforms: dict) -> Optional[list]:
+    """مخرجات fold لعقدة مصدر (تُحسب مرة لفحص الهدف ثم يستعملها التحويل نفسه)."""
+    if kind != "source" or "fold" not in transforms or not has_sink(value):
+        return None
+    return fold_outputs(value)
+
+
+def _digest(value: object) -> Optional[bytes]:
+    if isinstance(value, bytes):
+        return hashlib.sha256(value).digest()
+    return None
+
+
+def _path(nodes: list, idx: int) -> List[dict]:
+    layers = []
+    while idx is not None:
+        value, kind, label, parent, depth = nodes[idx]
+        if parent is not None:
+            layers.append({"transform": label, "kind": kind, "value": value})
+        idx = parent
+    layers.reverse()
+    return layers
+
+
+def _result(nodes: list, idx: int, ok: bool, expanded: int, stats: Optional[dict] = None,
+            aborted: Optional[List[str]] = None) -> dict:
+    layers = _path(nodes, idx)
+    value, kind = nodes[idx][0], nodes[idx][1]
+    return {
+        "ok": ok,
+        "kind": kind,
+        "chain": [layer["transform"] for layer in layers],
+        "layers": layers,
+        "value": value,
+        "expanded": expanded,
+        "classifier": stats or new_stats(),
+        "aborted": aborted or [],
+    }
+
+
+def _ordered(transforms: dict, decision: dict) -> List[tuple]:
+    """التحويلات التي رشّحها المصنّف بترتيبه، ثم ما لا يعرفه المصنّف (تحويلات مخصّصة)."""
+    ranked = [name for name, _ in decision["ranked"] if name in transforms]
+    known = set(ranked) | KNOWN_TRANSFORMS
+    return [(name, transforms[name]) for name in ranked] + \
+        [(name, fn) for name, fn in transforms.items() if name not in known]
+
+
+def _expand(name: str, fn, value: bytes, hints: dict, cache, key: Optional[str]) -> list:
+    """fn(value, hints) عبر الكاش للتحويلات التي تعتمد على البايتات فقط."""
+    if cache is None or key is None or name not in CACHEABLE:
+        return fn(value, hints)
+    from .cache import NOT_CACHED  # الكاش مفتوح: الوحدة (وsqlite3) محمّلة أصلاً
+
+    aborted = hints.setdefault("aborted", [])
+
+    def run(d: bytes):
+        before = len(aborted)
+        out = next((out for _, out in fn(d, hints)), None)
+        # حد فك الضغط ليس فشلاً دائماً: لا يُخزَّن حتى يُعاد مع حدود أخرى
+        return NOT_CACHED if out is None and len(aborted) > before else out
+
+    child = cache.memo(CACHE_PREFIX + name, run, value, key)
+    return [(name, child)] if child is not None else []
+
+
+def decode_bytes(data: bytes, max_depth: int = MAX_DEPTH, max_nodes: int = MAX_NODES,
+                 hints: Optional[dict] = None, transforms: Optional[dict] = None,
+                 cache: Optional[DecodeCache] = None, telemetry: Optional[Telemetry] = None,
+                 file: str = "<bytes>") -> dict:
+    """
+    Best-first search over transform chains starting at `data`.
+    Stops at the first code object or Python source without any remaining
+    encoded blob or statically foldable exec/eval argument. If the graph is exhausted first, the deepest source node
+    (or the node closest to the goal, if closer than data itself) is
+    returned; otherwise the chain is empty. The dict carries the
+    chain of transforms, every intermediate layer and the final value.
+    With a DecodeCache, byte-only transforms of layers seen before (in this
+    or an earlier run) are resolved by lookup instead of decoded again.
+    Each node only tries the transforms classify.rank_transforms ranks for
+    it, best first; result["classifier"] holds the decision count and time.
+    zlib/bz2/lzma/zip steps stopped by the decompression limits (limits.py) are
+    skipped and listed in result["aborted"]. With telemetry every transform attempt is recorded as an event for
+    `file`, with the node depth as its layer index.
+    """
+    hints = collect_hints(data) if hints is None else hints
+    # قائمة مشتركة بين نسخ hints لكل عقدة: خطوات فك الضغط التي أوقفتها حدود limits
+    aborted = hints.setdefault("aborted", [])
+    transforms = TRANSFORMS if transforms is None else transforms
+
+    # كل عقدة: (value, kind, label, parent, depth)
+    nodes = [(data, classify(data), None, None, 0)]
+    # فهرس blobs لكل عقدة bytes: يُبنى مرة واحدة ويستخدمه فحص الهدف والتحويلات معاً
+    indexes = {0: scan_blobs(data)}
+    folds = {0: _fold(data, nodes[0][1], transforms)}
+    if _is_goal(data, nodes[0][1], indexes[0], folds[0]):
+        return _result(nodes, 0, True, 0)
+    stats = new_stats()
+
+    root_digest = _digest(data)
+    seen = {root_digest}
+    nodes_key = {0: root_digest.hex()}  # مفتاح الكاش لكل عقدة bytes
+    counter = itertools.count()
+    heap = [(0.0, next(counter), 0)]
+    # الجذر خط الأساس: لا تُعاد عقدة إلا إن كانت أقرب للهدف منه
+    root_h = _estimate(data, nodes[0][1], indexes[0])
+    best = (root_h, 0)
+    best_idx = 0
+    expanded = 0
+
+    while heap and expanded < max_nodes:
+        _, _, idx = heapq.heappop(heap)
+        value, kind, _, _, depth = nodes[idx]
+        if depth >= max_depth or not isinstance(value, bytes):
+            continue
+        expanded += 1
+        key = nodes_key.get(idx)
+        node_hints = dict(hints, index=indexes.pop(idx, None), folded=folds.pop(idx, None))
+        if node_hints["index"] is None:
+            node_hints["index"] = scan_blobs(value)
+        decision = rank_transforms(value, node_hints["index"], hints)
+        chosen = _ordered(transforms, decision)
+        record(stats, decision, len(chosen), len(transforms) - len(chosen))
+        for name, fn in chosen:
+            with Step(telemetry, file, depth + 1, name, value, cache) as step:
+                step.out = _expand(name, fn, value, node_hints, cache, key)
+            for label, out in step.out:
+                if out == value:
+                    continue  # نقطة ثبات
+                d = _digest(out)
+                if d is not None and d in seen:
+                    continue  # دورة
+                seen.add(d)
+                out_kind = classify(out)
+                nodes.append((out, out_kind, label, idx, depth + 1))
+                child = len(nodes) - 1
+                if cache is not None and d is not None:
+                    nodes_key[child] = d.hex()
+                index = scan_blobs(out) if isinstance(out, bytes) else None
+                folded = _fold(out, out_kind, transforms)
+                if _is_goal(out, out_kind, index, folded):
+                    return _result(nodes, child, True, expanded, stats, aborted)
+                h = _estimate(out, out_kind, index)
+                indexes[child] = index
+                folds[child] = folded
+                if (h, -(depth + 1)) < best and _improves(h, out_kind, root_h):
+                    best = (h, -(depth + 1))
+                    best_idx = child
+                heapq.heappush(heap, (h + 0.01 * (depth + 1), next(counter), child))
+
+    # لم نصل لهدف صريح: أعمق مصدر بايثون (أو أقرب عقدة) هو أفضل ما لدينا
+    ok = nodes[best_idx][1] in ("source", "code") and best_idx != 0
+    return _result(nodes, best_idx, ok, expanded, stats, aborted)
+
+
+def decode_file(path, **kwargs) -> dict:
+    data = Path(path).read_bytes()
+    kwargs.setdefault("file", str(path))
+    res = decode_bytes(data, **kwargs)
+    res["path"] = str(path)
+    return res
@@ -0,0 +1,811 @@
+"""
+fold.py
+مقيّم ثابت (constant folding) فوق الـ AST: يحسب وسائط exec/eval/compile/
+marshal.loads بدون تشغيل العينة. عينات كثيرة تبني الـ blob قبل الـ exec بـ
+''.join(chr(x) for x in [...]) أو دمج سلاسل أو [::-1] أو bytes.fromhex أو
+getattr(__import__('base64'), 'b64decode')؛ هنا تُطوى هذه التعابير النقية إلى
+قيمتها.
+
+لا يُستدعى إلا ما في قائمة بيضاء من الدوال النقية (chr، bytes.fromhex، base64،
+binascii، codecs، zlib/bz2/lzma عبر حدود limits، marshal.loads...) وبعض
+methods السلاسل. أي اسم أو استدعاء آخر يوقف طي ذلك التعبير فقط. الأحجام
+مقيّدة (ITSH_MAX_OUTPUT_MB) وعدد خطوات التقييم محدود، فعينة عدائية لا تستهلك
+الذاكرة ولا الوقت.
+
+المحرّك يستخدمه كتحويل fold، والخيار 15 في الأداة والأمر:
+
+    python -m itsh_decode.fold samples/ [-o folded/]
+    python -m itsh_decode.fold --check     # الحدود أمام عينات HOSTILE
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import base64
+import binascii
+import codecs
+import marshal
+import operator
+import os
+import re
+import sys
+import zlib
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from . import pymarshal
+from .limits import DecompressionLimit, current_limits
+from .stream import decompress_bounded
+
+MAX_STEPS = 2_000_000     # عقد AST مقيّمة لكل sink
+MAX_ITEMS = 10_000_000    # عناصر أي قائمة/مولّد
+MAX_INT_BITS = 1 << 16
+# فحص رخيص قبل تحليل AST: هل في النص استدعاء sink أصلاً؟
+_SINK_RE = re.compile(rb"(?<![\w.])(?:exec|eval|compile)\s*\(|\bloads\s*\(|['\"](?:exec|eval)['\"]")
+
+SINKS = frozenset({"exec", "eval", "compile", "marshal.loads"})
+MODULES = frozenset({"base64", "binascii", "codecs", "zlib", "bz2", "lzma", "gzip", "marshal", "builtins",
+                     "importlib"})
+# أسماء codecs.lookup(...).name المسموحة (zlib و bz2 تمر عبر حدود limits)
+CODECS = frozenset({"utf-8", "iso8859-1", "ascii", "cp1252", "charmap", "utf-16", "utf-16-le", "utf-16-be",
+                    "unicode-escape", "raw-unicode-escape", "rot-13", "hex", "base64", "uu", "quopri"})
+
+
+class FoldError(Exception):
+    """An expression is not a pure value the folder can compute."""
+
+
+class Folded(NamedTuple):
+    sink: str      # exec أو eval أو compile أو marshal.loads
+    lineno: int
+    value: object  # bytes أو code object
+
+
+class Ref(NamedTuple):
+    """Reference to a whitelisted module or function, e.g. base64.b64decode."""
+    name: str
+
+
+class _Bound(NamedTuple):
+    obj: object
+    method: str
+
+
+class _Lambda(NamedTuple):
+    node: ast.Lambda
+    scope: dict
+
+
+def has_sink(data: bytes) -> bool:
+    """Cheap pre-check: does data mention exec/eval/compile/loads at all?"""
+    return _SINK_RE.search(data) is not None
+
+
+def _cap() -> int:
+    return current_limits().max_output
+
+
+def _decompress(kind: str) -> Callable:
+    def fn(data, *args, **kwargs):
+        if kind == "zlib" and (args or kwargs):
+            wbits = args[0] if args else kwargs.get("wbits", zlib.MAX_WBITS)
+            if wbits not in (zlib.MAX_WBITS, 0):
+                # raw deflate / gzip: نفس الحد عبر max_length
+                d = zlib.decompressobj(wbits)
+                out = d.decompress(bytes(data), _cap() + 1)
+                if len(out) > _cap():
+                    raise FoldError("decompression limit")
+                return out
+        try:
+            return decompress_bounded(kind, bytes(data))
+        except DecompressionLimit as e:
+            raise FoldError(str(e))
+    return fn
+
+
+def _marshal_loads(data, *args):
+    try:
+        return marshal.loads(bytes(data))
+    except Exception:
+        return pymarshal.loads(bytes(data))
+
+
+def _codec(direction: str) -> Callable:
+    def fn(obj, encoding: str = "utf-8", errors: str = "strict"):
+        try:
+            name = codecs.lookup(encoding).name
+        except (LookupError, TypeError):
+            raise FoldError(f"codec {encoding}")
+        if direction == "decode" and name in ("zlib", "bz2"):
+            return _decompress(name)(obj)
+        if name not in CODECS:
+            raise FoldError(f"codec {encoding}")
+        return getattr(codecs, direction)(obj, encoding, errors)
+    return fn
+
+
+def _bounded_ctor(ctor: Callable) -> Callable:
+    # bytes(10**12) و str(...) على أعداد ضخمة
+    def fn(*args, **kwargs):
+        if args and isinstance(args[0], int) and not isinstance(args[0], bool) and args[0] > _cap():
+            raise FoldError("value too large")
+        return ctor(*args, **kwargs)
+    return fn
+
+
+def _range(*args):
+    r = range(*args)
+    if len(r) > MAX_ITEMS:
+        raise FoldError("range too large")
+    return list(r)
+
+
+# الدوال النقية المسموح استدعاؤها (الاسم كما يُكتب بعد حل الـ imports)
+PURE: Dict[str, Callable] = {
+    "chr": chr, "ord": ord, "len": len, "int": int, "abs": abs, "hex": hex, "bool": bool,
+    "str": _bounded_ctor(str), "bytes": _bounded_ctor(bytes), "bytearray": _bounded_ctor(bytearray),
+    "list": list, "tuple": tuple, "reversed": lambda x: list(reversed(x)), "sorted": sorted,
+    "sum": sum, "min": min, "max": max, "range": _range, "zip": lambda *a: list(zip(*a)),
+    "bytes.fromhex": bytes.fromhex, "bytearray.fromhex": bytearray.fromhex, "str.maketrans": str.maketrans,
+    "bytes.maketrans": bytes.maketrans,
+    "base64.b64decode": base64.b64decode, "base64.standard_b64decode": base64.standard_b64decode,
+    "base64.urlsafe_b64decode": base64.urlsafe_b64decode, "base64.b32decode": base64.b32decode,
+    "base64.b16decode": base64.b16decode, "base64.b85decode": base64.b85decode,
+    "base64.a85decode": base64.a85decode, "base64.decodebytes": base64.decodebytes,
+    "base64.b64encode": base64.b64encode,
+    "binascii.unhexlify": binascii.unhexlify, "binascii.a2b_hex": binascii.a2b_hex,
+    "binascii.a2b_base64": binascii.a2b_base64,
+    "codecs.decode": _codec("decode"), "codecs.encode": _codec("encode"),
+    "zlib.decompress": _decompress("zlib"), "gzip.decompress": _decompress("gzip"),
+    "bz2.decompress": _decompress("bz2"), "lzma.decompress": _decompress("lzma"),
+    "marshal.loads": _marshal_loads,
+}
+_BUILTIN_NAMES = frozenset(n for n in PURE if "." not in n) | {"exec", "eval", "compile", "map", "getattr",
+                                                               "__import__", "bytes", "bytearray", "str"}
+
+_STR_METHODS = frozenset({"join", "encode", "decode", "replace", "strip", "lstrip", "rstrip", "split", "lower",
+                          "upper", "swapcase", "translate", "zfill", "hex", "startswith", "endswith"})
+
+_BINOPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Mod: operator.mod,
+    ast.FloorDiv: operator.floordiv, ast.BitXor: operator.xor, ast.BitAnd: operator.and_,
+    ast.BitOr: operator.or_, ast.LShift: operator.lshift, ast.RShift: operator.rshift,
+}
+_UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert, ast.Not: operator.not_}
+_COMPARE = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+            ast.Gt: operator.gt, ast.GtE: operator.ge, ast.In: lambda a, b: a in b,
+            ast.NotIn: lambda a, b: a not in b}
+_DATA = (str, bytes, bytearray, int, float, bool, type(None), list, tuple, dict)
+
+
+class Folder:
+    """
+    Evaluates pure expressions of one module. Top-level imports and
+    assignments are tracked in source order, so names bound to foldable
+    values (or to whitelisted modules and functions) resolve.
+    """
+
+    def __init__(self, max_steps: int = MAX_STEPS):
+        self.env: Dict[str, object] = {}
+        self.max_steps = max_steps
+        self.steps = 0
+        self.cap = current_limits().max_output
+        # قائمة/tuple تكلّف 8 بايت (مؤشر) على الأقل لكل عنصر، فحدّها بالعناصر لا بالبايتات
+        self.max_items = min(MAX_ITEMS, max(self.cap // 8, 1))
+
+    def _limit(self, value) -> int:
+        return self.max_items if isinstance(value, (list, tuple)) else self.cap
+
+    def _total(self, values) -> int:
+        """مجموع أطوال القيم المقاسة: حجم ناتج join/دمج قبل بنائه."""
+        return sum(len(v) for v in values if isinstance(v, (str, bytes, bytearray, list, tuple)))
+
+    def _check(self, size: int, limit: Optional[int] = None) -> None:
+        if size > (self.cap if limit is None else limit):
+            raise FoldError("value too large")
+
+    def _sized(self, value):
+        if isinstance(value, (str, bytes, bytearray, list, tuple)) and len(value) > self._limit(value):
+            raise FoldError("value too large")
+        if isinstance(value, int) and not isinstance(value, bool) and value.bit_length() > MAX_INT_BITS:
+            raise FoldError("integer too large")
+        return value
+
+    # ---- البيئة ----
+
+    def bind(self, stmt: ast.stmt) -> None:
+        """Record the effect of one statement on the known names."""
+        if isinstance(stmt, ast.Import):
+            for alias in stmt.names:
+                top = alias.name.split(".")[0]
+                if alias.asname:
+                    self._set(alias.asname, Ref(alias.name) if alias.name in MODULES else None)
+                else:
+                    self._set(top, Ref(top) if top in MODULES else None)
+        elif isinstance(stmt, ast.ImportFrom):
+            for alias in stmt.names:
+                name = alias.name if stmt.module == "builtins" else f"{stmt.module}.{alias.name}"
+                known = name in _BUILTIN_NAMES if stmt.module == "builtins" else \
+                    stmt.module in MODULES and (name in PURE or name in SINKS)
+                self._set(alias.asname or alias.name, Ref(name) if known else None)
+        elif isinstance(stmt, ast.Assign):
+            value = self._try(stmt.value)
+            for target in stmt.targets:
+                self._assign(target, value)
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            self._assign(stmt.target, self._try(stmt.value))
+        elif isinstance(stmt, ast.AugAssign) and isinstance(stmt.target, ast.Name):
+            value = self._try(ast.BinOp(stmt.target, stmt.op, stmt.value))
+            self._set(stmt.target.id, value)
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            self._set(stmt.name, None)
+
+    def _set(self, name: str, value) -> None:
+        self.env[name] = _UNKNOWN if value is None else value
+
+    def _assign(self, target: ast.expr, value) -> None:
+        if isinstance(target, ast.Name):
+            self._set(target.id, value)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            items = value if isinstance(value, (list, tuple)) and len(value) == len(target.elts) else None
+            for i, elt in enumerate(target.elts):
+                self._assign(elt, items[i] if items is not None else None)
+
+    def _try(self, node: ast.expr):
+        try:
+            return self.fold(node)
+        except Exception:
+            return None
+
+    def forget(self, names: Iterator[str]) -> None:
+        """Names rebound in loops or branches no longer have one known value."""
+        for name in names:
+            self._set(name, None)
+
+    # ---- التقييم ----
+
+    def fold(self, node: ast.expr):
+        """Evaluate one expression with a fresh step budget; FoldError if it is not pure."""
+        self.steps = 0
+        try:
+            return self.eval(node)
+        except RecursionError:
+            raise FoldError("expression too deep")
+
+    def eval(self, node: ast.expr, scope: Optional[dict] = None):
+        self.steps += 1
+        if self.steps > self.max_steps:
+            raise FoldError("step budget exhausted")
+        method = getattr(self, "_" + type(node).__name__, None)
+        if method is None:
+            raise FoldError(f"unsupported {type(node).__name__}")
+        return method(node, scope or {})
+
+    def _Constant(self, node, scope):
+        return node.value
+
+    def _Index(self, node, scope):  # حتى 3.8
+        return self.eval(node.value, scope)
+
+    def _Name(self, node, scope):
+        if node.id in scope:
+            return scope[node.id]
+        value = self.env.get(node.id)
+        if value is _UNKNOWN:
+            raise FoldError(f"unknown name {node.id}")
+        if value is not None:
+            return value
+        if node.id in _BUILTIN_NAMES:
+            return Ref(node.id)
+        if node.id == "__builtins__":
+            return Ref("builtins")
+        raise FoldError(f"unknown name {node.id}")
+
+    def _seq(self, elts, scope) -> list:
+        if all(type(elt) is ast.Constant for elt in elts):
+            # قوائم أرقام/سلاسل ضخمة (bytes([...])، chr لكل عنصر): بلا تقييم لكل عقدة
+            self.steps += len(elts)
+            return self._sized([elt.value for elt in elts])
+        out, total = [], 0
+        for elt in elts:
+            if isinstance(elt, ast.Starred):
+                out.extend(self._data(self.eval(elt.value, scope)))
+            else:
+                out.append(self.eval(elt, scope))
+            # عناصر كل منها ضمن الحد قد تتجاوزه معاً: [s * n, s * n, ...]
+            total += self._total(out[-1:])
+            self._check(total)
+        return self._sized(out)
+
+    def _List(self, node, scope):
+        return self._seq(node.elts, scope)
+
+    def _Tuple(self, node, scope):
+        return tuple(self._seq(node.elts, scope))
+
+    def _Set(self, node, scope):
+        raise FoldError("set order is not static")
+
+    def _Dict(self, node, scope):
+        if any(k is None for k in node.keys):
+            raise FoldError("dict unpacking")
+        return {self.eval(k, scope): self.eval(v, scope) for k, v in zip(node.keys, node.values)}
+
+    def _JoinedStr(self, node, scope):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.FormattedValue):
+                if value.format_spec is not None or value.conversion not in (-1, ord("s")):
+                    raise FoldError("format spec")
+                parts.append(str(self._data(self.eval(value.value, scope))))
+            else:
+                parts.append(self.eval(value, scope))
+        self._check(self._total(parts))
+        return self._sized("".join(parts))
+
+    def _BinOp(self, node, scope):
+        if isinstance(node.op, ast.Add):
+            # سلاسل دمج طويلة ('a' + 'b' + ...) تُطوى بلا عودية
+            operands = []
+            while isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+                operands.append(node.right)
+                node = node.left
+            operands.append(node)
+            values = [self._data(self.eval(n, scope)) for n in reversed(operands)]
+            self._check(self._total(values))
+            if all(isinstance(v, str) for v in values):
+                return self._sized("".join(values))
+            if all(isinstance(v, (bytes, bytearray)) for v in values):
+                return self._sized(b"".join(values))
+            result = values[0]
+            for v in values[1:]:
+                result = self._sized(result + v)
+            return result
+        op = _BINOPS.get(type(node.op))
+        left = self._data(self.eval(node.left, scope))
+        right = self._data(self.eval(node.right, scope))
+        if isinstance(node.op, ast.Pow):
+            if not isinstance(left, int) or not isinstance(right, int) or right < 0 or \
+                    left.bit_length() * right > MAX_INT_BITS:
+                raise FoldError("pow")
+            return left ** right
+        if op is None:
+            raise FoldError("operator")
+        if isinstance(node.op, ast.Mult):
+            n, seq = (left, right) if isinstance(left, int) else (right, left)
+            if isinstance(seq, (str, bytes, bytearray, list, tuple)) and isinstance(n, int) and \
+                    len(seq) * max(n, 0) > self._limit(seq):
+                raise FoldError("value too large")
+        if isinstance(node.op, ast.LShift) and isinstance(right, int) and right > MAX_INT_BITS:
+            raise FoldError("integer too large")
+        if isinstance(node.op, ast.Mod) and isinstance(left, (str, bytes)):
+            raise FoldError("%-formatting")
+        return self._sized(op(left, right))
+
+    def _UnaryOp(self, node, scope):
+        return _UNARY[type(node.op)](self._data(self.eval(node.operand, scope)))
+
+    def _BoolOp(self, node, scope):
+        value = None
+        for v in node.values:
+            value = self._data(self.eval(v, scope))
+            if isinstance(node.op, ast.And) and not value or isinstance(node.op, ast.Or) and value:
+                return value
+        return value
+
+    def _Compare(self, node, scope):
+        left = self._data(self.eval(node.left, scope))
+        for op, comp in zip(node.ops, node.comparators):
+            fn = _COMPARE.get(type(op))
+            if fn is None:
+                raise FoldError("comparison")
+            right = self._data(self.eval(comp, scope))
+            if not fn(left, right):
+                return False
+            left = right
+        return True
+
+    def _IfExp(self, node, scope):
+        return self.eval(node.body if self._data(self.eval(node.test, scope)) else node.orelse, scope)
+
+    def _Subscript(self, node, scope):
+        value = self._data(self.eval(node.value, scope))
+        index = node.slice
+        if isinstance(index, ast.Slice):
+            parts = [None if n is None else self._data(self.eval(n, scope)) for n in
+                     (index.lower, index.upper, index.step)]
+            return value[slice(*parts)]
+        key = self._data(self.eval(index, scope))
+        try:
+            return value[key]
+        except (IndexError, KeyError, TypeError) as e:
+            raise FoldError(str(e))
+
+    def _Attribute(self, node, scope):
+        base = self.eval(node.value, scope)
+        return self._getattr(base, node.attr)
+
+    def _getattr(self, base, attr: str):
+        if isinstance(base, Ref):
+            name = attr if base.name == "builtins" else f"{base.name}.{attr}"
+            if name in PURE or name in SINKS or name in MODULES or \
+                    (base.name == "builtins" and attr in _BUILTIN_NAMES):
+                return Ref(name)
+            if base.name in ("str", "bytes", "bytearray") and attr in _STR_METHODS:
+                return Ref(name)  # str.join('', ...)
+            if base.name == "importlib" and attr == "import_module":
+                return Ref("__import__")
+            raise FoldError(f"attribute {name}")
+        if isinstance(base, (str, bytes, bytearray)) and attr in _STR_METHODS:
+            return _Bound(base, attr)
+        raise FoldError(f"attribute {attr}")
+
+    def _Lambda(self, node, scope):
+        return _Lambda(node, dict(scope))
+
+    def _comprehension(self, node, scope) -> Iterator[dict]:
+        def walk(generators, local):
+            if not generators:
+                yield local
+                return
+            gen = generators[0]
+            if gen.is_async:
+                raise FoldError("async comprehension")
+            for item in self._data(self.eval(gen.iter, local)):
+                inner = dict(local)
+                self._bind_target(gen.target, item, inner)
+                if all(self._data(self.eval(cond, inner)) for cond in gen.ifs):
+                    yield from walk(generators[1:], inner)
+        yield from walk(node.generators, dict(scope))
+
+    def _bind_target(self, target, value, scope: dict) -> None:
+        if isinstance(target, ast.Name):
+            scope[target.id] = value
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            items = list(value)
+            if len(items) != len(target.elts):
+                raise FoldError("unpacking")
+            for elt, item in zip(target.elts, items):
+                self._bind_target(elt, item, scope)
+        else:
+            raise FoldError("comprehension target")
+
+    def _collect(self, node, scope, fn) -> list:
+        out, total = [], 0
+        for local in self._comprehension(node, scope):
+            out.append(fn(local))
+            if len(out) > self.max_items:
+                raise FoldError("too many items")
+            total += self._total(out[-1:])
+            self._check(total)
+        return out
+
+    def _ListComp(self, node, scope):
+        return self._collect(node, scope, lambda local: self.eval(node.elt, local))
+
+    _GeneratorExp = _ListComp
+
+    def _DictComp(self, node, scope):
+        return dict(self._collect(node, scope, lambda local: (self.eval(node.key, local),
+                                                              self.eval(node.value, local))))
+
+    def _Call(self, node, scope):
+        func = self.eval(node.func, scope)
+        args = self._seq(node.args, scope)
+        kwargs = {}
+        for kw in node.keywords:
+            if kw.arg is None:
+                raise FoldError("**kwargs")
+            kwargs[kw.arg] = self.eval(kw.value, scope)
+        return self.call(func, args, kwargs)
+
+    def call(self, func, args: list, kwargs: dict):
+        """Call a folded callable (Ref, bound str/bytes method or lambda) on folded arguments."""
+        if isinstance(func, _Lambda):
+            params = func.node.args
+            if params.vararg or params.kwarg or params.kwonlyargs or kwargs:
+                raise FoldError("lambda signature")
+            names = [a.arg for a in params.posonlyargs + params.args]
+            missing = len(names) - len(args)
+            if missing < 0 or missing > len(params.defaults):
+                raise FoldError("lambda arguments")
+            values = list(args) + [self.eval(d, func.scope) for d in params.defaults[len(params.defaults) - missing:]]
+            return self.eval(func.node.body, dict(func.scope, **dict(zip(names, values))))
+        if isinstance(func, _Bound):
+            args = [self._data(a) for a in args]
+            if func.method in ("encode", "decode"):
+                encoding = (args[0] if args else kwargs.get("encoding", "utf-8"))
+                return self._sized(_codec(func.method)(func.obj, encoding, *args[1:2], **{
+                    k: v for k, v in kwargs.items() if k == "errors"}))
+            if func.method == "replace" and len(args) >= 2 and args[0] and \
+                    len(func.obj) + func.obj.count(args[0]) * max(len(args[1]) - len(args[0]), 0) > self.cap:
+                raise FoldError("value too large")
+            if func.method == "zfill" and args and args[0] > self.cap:
+                raise FoldError("value too large")
+            self._precheck_method(func.obj, func.method, args)
+            return self._sized(getattr(func.obj, func.method)(*args, **kwargs))
+        if not isinstance(func, Ref):
+            raise FoldError("call of a non-function")
+        name = func.name
+        if name in SINKS and name != "marshal.loads":
+            raise FoldError(f"sink {name}")
+        if name == "__import__":
+            module = self._data(args[0]) if args else None
+            if module not in MODULES:
+                raise FoldError(f"import {module}")
+            return Ref(module)
+        if name == "getattr":
+            if len(args) < 2 or not isinstance(args[1], str):
+                raise FoldError("getattr")
+            return self._getattr(args[0], args[1])
+        if name == "map":
+            if len(args) < 2:
+                raise FoldError("map")
+            iterables = [self._data(a) for a in args[1:]]
+            if all(hasattr(it, "__len__") for it in iterables):
+                self._check(min(len(it) for it in iterables), self.max_items)
+            out, total = [], 0
+            for items in zip(*iterables):
+                out.append(self.call(args[0], list(items), {}))
+                if len(out) > self.max_items:
+                    raise FoldError("too many items")
+                total += self._total(out[-1:])
+                self._check(total)
+            return self._sized(out)
+        if name.startswith(("str.", "bytes.", "bytearray.")) and name.split(".")[1] in _STR_METHODS:
+            return self.call(_Bound(self._data(args[0]), name.split(".")[1]), args[1:], kwargs)
+        fn = PURE.get(name)
+        if fn is None:
+            raise FoldError(f"call {name}")
+        args = [self._data(a) for a in args]
+        kwargs = {k: self._data(v) for k, v in kwargs.items()}
+        self._precheck_call(name, args)
+        try:
+            return self._sized(fn(*args, **kwargs))
+        except FoldError:
+            raise
+        except Exception as e:
+            raise FoldError(f"{name}: {e}")
+
+    def _precheck_method(self, obj, method: str, args: list) -> None:
+        """يقدّر حجم ناتج method على str/bytes قبل استدعائها (_sized لا يرى إلا الناتج المبني)."""
+        if method == "join" and args:
+            items = args[0]
+            if isinstance(items, (list, tuple)):
+                self._check(self._total(items) + len(obj) * max(len(items) - 1, 0))
+            elif isinstance(items, (str, bytes, bytearray)):
+                self._check(len(items) * (len(obj) + 1))
+        elif method == "hex":
+            self._check(3 * len(obj) if args else 2 * len(obj))  # مع فاصل: حرفان وفاصل لكل بايت
+        elif method == "encode":
+            # utf-8 حتى 4 بايت للحرف، و unicode-escape حتى 10 (\U0001f600)
+            self._check(len(obj) * 10 if "escape" in str(args[0] if args else "") else len(obj) * 4)
+        elif method == "split":
+            sep = args[0] if args else None
+            count = len(obj) // 2 + 1 if sep is None else (obj.count(sep) + 1 if sep else 1)
+            self._check(count, self.max_items)
+
+    def _precheck_call(self, name: str, args: list) -> None:
+        """نفسه للدوال النقية: عدد العناصر وحجم الناتج قبل بنائه."""
+        first = args[0] if args else None
+        if name in ("list", "tuple", "sorted", "reversed") and hasattr(first, "__len__"):
+            self._check(len(first), self.max_items)
+        elif name == "zip" and args and all(hasattr(a, "__len__") for a in args):
+            self._check(min(len(a) for a in args), self.max_items)
+        elif name in ("bytes", "bytearray") and isinstance(first, (list, tuple, bytes, bytearray)):
+            self._check(len(first))
+        elif name == "sum" and isinstance(first, (list, tuple)):
+            # sum(قوائم, []) يبني قائمة بطول مجموع أطوالها
+            self._check(sum(len(x) for x in first if isinstance(x, (list, tuple))), self.max_items)
+        elif name == "str" and isinstance(first, (list, tuple, dict)):
+            # repr قائمة: على الأقل 3 أحرف لكل عنصر (", " والقيمة)
+            self._check(3 * len(first) + self._total(first))
+
+    @staticmethod
+    def _data(value):
+        # قيمة بيانات فقط، لا مرجع دالة أو وحدة (حتى لا تصل الـ Refs إلى دوال حقيقية)
+        if isinstance(value, (Ref, _Bound, _Lambda)):
+            raise FoldError("not a data value")
+        if isinstance(value, _DATA) or pymarshal.is_code(value):
+            return value
+        raise FoldError("not a data value")
+
+
+class _Unknown:
+    def __repr__(self) -> str:
+        return "<unknown>"
+
+
+_UNKNOWN = _Unknown()
+
+
+def _sink_name(folder: Folder, call: ast.Call) -> Optional[str]:
+    try:
+        func = folder.fold(call.func)
+    except Exception:
+        return None
+    return func.name if isinstance(func, Ref) and func.name in SINKS else None
+
+
+def _assigned(nodes: List[ast.AST]) -> Iterator[str]:
+    for stmt in nodes:
+        for node in ast.walk(stmt):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                yield node.id
+
+
+def _as_output(value) -> Optional[object]:
+    if isinstance(value, str):
+        return value.encode("utf-8", errors="surrogatepass")
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if pymarshal.is_code(value):
+        return value
+    return None
+
+
+def fold_source(source: Union[str, bytes], max_steps: int = MAX_STEPS) -> List[Folded]:
+    """
+    Statically resolve the argument of every exec/eval/compile/marshal.loads
+    call in source, in source order. Only the outermost sink that folds is
+    reported (exec(marshal.loads(...)) gives the code object, not also the
+    marshal bytes). Nothing from the sample is executed.
+    """
+    if isinstance(source, bytes):
+        try:
+            source = source.decode("utf-8")
+        except UnicodeDecodeError:
+            source = source.decode("latin-1")
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return []
+    folder = Folder(max_steps)
+    found: List[Folded] = []
+
+    def visit(node: ast.AST) -> None:
+        if isinstance(node, ast.Call) and node.args:
+            sink = _sink_name(folder, node)
+            if sink is not None:
+                try:
+                    value = _as_output(folder.fold(node.args[0]))
+                except Exception:
+                    value = None
+                if value is not None:
+                    found.append(Folded(sink, node.lineno, value))
+                    return
+        for child in ast.iter_child_nodes(node):
+            visit(child)
+
+    def header(stmt: ast.stmt) -> None:
+        # تعابير رأس الجملة المركّبة فقط (الشرط، iter، with items...)؛ الأجسام تمر عبر run بترتيبها
+        for child in ast.iter_child_nodes(stmt):
+            if not isinstance(child, (ast.stmt, ast.excepthandler)):
+                visit(child)
+
+    def run(stmts: List[ast.stmt]) -> None:
+        for stmt in stmts:
+            if isinstance(stmt, (ast.For, ast.AsyncFor, ast.While)):
+                # قيم متغيرة داخل الحلقة: تُنسى قبل الجسم وبعده
+                targets = [stmt.target] if isinstance(stmt, (ast.For, ast.AsyncFor)) else []
+                changed = list(_assigned(stmt.body + stmt.orelse + targets))
+                header(stmt)
+                folder.forget(changed)
+                run(stmt.body + stmt.orelse)
+                folder.forget(changed)
+            elif isinstance(stmt, (ast.If, ast.Try, ast.With, ast.AsyncWith)):
+                header(stmt)
+                blocks = [getattr(stmt, "body", []), getattr(stmt, "orelse", [])] + \
+                    [h.body for h in getattr(stmt, "handlers", [])] + [getattr(stmt, "finalbody", [])]
+                for block in blocks:
+                    run(block)
+                if isinstance(stmt, ast.Try) or isinstance(stmt, ast.If) and stmt.orelse:
+                    folder.forget(_assigned([s for block in blocks for s in block]))
+            elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                # الجسم بنطاق مؤقت: ما يُسند داخله لا يغيّر أسماء الوحدة
+                header(stmt)
+                saved = dict(folder.env)
+                run(stmt.body)
+                folder.env = saved
+                folder.bind(stmt)
+            else:
+                try:
+                    visit(stmt)
+                except RecursionError:
+                    pass
+                folder.bind(stmt)
+
+    run(tree.body)
+    return found
+
+
+def fold_outputs(data: bytes) -> List[Tuple[str, object]]:
+    """(label, value) لكل sink مطوي، بشكل مخرجات التحويلات: fold:exec، fold:marshal.loads..."""
+    if not has_sink(data):
+        return []
+    return [(f"fold:{f.sink}", f.value) for f in fold_source(data)]
+
+
+# فحص انحدار (--check): كل عينة تبني قيمة أكبر بكثير من ITSH_MAX_OUTPUT_MB من قطع صغيرة،
+# فيجب أن تُرفض قبل بنائها لا بعده (join لـ 3000 نسخة من 1MB بلغ 2.9GB قبل التقدير المسبق)
+HOSTILE = (
+    b's = "A" * 1000000\nexec("".join([s] * 3000))\n',
+    b's = b"A" * 1000000\nexec(b"".join(x for x in [s] * 3000))\n',
+    b's = "A" * 1000000\nexec("".join(map(lambda x: x, [s] * 3000)))\n',
+    b's = "A" * 1000000\nexec(s + s + s + s + s + s + s + s)\n',
+    b'exec(bytes(sum([[65] * 100000] * 3000, [])))\n',
+    b's = "A" * 1000000\nexec("".join(list(s * 3)))\n',
+)
+
+
+def check_hostile() -> List[str]:
+    """Fold every HOSTILE sample under a 2MB output cap; returns the ones that folded anyway."""
+    from .limits import MAX_OUTPUT_ENV
+
+    saved = os.environ.get(MAX_OUTPUT_ENV)
+    os.environ[MAX_OUTPUT_ENV] = "2"
+    try:
+        return [sample.decode("ascii") for sample in HOSTILE if fold_source(sample)]
+    finally:
+        if saved is None:
+            os.environ.pop(MAX_OUTPUT_ENV, None)
+        else:
+            os.environ[MAX_OUTPUT_ENV] = saved
+
+
+def write_folded(path: str, results: List[Folded], out_dir: Optional[str] = None) -> List[str]:
+    """
+    Write each folded value of path as <stem>.fold<N>.py (bytes) or
+    <stem>.fold<N>.dis.txt/.dis.json (code objects), next to path or in
+    out_dir. Returns the written paths, one per result.
+    """
+    from .disasm import write_disassembly
+
+    base = os.path.join(out_dir or os.path.dirname(path), os.path.splitext(os.path.basename(path))[0])
+    written = []
+    for n, res in enumerate(results, 1):
+        stem = f"{base}.fold{n}"
+        if pymarshal.is_code(res.value):
+            written.append(write_disassembly(res.value, stem, header=f"# {res.sink} at line {res.lineno}\n")[0])
+        else:
+            with open(stem + ".py", "wb") as f:
+                f.write(res.value)
+            written.append(stem + ".py")
+    return written
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.fold",
+                                     description="statically fold exec/eval/marshal.loads arguments")
+    parser.add_argument("paths", nargs="*", metavar="PATH")
+    parser.add_argument("-o", "--out", help="write each folded value here (default: report only)")
+    parser.add_argument("--check", action="store_true", help="verify the size limits against HOSTILE samples")
+    args = parser.parse_args(argv)
+    if args.check:
+        failed = check_hostile()
+        for sample in failed:
+            print(f"FAIL {sample!r}")
+        print(f"{len(HOSTILE) - len(failed)}/{len(HOSTILE)} hostile samples refused", file=sys.stderr)
+        return 1 if failed else 0
+    if not args.paths:
+        parser.error("PATH is required")
+    from .cli import iter_inputs
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    files = found = 0
+    for path in iter_inputs(args.paths):
+        files += 1
+        with open(path, "rb") as f:
+            results = fold_source(f.read())
+        found += len(results)
+        outs = write_folded(path, results, args.out) if args.out else ["-"] * len(results)
+        for res, out in zip(results, outs):
+            kind, size = ("code", "-") if pymarshal.is_code(res.value) else ("bytes", len(res.value))
+            print(f"{path}:{res.lineno}\t{res.sink}\t{kind}\t{size}\t{out}")
+    print(f"{found} sinks folded in {files} files", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
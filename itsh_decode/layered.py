@@ -0,0 +1,496 @@
+"""
+layered.py
+منطق الخيار 1 (lamed_zlib_Base64): فك طبقات base16/reverse/base64/zlib/marshal
+لكل ملف، وإرجاع مدخلات الأرشيف بدل كتابتها مباشرة، حتى يمكن تشغيله في
+عمليات متوازية مع كاتب أرشيف واحد.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import marshal
+import os
+import re
+import shutil
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import disasm, pymarshal
+from .cache import DecodeCache, layer_hash, open_cache
+from .classify import header_kind, rank_transforms
+from .limits import DecompressionLimit
+from .locator import ALNUM, B64, B64URL, HEX, MIXED, BlobIndex, scan_blobs
+from .stream import TRUNCATED, cleanup_layer_tmp, decompress_bounded, stream_decode_layers
+from .telemetry import Step, Telemetry, resolve as resolve_telemetry
+
+# بيانات مدخل في الأرشيف: bytes، أو مسار ملف طبقة على القرص (للملفات الكبيرة)
+EntryData = Union[bytes, Path]
+
+MAX_LAYERS = 10
+MAX_FILE_BYTES = 10 * 1024 * 1024  # الملفات الأكبر من 10MB تُفك بشكل متدفّق على القرص
+MIN_B64_MATCH_LEN = 80
+_STD_B64_RE = re.compile(rb"[A-Za-z0-9+/]{%d,}={0,2}" % MIN_B64_MATCH_LEN)
+CACHE_PREFIX = "layered:"  # تحويلات الخيار 1 في الكاش منفصلة عن تحويلات المحرّك بنفس الاسم
+
+
+def _hex_text(index: BlobIndex) -> Optional[bytes]:
+    # أول b'<hex>'، وإلا أول سلسلة hex طويلة (بلا أسطر وحشو حتى تقبلها unhexlify)
+    run = next((r for r in index.select((HEX,), quoted=True) if index.bytes_literal(r)), None)
+    run = run or index.first((HEX,), min_len=64)
+    return index.text(run).translate(None, b"\r\n=") if run else None
+
+
+def try_b16_rev(data: bytes, index: Optional[BlobIndex] = None) -> Optional[bytes]:
+    try:
+        hexs = _hex_text(index or scan_blobs(data))
+        if not hexs:
+            return None
+        rev = hexs[::-1]
+        return binascii.unhexlify(rev)
+    except Exception:
+        return None
+
+
+def try_b16(data: bytes, index: Optional[BlobIndex] = None) -> Optional[bytes]:
+    try:
+        hexs = _hex_text(index or scan_blobs(data))
+        if not hexs:
+            return None
+        return binascii.unhexlify(hexs)
+    except Exception:
+        return None
+
+
+def _b64_text(index: BlobIndex) -> Optional[bytes]:
+    # أول سلسلة base64؛ في سلسلة فيها - أو _ أول مقطع بالأبجدية القياسية فقط، كما كان تعبير الأداة
+    for run in index.select((HEX, ALNUM, B64, B64URL, MIXED), min_len=MIN_B64_MATCH_LEN):
+        text = index.text(run)
+        if run.cls in (B64URL, MIXED):
+            m = _STD_B64_RE.search(text)
+            if not m:
+                continue
+            text = m.group(0)
+        return text
+    return None
+
+
+def try_base64(data: bytes, index: Optional[BlobIndex] = None) -> Optional[bytes]:
+    try:
+        b64 = _b64_text(index or scan_blobs(data))
+        if not b64:
+            return None
+        return base64.b64decode(b64)
+    except Exception:
+        return None
+
+
+def try_zlib(data: bytes) -> Optional[bytes]:
+    # DecompressionLimit يمر للمستدعي حتى تُسجَّل الطبقة كمبتورة
+    try:
+        return decompress_bounded("zlib", data)
+    except DecompressionLimit:
+        raise
+    except Exception:
+        return None
+
+
+def try_marshal(data: bytes) -> Optional[Tuple[object, str]]:
+    try:
+        obj = marshal.loads(data)
+        return obj, repr(obj)
+    except Exception:
+        pass
+    # صيغة marshal لإصدار بايثون آخر
+    try:
+        obj = pymarshal.loads(data)
+        return obj, repr(obj)
+    except Exception:
+        return None
+
+
+def readable_path_for_zip(input_path: str, root_base: str) -> str:
+    """
+    Returns a relative path used inside the ZIP to avoid absolute paths.
+    root_base is the base folder the user started from (or ''), used to keep structure sensible.
+    """
+    # make relative if possible
+    try:
+        if root_base:
+            rel = os.path.relpath(input_path, root_base)
+        else:
+            rel = os.path.basename(input_path)
+    except Exception:
+        rel = os.path.basename(input_path)
+    return rel.replace(os.sep, "/")
+
+
+def cached_step(cache: Optional[DecodeCache], transform: str, fn: Callable[[bytes], Optional[bytes]],
+                data: bytes, key: Optional[str] = None) -> Optional[bytes]:
+    if cache is None:
+        return fn(data)
+    # مفتاح الكاش خاص بهذا التنفيذ: base64 هنا أول run، وفي المحرّك أطولها (urlsafe وتصحيح الحشو)
+    return cache.memo(CACHE_PREFIX + transform, fn, data, key)
+
+
+def marshal_entry(rel: str, layer: int, mres: Tuple[object, str]) -> Tuple[List[Tuple[str, bytes]], str]:
+    """
+    ([(entry_name, data), ...], report_line) for a marshal result: the
+    disassembly of every nested code object (.dis.txt and/or .dis.json per
+    $ITSH_DIS_FORMAT) for code, the repr otherwise.
+    """
+    obj, reprtext = mres
+    if pymarshal.is_code(obj):
+        stem = f"{rel}/layer{layer:02d}.marshal"
+        try:
+            named = disasm.disassembly_outputs(obj, stem, header=f"# code object (layer {layer})\n")
+        except Exception as e:
+            text = f"# فشل الحصول على disassembly: {e}\n{reprtext}\n"
+            named = [(stem + ".dis.txt", text.encode("utf-8", errors="ignore"))]
+        return named, f"حُفظت disassembly: {', '.join(name for name, _ in named)}"
+    entry_name = f"{rel}/layer{layer:02d}.marshal_repr.txt"
+    return [(entry_name, reprtext.encode("utf-8", errors="ignore"))], f"حُفظ تمثيل marshal: {entry_name}"
+
+
+def finish_report(rel: str, input_path: str, report_lines: List[str], saved_entries: List[str],
+                  layer: int) -> Tuple[str, bytes]:
+    # الخاتمة للتقرير
+    report_lines.append("\n=== الخلاصة ===")
+    report_lines.append(f"مجموع الطبقات المحاولة: {layer}")
+    if saved_entries:
+        report_lines.append("المدخلات المخزنة داخل الأرشيف:")
+        for s in saved_entries:
+            report_lines.append("  - " + s)
+    else:
+        report_lines.append("لم يُنتج أي مدخل مفكوك داخل الأرشيف.")
+
+    # احفظ التقرير داخل الأرشيف
+    report_text = "\n".join(report_lines)
+    report_entry = f"{rel}/report.txt"
+    print(f"[إنهاء] عالجت {input_path} -> التقرير داخل: {report_entry}")
+    return report_entry, report_text.encode("utf-8", errors="ignore")
+
+
+def decode_file_entries(input_path: str, root_base: str = "", cache_path: Optional[str] = None,
+                        telemetry: Union[str, Telemetry, None] = None) -> List[Tuple[str, EntryData]]:
+    """
+    Process one file and return all outputs as (entry_name, data) pairs.
+    All entries are named under a directory named after the input file (relative).
+    Nothing is written here, so the function can run in a worker process while
+    a single writer owns the ZipFile. Data is bytes, or a Path to a layer file
+    on disk for inputs larger than MAX_FILE_BYTES (see write_entries).
+    With cache_path (or $ITSH_CACHE) every step is looked up by layer hash
+    before it is decoded again. With telemetry (a Telemetry, a JSONL path
+    or $ITSH_TELEMETRY) every step is recorded as a timed event.
+    """
+    entries: List[Tuple[str, EntryData]] = []
+    tel = resolve_telemetry(telemetry)
+    # الملفات الكبيرة تُفك بشكل متدفّق بدل تحميلها في الذاكرة
+    try:
+        st = os.stat(input_path)
+        if st.st_size > MAX_FILE_BYTES:
+            return stream_file_entries(input_path, root_base, st.st_size, tel)
+    except OSError:
+        pass
+
+    try:
+        with open(input_path, "rb") as f:
+            original = f.read()
+    except Exception as e:
+        err = f"[خطأ] تعذّر قراءة الملف {input_path}: {e}"
+        print(err)
+        rel = readable_path_for_zip(input_path, root_base)
+        entries.append((f"{rel}/ERROR_reading.txt", err.encode("utf-8", errors="ignore")))
+        return entries
+
+    rel = readable_path_for_zip(input_path, root_base)
+    report_lines = []
+    saved_entries = []
+
+    report_lines.append(f"Input file: {input_path}")
+    report_lines.append(f"Size: {len(original)} bytes\n")
+
+    # Save the original (only if not huge) as .original.txt for inspection
+    entries.append((f"{rel}/original.bin", original))
+    saved_entries.append(f"{rel}/original.bin")
+
+    cache = open_cache(cache_path)
+    current = original
+    layer = 0
+    truncated = []
+
+    def step(transform: str, fn: Callable[[bytes], Optional[bytes]], data: bytes,
+             key: Optional[str] = None) -> Optional[bytes]:
+        try:
+            with Step(tel, input_path, layer, transform, data, cache) as s:
+                s.out = cached_step(cache, transform, fn, data, key)
+        except DecompressionLimit as e:
+            # حد فك الضغط: الناتج الجزئي يُحفظ كطبقة مبتورة بعد طبقة مدخله وتتوقف طبقات هذا الملف
+            n = layer if data is current else layer + 1
+            entry_name = f"{rel}/layer{n:02d}.{e.kind}{TRUNCATED}.bin"
+            truncated.append((entry_name, e.partial))
+            report_lines.append(f"أُوقف {e.kind} عند حد فك الضغط ({e}) -> الناتج الجزئي في: {entry_name}")
+            return None
+        return s.out
+
+    for i in range(MAX_LAYERS):
+        if truncated:
+            break
+        layer += 1
+        report_lines.append(f"\n--- محاولة طبقة {layer} ---")
+        succeeded = False
+        key = layer_hash(current) if cache else None
+        # مسح واحد للطبقة، وكل المحاولات تختار من الفهرس
+        index = scan_blobs(current)
+        # المصنّف يحدد أي المحاولات يمكن أن تنجح؛ الباقي يُتخطى دون فك
+        decision = rank_transforms(current, index)
+        likely = {name for name, _ in decision["ranked"]}
+        report_lines.append(f"المصنّف: {', '.join(sorted(likely)) or '-'} ({decision['elapsed'] * 1e6:.0f} µs)")
+
+        # reverse base16
+        res = None
+        if "base16" in likely:
+            res = step("b16_rev", lambda d: try_b16_rev(d, index), current, key)
+        if res:
+            report_lines.append(f"وجدت سلسلة base16 محتملة مع عكس. حجم بعد unhex: {len(res)}")
+            # اختبر zlib
+            z = step("zlib", try_zlib, res) if header_kind(res[:8]) == "zlib" else None
+            if z:
+                entry_name = f"{rel}/layer{layer:02d}.reverse_base16_then_zlib.bin"
+                entries.append((entry_name, z))
+                saved_entries.append(entry_name)
+                report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
+                current = z
+                succeeded = True
+                continue
+            else:
+                entry_name = f"{rel}/layer{layer:02d}.reverse_base16.bin"
+                entries.append((entry_name, res))
+                saved_entries.append(entry_name)
+                report_lines.append(f"حُفظت نتيجة reverse+base16: {entry_name}")
+                current = res
+                succeeded = True
+                continue
+
+        # base16
+        if "base16" in likely:
+            res = step("b16", lambda d: try_b16(d, index), current, key)
+        if res:
+            report_lines.append(f"وجدت base16 (بدون عكس). حجم after unhex: {len(res)}")
+            z = step("zlib", try_zlib, res) if header_kind(res[:8]) == "zlib" else None
+            if z:
+                entry_name = f"{rel}/layer{layer:02d}.base16_then_zlib.bin"
+                entries.append((entry_name, z))
+                saved_entries.append(entry_name)
+                report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
+                current = z
+                succeeded = True
+                continue
+            else:
+                entry_name = f"{rel}/layer{layer:02d}.base16.bin"
+                entries.append((entry_name, res))
+                saved_entries.append(entry_name)
+                report_lines.append(f"حُفظت نتيجة base16: {entry_name}")
+                current = res
+                succeeded = True
+                continue
+
+        # base64
+        if "base64" in likely:
+            res = step("base64", lambda d: try_base64(d, index), current, key)
+        if res:
+            report_lines.append(f"وجدت base64. حجم بعد decode: {len(res)}")
+            z = step("zlib", try_zlib, res) if header_kind(res[:8]) == "zlib" else None
+            if z:
+                entry_name = f"{rel}/layer{layer:02d}.base64_then_zlib.bin"
+                entries.append((entry_name, z))
+                saved_entries.append(entry_name)
+                report_lines.append(f"نجح zlib -> حفظ في: {entry_name}")
+                current = z
+                succeeded = True
+                continue
+            else:
+                entry_name = f"{rel}/layer{layer:02d}.base64.bin"
+                entries.append((entry_name, res))
+                saved_entries.append(entry_name)
+                report_lines.append(f"حُفظت نتيجة base64: {entry_name}")
+                current = res
+                succeeded = True
+                continue
+
+        # zlib directly
+        if "zlib" in likely:
+            res = step("zlib", try_zlib, current, key)
+        if res:
+            entry_name = f"{rel}/layer{layer:02d}.zlib.bin"
+            entries.append((entry_name, res))
+            saved_entries.append(entry_name)
+            report_lines.append(f"نجح zlib مباشرة -> حفظ في: {entry_name} (حجم: {len(res)})")
+            current = res
+            succeeded = True
+            continue
+
+        if truncated:
+            break
+
+        # marshal.loads attempt (ثابت فقط)
+        mres = None
+        if "marshal" in likely:
+            with Step(tel, input_path, layer, "marshal", current) as s:
+                s.out = mres = try_marshal(current)
+        if mres:
+            report_lines.append("نجح marshal.loads على البايتات.")
+            named, note = marshal_entry(rel, layer, mres)
+            entries.extend(named)
+            saved_entries.extend(name for name, _ in named)
+            report_lines.append(note)
+            succeeded = True
+            # لا نغيّر current دائماً بعد marshal (قد يكون تمثيلا مستقلا)
+            continue
+
+        # لا شيء اكتُشف
+        report_lines.append("لم تُكتَشف أي عملية مفكوك معروفة (base16/reverse/base64/zlib/marshal). التوقف.")
+        break
+
+    for entry_name, partial in truncated:
+        entries.append((entry_name, partial))
+        saved_entries.append(entry_name)
+    if cache:
+        cache.flush()
+    entries.append(finish_report(rel, input_path, report_lines, saved_entries, layer))
+    return entries
+
+
+def stream_file_entries(input_path: str, root_base: str, size: int,
+                        tel: Optional[Telemetry] = None) -> List[Tuple[str, EntryData]]:
+    """
+    Bounded-memory variant of decode_file_entries for large inputs: every
+    layer is streamed to a temp file and returned as a Path entry.
+    """
+    rel = readable_path_for_zip(input_path, root_base)
+    report_lines = [f"Input file: {input_path}", f"Size: {size} bytes (فك متدفّق)\n"]
+    entries: List[Tuple[str, EntryData]] = [(f"{rel}/original.bin", Path(input_path))]
+    saved_entries = [f"{rel}/original.bin"]
+
+    try:
+        workdir, layers = stream_decode_layers(input_path, MAX_LAYERS, telemetry=tel)
+    except Exception as e:
+        err = f"[خطأ] تعذّر فك الملف {input_path}: {e}"
+        print(err)
+        return [(f"{rel}/ERROR_reading.txt", err.encode("utf-8", errors="ignore"))]
+
+    layer = 0
+    for label, layer_path in layers:
+        layer += 1
+        entry_name = f"{rel}/layer{layer:02d}.{label}.bin"
+        entries.append((entry_name, Path(layer_path)))
+        saved_entries.append(entry_name)
+        report_lines.append(f"\n--- محاولة طبقة {layer} ---")
+        report_lines.append(f"نجح {label} -> حفظ في: {entry_name} (حجم: {os.path.getsize(layer_path)})")
+
+    # marshal يحتاج البايتات كاملة، فنجربه فقط إذا صغرت الطبقة الأخيرة بما يكفي
+    last = layers[-1][1] if layers else input_path
+    layer += 1
+    report_lines.append(f"\n--- محاولة طبقة {layer} ---")
+    mres = None
+    if os.path.getsize(last) <= MAX_FILE_BYTES:
+        with open(last, "rb") as f:
+            data = f.read()
+        with Step(tel, input_path, layer, "marshal", data) as s:
+            s.out = mres = try_marshal(data)
+    if mres:
+        report_lines.append("نجح marshal.loads على البايتات.")
+        named, note = marshal_entry(rel, layer, mres)
+        entries.extend(named)
+        saved_entries.extend(name for name, _ in named)
+        report_lines.append(note)
+    else:
+        report_lines.append("لم تُكتَشف أي عملية مفكوك معروفة (base16/reverse/base64/zlib/marshal). التوقف.")
+    if not layers:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    entries.append(finish_report(rel, input_path, report_lines, saved_entries, layer))
+    return entries
+
+
+def write_entries(ziph: zipfile.ZipFile, entries: List[Tuple[str, EntryData]]) -> None:
+    """
+    Write decode_file_entries output into ziph. Path entries are streamed
+    from disk in chunks and their temp layer directory is removed afterwards.
+    """
+    for name, data in entries:
+        if isinstance(data, Path):
+            with open(data, "rb") as src, ziph.open(name, "w", force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        else:
+            ziph.writestr(name, data)
+    for name, data in entries:
+        if isinstance(data, Path):
+            cleanup_layer_tmp(str(data))
+
+
+def layer_labels(entries: List[Tuple[str, EntryData]]) -> List[str]:
+    """أسماء الطبقات بالترتيب: layer01.base64_then_zlib.bin -> base64_then_zlib."""
+    return [name.rsplit("/", 1)[-1].split(".", 1)[1].rsplit(".", 1)[0]
+            for name, _ in entries if name.rsplit("/", 1)[-1].startswith("layer")]
+
+
+def iter_py_files(path: str, root_base: str = "") -> Iterator[Tuple[str, str]]:
+    """(input_path, root_base) لكل ملف .py تحت path، بنفس منطق walk_and_process_into_zip."""
+    if os.path.isfile(path):
+        if path.lower().endswith(".py"):
+            yield path, root_base
+        else:
+            print(f"[تخطي] ليس ملف Python: {path}")
+        return
+
+    for root, dirs, files in os.walk(path):
+        for fn in files:
+            if fn.lower().endswith(".py"):
+                yield os.path.join(root, fn), root
+
+
+def decode_many(jobs: Iterable[Tuple[str, str]], workers: int = 1, cache_path: Optional[str] = None,
+                telemetry: Union[str, Telemetry, None] = None
+                ) -> Iterator[Tuple[str, Optional[List[Tuple[str, EntryData]]], Optional[Exception]]]:
+    """
+    Run decode_file_entries over jobs and yield (input_path, entries, error).
+    With workers > 1 the files are decoded in a process pool and yielded in
+    completion order; at most workers * 4 files are in flight so memory stays
+    bounded on large drops. The caller stays the only writer of the archive.
+    Workers get telemetry as its JSONL path and append to the same file.
+    """
+    if workers <= 1:
+        for full, root_base in jobs:
+            print(f"[بدء] معالجة الملف: {full}")
+            try:
+                entries, err = decode_file_entries(full, root_base, cache_path, telemetry), None
+            except Exception as e:
+                entries, err = None, e
+            yield full, entries, err
+        return
+
+    jobs = iter(jobs)
+    if isinstance(telemetry, Telemetry):
+        telemetry = telemetry.path
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        while True:
+            while len(pending) < workers * 4:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                print(f"[بدء] معالجة الملف: {job[0]}")
+                pending[pool.submit(decode_file_entries, *job, cache_path, telemetry)] = job[0]
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                full = pending.pop(fut)
+                try:
+                    entries, err = fut.result(), None
+                except Exception as e:
+                    entries, err = None, e
+                yield full, entries, err
@@ -0,0 +1,74 @@
+"""
+limits.py
+حدود فك الضغط (حماية من decompression bombs): أقصى حجم ناتج لكل خطوة
+zlib/bz2/lzma، وأقصى نسبة توسّع (الناتج ÷ الداخل). كل فك ضغط في الأداة يمر
+عبر stream.iter_decompress / stream.decompress_bounded التي تفك على دفعات
+وتتوقف برفع DecompressionLimit عند تجاوز أي حد، فتُسجَّل العينة كمبتورة
+ويكمل التشغيل باقي الملفات.
+
+الإعداد عبر متغيرات البيئة (فترثها عمليات الـ pool):
+    ITSH_MAX_OUTPUT_MB  (الافتراضي 512؛ وهو أيضاً أقصى مجموع لأعضاء أرشيف zip واحد)
+    ITSH_MAX_RATIO      (الافتراضي 1000؛ 0 = بلا حد)
+    ITSH_MAX_MEMBERS    (الافتراضي 10000: أقصى عدد أعضاء zip مع المتداخل)
+"""
+
+from __future__ import annotations
+
+import os
+from typing import NamedTuple, Optional
+
+MAX_OUTPUT_ENV = "ITSH_MAX_OUTPUT_MB"
+MAX_RATIO_ENV = "ITSH_MAX_RATIO"
+MAX_MEMBERS_ENV = "ITSH_MAX_MEMBERS"
+DEFAULT_MAX_OUTPUT = 512 * 1024 * 1024
+DEFAULT_MAX_RATIO = 1000.0
+DEFAULT_MAX_MEMBERS = 10000
+# نسبة التوسّع لا تُفحص قبل هذا الحجم: payloads صغيرة متكررة تنضغط بنسب عالية بشكل طبيعي
+RATIO_MIN_OUTPUT = 4 * 1024 * 1024
+
+
+class Limits(NamedTuple):
+    max_output: int
+    max_ratio: float  # 0 = بلا حد
+    max_members: int = DEFAULT_MAX_MEMBERS
+
+
+class DecompressionLimit(Exception):
+    """A decompression step produced more than the configured limits allow."""
+
+    def __init__(self, kind: str, reason: str, produced: int, consumed: int, partial: bytes = b""):
+        super().__init__(f"{kind}: {reason} (produced {produced} bytes from {consumed})")
+        self.kind = kind
+        self.reason = reason
+        self.produced = produced
+        self.consumed = consumed
+        self.partial = partial
+
+
+def current_limits() -> Limits:
+    mb = os.environ.get(MAX_OUTPUT_ENV)
+    ratio = os.environ.get(MAX_RATIO_ENV)
+    members = os.environ.get(MAX_MEMBERS_ENV)
+    return Limits(int(float(mb) * 1024 * 1024) if mb else DEFAULT_MAX_OUTPUT,
+                  float(ratio) if ratio else DEFAULT_MAX_RATIO,
+                  int(members) if members else DEFAULT_MAX_MEMBERS)
+
+
+def configure(max_output_mb: Optional[float] = None, max_ratio: Optional[float] = None,
+              max_members: Optional[int] = None) -> Limits:
+    """يضبط الحدود لهذه العملية وأي عمليات فرعية تُنشأ بعدها."""
+    if max_output_mb is not None:
+        os.environ[MAX_OUTPUT_ENV] = str(max_output_mb)
+    if max_ratio is not None:
+        os.environ[MAX_RATIO_ENV] = str(max_ratio)
+    if max_members is not None:
+        os.environ[MAX_MEMBERS_ENV] = str(max_members)
+    return current_limits()
+
+
+def check(kind: str, produced: int, consumed: int, limits: Limits) -> None:
+    """يرفع DecompressionLimit إن تجاوز الناتج الحجم أو نسبة التوسّع."""
+    if produced > limits.max_output:
+        raise DecompressionLimit(kind, f"output over {limits.max_output} bytes", produced, consumed)
+    if limits.max_ratio and produced > RATIO_MIN_OUTPUT and produced > limits.max_ratio * max(consumed, 1):
+        raise DecompressionLimit(kind, f"expansion ratio over {limits.max_ratio:g}", produced, consumed)
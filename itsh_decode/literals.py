@@ -0,0 +1,305 @@
+"""
+literals.py
+فهرس لكل literal نصي (str/bytes) في المصدر، يُبنى بمرور واحد على النص
+وتستعلم منه كل خيارات الفك بدل أن يعيد كل خيار مسح النص بـ str.find أو
+تعبير خاص به (QUOTED_RE، VAR_ASSIGN_RE، B64_PATTERN) أو ast.parse للملف كله.
+
+لكل literal: موضعه بالبايت، نوعه، المتغير المُسنَد إليه (x = '...')،
+الاستدعاءات المحيطة به من الأقرب للأبعد (base64.b64decode ثم exec)، ونسبة
+أحرفه من أبجدية base64 ومن أبجدية hex. الـ literals المتجاورة ('a' 'b')
+تُدمج كما يدمجها بايثون.
+
+التقطيع يتبع قواعد tokenize للسلاسل (البادئات، الهروب، التنصيص الثلاثي،
+التعليقات) في تعبير منتظم واحد على bytes أو mmap: وحدة tokenize نفسها تنشئ
+كائناً لكل token وهي أبطأ بأضعاف من QUOTED_RE على الملفات الكبيرة، وتتوقف
+عند أول خطأ. هنا ما ليس سلسلة أو اسماً مُسنداً أو استدعاءً أو قوساً يتخطاه
+re دون المرور ببايثون، والمدخل غير الصالح (dump ثنائي، ملف مقطوع) يُفهرس
+بنفس الطريقة.
+
+    python -m itsh_decode.literals obf.py [--min-len 200] [--call b64decode] [--min-b64 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import keyword
+import re
+import sys
+from typing import Iterator, List, NamedTuple, Optional, Tuple, Union
+
+MIN_SCORED_LEN = 16  # أقصر من هذا لا يُعطى احتمال base64/hex
+MAX_CALLS = 8  # أعمق من هذا من الاستدعاءات المحيطة لا يُحفظ
+SCORE_WINDOW = 32 * 1024  # الاحتمال من أول وآخر 32KB فقط للـ literals الضخمة
+
+_B64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=-_"
+_HEX_ALPHABET = b"0123456789abcdefABCDEF"
+_WS = b" \t\r\n\\"
+# الاسم كاملاً فقط: بدون الحدّين يُعاد تجريب كل جزء منه (بطيء جداً في dump ثنائي)
+_IDENT = rb"(?<![A-Za-z0-9_\x80-\xff])[A-Za-z_\x80-\xff][A-Za-z0-9_\x80-\xff]*(?![A-Za-z0-9_\x80-\xff])"
+# السلاسل بصيغة "unrolled loop" (خطّية، بلا .*? ولا تناوب لكل حرف)، والـ
+# lookahead الأول يجعل re يقفز مباشرة إلى أول حرف يمكن أن يبدأ به token
+_LEX_RE = re.compile(rb"""
+  (?=[\#'"A-Za-z_\x80-\xff()\[\]{}])(?:
+    (?P<comment>\#[^\r\n]*)
+  | (?P<str>(?P<prefix>(?<![A-Za-z0-9_\x80-\xff])[rRbBuUfF]{1,2}|)
+        (?:'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''
+          |\"\"\"[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*\"\"\"
+          |'[^'\\\r\n]*(?:\\.[^'\\\r\n]*)*'
+          |"[^"\\\r\n]*(?:\\.[^"\\\r\n]*)*"))
+  | (?P<assign>(?P<target>IDENT)[ \t]*=(?!=))
+  | (?P<call>(?P<callee>(?:IDENT|[)\]])(?:[ \t]*\.[ \t]*IDENT)*)[ \t]*\()
+  | (?P<open>[(\[{])
+  | (?P<close>[)\]}])
+  )
+""".replace(b"IDENT", _IDENT), re.VERBOSE | re.DOTALL)
+_COMMENT_RE = re.compile(rb"#[^\r\n]*")
+
+Buffer = Union[bytes, "mmap.mmap"]  # noqa: F821
+
+
+class Literal(NamedTuple):
+    start: int                         # موضع البداية بالبايت (مع البادئة b/r)
+    end: int
+    line: int
+    kind: str                          # "str" أو "bytes"
+    raw: bytes                         # نص الـ literal في المصدر كما هو (مع التنصيص)
+    segments: Tuple[Tuple[int, int], ...]  # مواضع المحتوى داخل raw لكل جزء مدموج
+    name: Optional[str]                # x في x = '...'
+    calls: Tuple[str, ...]             # الاستدعاءات المحيطة، الأقرب أولاً
+    b64: float                         # نسبة أحرف أبجدية base64 (بدون المسافات)
+    hex: float
+
+    @property
+    def body(self) -> bytes:
+        """The literal's content as written (escapes not processed, pieces joined)."""
+        if len(self.segments) == 1:
+            a, b = self.segments[0]
+            return self.raw[a:b]
+        return b"".join(self.raw[a:b] for a, b in self.segments)
+
+    @property
+    def call(self) -> str:
+        """Innermost enclosing call, e.g. base64.b64decode ("" when not inside a call)."""
+        return self.calls[0] if self.calls else ""
+
+    def in_call(self, call: str, depth: int = 0) -> bool:
+        """Whether the enclosing call depth levels out (0: innermost) is call, by full or last dotted name."""
+        return depth < len(self.calls) and _callee_matches(self.calls[depth], call)
+
+    def value(self) -> Union[str, bytes]:
+        """The literal's Python value (escapes processed). ValueError if it has none."""
+        try:
+            return ast.literal_eval("(" + self.raw.decode("utf-8", errors="surrogateescape") + ")")
+        except (SyntaxError, ValueError, TypeError, MemoryError, RecursionError) as e:
+            raise ValueError(f"literal at {self.start}: {e}")
+
+    def compact(self) -> str:
+        """Content without whitespace, as text: the usual shape of a base64/hex payload."""
+        return "".join(self.body.decode("latin-1").split())
+
+
+def _callee_matches(callee: str, call: str) -> bool:
+    return callee == call or callee.endswith("." + call)
+
+
+class LiteralIndex:
+    """All string/bytes literals of one input, in source order."""
+
+    def __init__(self, literals: List[Literal]):
+        self.literals = literals
+
+    def __iter__(self) -> Iterator[Literal]:
+        return iter(self.literals)
+
+    def __len__(self) -> int:
+        return len(self.literals)
+
+    def select(self, min_len: int = 0, kind: Optional[str] = None, name: Optional[str] = None,
+               call: Optional[str] = None, within: Optional[str] = None,
+               min_b64: float = 0.0, min_hex: float = 0.0) -> List[Literal]:
+        """
+        Literals matching every given filter. call matches the innermost
+        enclosing call and within any enclosing call, both by full dotted
+        name or last component (b64decode matches base64.b64decode).
+        """
+        out = []
+        for lit in self.literals:
+            if lit.end - lit.start < min_len or (kind and lit.kind != kind) or (name and lit.name != name):
+                continue
+            if lit.b64 < min_b64 or lit.hex < min_hex:
+                continue
+            if call and not lit.in_call(call):
+                continue
+            if within and not any(_callee_matches(c, within) for c in lit.calls):
+                continue
+            out.append(lit)
+        return out
+
+    def assigned(self, name: str) -> Optional[Literal]:
+        """The first literal assigned to name."""
+        found = self.select(name=name)
+        return found[0] if found else None
+
+    def longest(self, **filters) -> Optional[Literal]:
+        found = self.select(**filters)
+        return max(found, key=lambda lit: len(lit.body)) if found else None
+
+
+def _scores(body: bytes) -> Tuple[float, float]:
+    if len(body) > 2 * SCORE_WINDOW:
+        body = body[:SCORE_WINDOW] + body[-SCORE_WINDOW:]
+    text = body.translate(None, _WS)
+    if len(text) < MIN_SCORED_LEN:
+        return 0.0, 0.0
+    n = len(text)
+    return 1.0 - len(text.translate(None, _B64_ALPHABET)) / n, 1.0 - len(text.translate(None, _HEX_ALPHABET)) / n
+
+
+def _is_fstring(prefix: bytes) -> bool:
+    return b"f" in prefix or b"F" in prefix
+
+
+def _segment(raw: bytes, a: int, b: int, p: int) -> Tuple[int, int]:
+    """مواضع محتوى الجزء raw[a:b] (بادئته p بايت) بلا البادئة والتنصيص."""
+    q = 3 if b - a - p >= 6 and raw[a + p:a + p + 3] in (b"'''", b'"""') else 1
+    return a + p + q, b - q
+
+
+def _make(data: Buffer, pieces: List[Tuple[int, int, bytes]], line: int, name: Optional[str],
+          calls: Tuple[str, ...]) -> Literal:
+    start, end = pieces[0][0], pieces[-1][1]
+    raw = data[start:end]
+    if len(pieces) == 1:
+        prefix = pieces[0][2]
+        segments = (_segment(raw, 0, end - start, len(prefix)),)
+        body = raw[segments[0][0]:segments[0][1]]
+    else:
+        prefix = b"".join(piece[2] for piece in pieces)
+        segments = tuple(_segment(raw, a - start, b - start, len(pre)) for a, b, pre in pieces)
+        body = b"".join(raw[a:b] for a, b in segments)
+    kind = "bytes" if b"b" in prefix or b"B" in prefix else "str"
+    b64, hx = _scores(body) if len(body) >= MIN_SCORED_LEN else (0.0, 0.0)
+    return Literal(start, end, line, kind, raw, segments, name, calls, b64, hx)
+
+
+def _lex(data: Buffer) -> List[Literal]:
+    literals: List[Literal] = []
+    # لكل قوس مفتوح: الاستدعاءات المحيطة عنده (الأقرب أولاً)، فلا يُمشى المكدس
+    # لكل literal (في dump ثنائي قد يبقى فيه مئات آلاف الأقواس مفتوحة)
+    stack: List[Tuple[str, ...]] = []
+    pending: List[Tuple[int, int, bytes]] = []  # (start, end, البادئة) لكل جزء
+    pending_line = 0
+    pending_name: Optional[str] = None
+    pending_calls: Tuple[str, ...] = ()
+    assign: Optional[str] = None      # x بعد "x =" (وبعد أقواس تفتح بعده مباشرة)
+    assign_end = 0
+    last_end = 0                      # نهاية آخر literal: 'a' 'b' تُدمج
+    line, line_pos = 1, 0
+
+    def flush() -> None:
+        if pending:
+            literals.append(_make(data, pending, pending_line, pending_name, pending_calls))
+            pending.clear()
+
+    for m in _LEX_RE.finditer(data):
+        kind = m.lastgroup
+        if kind == "comment":
+            continue
+        start, end = m.span()
+        if kind == "str":
+            prefix = m.group("prefix")
+            if prefix and _is_fstring(prefix):
+                flush()
+                assign = None
+                continue
+            if pending and _adjacent(data[last_end:start], bool(stack)):
+                pending.append((start, end, prefix))
+            else:
+                if pending:
+                    flush()
+                line += data[line_pos:start].count(b"\n")  # mmap بلا count(): نسخة الفجوة فقط
+                line_pos = start
+                pending_line = line
+                pending_name = assign if assign is not None and _blank(data[assign_end:start]) else None
+                pending_calls = stack[-1] if stack else ()
+                pending.append((start, end, prefix))
+            last_end = end
+            assign = None
+            continue
+        if pending:
+            flush()
+        if kind == "assign":
+            assign, assign_end = m.group("target").decode("utf-8", errors="replace"), end
+            continue
+        if kind == "call":
+            callee = b"".join(m.group("callee").split()).decode("utf-8", errors="replace")
+            if callee[0] in ")]":
+                # استدعاء نتيجة استدعاء: getattr(m, n)(...) أو __import__('zlib').decompress(...)
+                if stack:
+                    stack.pop()
+                callee = callee[1:] or "()"
+            outer = stack[-1] if stack else ()
+            stack.append(outer if keyword.iskeyword(callee) else ((callee,) + outer)[:MAX_CALLS])
+        elif kind == "open":
+            stack.append(stack[-1] if stack else ())
+            if assign is not None and data[start:end] == b"(" and _blank(data[assign_end:start]):
+                assign_end = end  # x = ('...' '...')
+                continue
+        elif stack:
+            stack.pop()
+        assign = None
+    flush()
+    return literals
+
+
+def _blank(gap: bytes) -> bool:
+    return not gap.strip()
+
+
+def _adjacent(gap: bytes, bracketed: bool) -> bool:
+    """هل يدمج بايثون literalين بينهما gap؟ خارج الأقواس السطر الجديد ينهي الجملة إلا بعد \\."""
+    if b"#" in gap:
+        gap = _COMMENT_RE.sub(b"", gap)
+    if gap.strip(_WS):
+        return False
+    return bracketed or b"\n" not in gap or b"\\" in gap
+
+
+def index_literals(data: Union[str, Buffer]) -> LiteralIndex:
+    """
+    Index every string/bytes literal of data (source text, bytes or an
+    mmap) in one lexing pass. Input that is not valid Python (a binary
+    dump, a truncated file) is indexed the same way: strings are only ever
+    closed by their own quotes, as the tokenizer does.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="surrogateescape")
+    return LiteralIndex(_lex(data))
+
+
+def index_file(path: str) -> LiteralIndex:
+    """index_literals over the file mapped read-only (only literal spans are copied)."""
+    from .mapped import map_file
+
+    with map_file(path) as data:
+        return index_literals(data)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.literals",
+                                     description="list the string/bytes literals of a file with their context")
+    parser.add_argument("path")
+    parser.add_argument("--min-len", type=int, default=0)
+    parser.add_argument("--call", help="innermost enclosing call, e.g. b64decode")
+    parser.add_argument("--min-b64", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    for lit in index_file(args.path).select(min_len=args.min_len, call=args.call, min_b64=args.min_b64):
+        print(f"{lit.line}\t0x{lit.start:x}\t{lit.kind}\t{len(lit.body)}\t{lit.b64:.2f}\t{lit.hex:.2f}\t"
+              f"{lit.name or '-'}\t{' < '.join(lit.calls) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
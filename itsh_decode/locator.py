@@ -0,0 +1,153 @@
+"""
+locator.py
+ماسح blobs بمرور واحد: يمشي على البافر مرة واحدة ويسجّل كل سلسلة hex أو
+base64 أو bytes literal محتملة مع موضعها وفئة أبجديتها، بدل أن يعيد كل
+محاول (try_b16_rev / try_b16 / try_base64 / ...) مسح البافر كاملاً بتعبيره.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+MIN_RUN_LEN = 16
+# تنوّع أبجدية payload حقيقي (has_payload): يُقاس على أول DIVERSITY_SAMPLE بايت من السلسلة
+DIVERSITY_SAMPLE = 256
+MIN_DISTINCT = 8
+MAX_PUNCT_RATIO = 0.2
+
+# الترتيب مهم: البدائل الأضيق أولاً (literal بهروب \x ثم b'<hex>') ثم أي سلسلة طويلة.
+# البديلان الأولان يبدآن بحرف b نفسه قبل الـ lookbehind: لا يُفحص الـ lookbehind في كل موضع
+# (على dumps ثنائية كبيرة المسح أسرع بنحو ثلاث مرات)
+_SCAN_RE = re.compile(rb"""
+    [bB](?<![A-Za-z0-9_][bB])(?:
+        (?P<esc>(?P<q>['"])(?=[^'"\n]{0,8}\\x)(?:\\.|(?!(?P=q))[^\\\n])*(?P=q))
+      | (?P<qhex>['"][0-9A-Fa-f]+['"]))
+  | (?P<run>[A-Za-z0-9+/_-][A-Za-z0-9+/_=\r\n-]{%d,})
+""" % (MIN_RUN_LEN - 1), re.VERBOSE)
+_INNER_PAD_RE = re.compile(rb"=+(?=[A-Za-z0-9+/_-])")
+
+_HEX = b"0123456789abcdefABCDEF"
+_DIGITS = b"0123456789"
+_LETTERS = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+_ALNUM = _LETTERS + _DIGITS
+_WS = b"\r\n="
+_QUOTES = b"'\""
+
+# فئات الأبجدية
+HEX = "hex"
+ALNUM = "alnum"        # أحرف وأرقام فقط (base64 بدون + و /)
+B64 = "b64"            # فيها + أو /
+B64URL = "b64url"      # فيها - أو _
+MIXED = "mixed"        # فيها + أو / مع - أو _
+ESCAPED = "escaped"    # literal مثل b'x\x9c...'
+
+
+class Run(NamedTuple):
+    start: int
+    end: int
+    cls: str
+    quoted: bool  # محاط بعلامات تنصيص مباشرة
+
+
+def _diverse(sample: bytes) -> bool:
+    # فاصل تعليق (#-----)، مسار أو رابط طويل، أو حرف مكرر ليست payload: البيانات المرمّزة فيها
+    # أحرف وأرقام معاً، وأحرف مختلفة كثيرة، وعلامات + / - _ قليلة (نحو 3% في base64)
+    body = sample.translate(None, _WS)
+    if not body:
+        return False
+    if len(set(body)) < MIN_DISTINCT:
+        return False
+    rest = body.translate(None, _ALNUM)
+    if len(rest) > len(body) * MAX_PUNCT_RATIO:
+        return False
+    return body.translate(None, _DIGITS) != body and body.translate(None, _LETTERS) != body
+
+
+def _classify(run: bytes) -> str:
+    body = run.translate(None, _WS)
+    if not body.translate(None, _HEX):
+        return HEX
+    rest = body.translate(None, _ALNUM)
+    if not rest:
+        return ALNUM
+    if not rest.translate(None, b"+/"):
+        return B64
+    if not rest.translate(None, b"-_"):
+        return B64URL
+    return MIXED
+
+
+class BlobIndex:
+    """All candidate runs of one buffer, in offset order."""
+
+    def __init__(self, data: bytes, runs: List[Run]):
+        self.data = data
+        self.runs = runs
+
+    def text(self, run: Run) -> bytes:
+        """نص السلسلة (للـ ESCAPED: الـ literal كاملاً مع b والتنصيص)."""
+        return self.data[run.start:run.end]
+
+    def bytes_literal(self, run: Run) -> bool:
+        """السلسلة هي محتوى literal ببادئة b مباشرة (b'<hex>')."""
+        return run.quoted and run.start >= 2 and self.data[run.start - 2] in b"bB"
+
+    def select(self, classes: Iterable[str], min_len: int = 0, quoted: Optional[bool] = None) -> List[Run]:
+        classes = tuple(classes)
+        return [r for r in self.runs
+                if r.cls in classes and r.end - r.start >= min_len and (quoted is None or r.quoted == quoted)]
+
+    def first(self, classes: Iterable[str], min_len: int = 0, quoted: Optional[bool] = None) -> Optional[Run]:
+        found = self.select(classes, min_len, quoted)
+        return found[0] if found else None
+
+    def longest(self, classes: Iterable[str], min_len: int = 0) -> Optional[Run]:
+        found = self.select(classes, min_len)
+        return max(found, key=lambda r: r.end - r.start) if found else None
+
+    def has_payload(self, min_b64: int = 80, min_hex: int = 64) -> bool:
+        """Is there an escaped literal, or a long enough hex/base64 run that looks like data (see _diverse)?"""
+        for r in self.runs:
+            n = r.end - r.start
+            if r.cls == ESCAPED:
+                return True
+            if n >= (min_hex if r.cls == HEX else min_b64) and _diverse(self.data[r.start:r.start + DIVERSITY_SAMPLE]):
+                return True
+        return False
+
+
+def iter_runs(data) -> Iterator[Run]:
+    """
+    The runs of scan_blobs one at a time. data may be any buffer the re
+    module accepts (bytes, mmap, memoryview); only each run's own bytes are
+    copied, to classify it.
+    """
+    n = len(data)
+    for m in _SCAN_RE.finditer(data):
+        kind = m.lastgroup
+        if kind == "esc":
+            yield Run(m.start(), m.end(), ESCAPED, True)
+        elif kind == "qhex":
+            yield Run(m.start() + 2, m.end() - 1, HEX, True)
+        else:
+            s, e = m.span()
+            text = data[s:e]
+            # = يتبعه حرف من الأبجدية ليس حشواً: payload=<b64> يُقطع بعده فلا تبدأ السلسلة عند payload
+            cuts = [c.end() for c in _INNER_PAD_RE.finditer(text)] if b"=" in text else []
+            for a, b in zip([0] + cuts, cuts + [len(text)]):
+                while b > a and text[b - 1] in b"\r\n":
+                    b -= 1
+                if b - a < MIN_RUN_LEN:
+                    continue
+                quoted = s + a > 0 and s + b < n and data[s + a - 1] in _QUOTES and data[s + b] in _QUOTES
+                yield Run(s + a, s + b, _classify(text[a:b]), quoted)
+
+
+def scan_blobs(data: bytes) -> BlobIndex:
+    """
+    One linear pass over data. Every maximal run of the base64/hex alphabet
+    (>= MIN_RUN_LEN), every b'<hex>' literal and every escaped bytes literal
+    is recorded with its offsets and alphabet class.
+    """
+    return BlobIndex(data, list(iter_runs(data)))
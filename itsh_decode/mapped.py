@@ -0,0 +1,146 @@
+"""
+mapped.py
+إدخال عبر mmap لملفات ضخمة (memory dumps، صور أقراص): الملف لا يُقرأ كاملاً
+ولا يُحوَّل إلى نص. ماسح locator والتعابير المنتظمة تعمل مباشرة على الملف
+المربوط بالذاكرة، ولا يُنسخ إلا نص كل سلسلة مطابقة ليُفك وحده. الصفحات
+المربوطة ملك نظام التشغيل (تُسترجع عند الحاجة)، فذاكرة العملية لا تكبر
+بحجم الملف.
+
+الوضع decode في cli يستخدمه تلقائياً للملفات الأكبر من ITSH_MMAP_MB
+(الافتراضي 256) أو لكل ملف مع --mmap: كل blob يُفك بالمحرّك على حدة ويُطبع
+سطر لكل نتيجة بمسار مثل dump@1f00.bin (الموضع بالـ hex).
+
+    python -m itsh_decode.mapped dump.bin [--min-len 80] [-o out/]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import os
+import re
+import sys
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+from .locator import ALNUM, B64, B64URL, ESCAPED, HEX, iter_runs
+from .payloads import MIN_BLOB_LEN
+
+MMAP_THRESHOLD_ENV = "ITSH_MMAP_MB"
+DEFAULT_THRESHOLD = 256 * 1024 * 1024
+SPAN_CLASSES = (HEX, ALNUM, B64, B64URL)
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    cls: str
+    text: bytes  # نسخة من السلسلة وحدها
+
+
+def mmap_threshold() -> int:
+    mb = os.environ.get(MMAP_THRESHOLD_ENV)
+    return int(float(mb) * 1024 * 1024) if mb else DEFAULT_THRESHOLD
+
+
+def use_mmap(path: str, force: bool = False) -> bool:
+    """هل يُفك الملف blob بـ blob من mmap بدل قراءته كاملاً؟"""
+    try:
+        return force or os.path.getsize(path) >= mmap_threshold()
+    except OSError:
+        return False
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[Buffer]:
+    """
+    The file mapped read-only, usable wherever bytes are read: re, slicing,
+    len, find. An empty file (which cannot be mapped) yields b"".
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            yield b""
+            return
+        try:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+
+def bytes_pattern(pattern: "re.Pattern[str]") -> "re.Pattern[bytes]":
+    """نفس تعبير نصي (ASCII) للعمل على bytes أو mmap."""
+    return re.compile(pattern.pattern.encode("latin-1"), pattern.flags & ~re.UNICODE)
+
+
+def iter_spans(data: Buffer, min_len: int = MIN_BLOB_LEN) -> Iterator[Span]:
+    """
+    Every base64/hex run of at least min_len and every escaped bytes
+    literal in data, each copied out on its own. A span repeated byte for
+    byte (common in memory dumps) is yielded only the first time.
+    """
+    seen = set()
+    for run in iter_runs(data):
+        if run.cls != ESCAPED and (run.cls not in SPAN_CLASSES or run.end - run.start < min_len):
+            continue
+        text = data[run.start:run.end]
+        digest = hashlib.blake2b(text, digest_size=16).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield Span(run.start, run.end, run.cls, text)
+
+
+def span_label(path: str, start: int) -> str:
+    """اسم يحمل موضع السلسلة: dump.bin -> dump@1f00.bin (فتبقى مخرجات output_path_for منفصلة)."""
+    head, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    return os.path.join(head, f"{stem}@{start:x}{ext}")
+
+
+def decode_mapped(path: str, min_len: int = MIN_BLOB_LEN, **kwargs) -> Iterator[dict]:
+    """
+    Engine results (as engine.decode_bytes) for every span of the mapped
+    file that decodes to something, each with res["path"] = span_label()
+    and res["offset"] = the span's start. kwargs go to decode_bytes.
+    """
+    from .engine import decode_bytes
+
+    with map_file(path) as data:
+        for span in iter_spans(data, min_len):
+            label = span_label(path, span.start)
+            res = decode_bytes(span.text, file=label, **kwargs)
+            if not res["chain"]:
+                continue
+            res["path"] = label
+            res["offset"] = span.start
+            yield res
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.mapped",
+                                     description="decode every embedded blob of a large file through mmap")
+    parser.add_argument("path")
+    parser.add_argument("--min-len", type=int, default=MIN_BLOB_LEN, help="shortest base64/hex run to try")
+    parser.add_argument("-o", "--out", help="write each decoded span here (default: report only)")
+    args = parser.parse_args(argv)
+    from .output import write_result
+
+    found = 0
+    for res in decode_mapped(args.path, args.min_len):
+        found += 1
+        out = write_result(res, res["path"], args.out) if args.out else "-"
+        print(f"0x{res['offset']:x}\t{'ok' if res['ok'] else 'partial'}\t{'->'.join(res['chain'])}\t"
+              f"{res['kind']}\t{out}")
+    print(f"{found} blobs decoded", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
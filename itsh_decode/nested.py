@@ -0,0 +1,171 @@
+"""
+nested.py
+استخراج متكرر للـ payloads من code objects متداخلة: يمشي على co_consts لكل
+code object (ومعها الـ tuples والـ code objects الداخلية)، ويعيد كل ثابت
+bytes/str مرمّز إلى محرّك الفك. ما ينتج code object أو مصدر بايثون يُمشى
+عليه بدوره، فالنتيجة شجرة طبقات مسترجعة بدل مستوى واحد.
+
+الثوابت المتكررة (نفس sha256) تُفك مرة واحدة فقط في الشجرة كلها.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import types
+from typing import TYPE_CHECKING, Iterator, List, Optional, Set, Tuple, Union
+
+from .classify import header_kind
+from .engine import decode_bytes, looks_encoded
+from .pymarshal import Code
+
+if TYPE_CHECKING:
+    from .cache import DecodeCache
+
+MAX_NESTED_DEPTH = 16
+MIN_CONST_LEN = 16
+# رؤوس حاويات تستحق محاولة الفك حتى لو لم يكن في الثابت نص مرمّز
+_CONTAINERS = ("zlib", "bz2", "lzma", "marshal")
+
+
+def iter_consts(code: Union[types.CodeType, Code], prefix: str = "") -> Iterator[Tuple[str, object]]:
+    """
+    (origin, value) لكل ثابت bytes/str في code وفي الـ code objects والـ
+    tuples/frozensets المتداخلة داخله. origin مثل "<module>/f.co_consts[3]".
+    """
+    base = f"{prefix}/{code.co_name}" if prefix else code.co_name
+    stack = [(f"{base}.co_consts[{i}]", c) for i, c in enumerate(code.co_consts)]
+    stack.reverse()
+    while stack:
+        origin, value = stack.pop()
+        if isinstance(value, (types.CodeType, Code)):
+            yield from iter_consts(value, base)
+        elif isinstance(value, (tuple, frozenset)):
+            items = [(f"{origin}[{i}]", v) for i, v in enumerate(value)]
+            stack.extend(reversed(items))
+        elif isinstance(value, (bytes, str)):
+            yield origin, value
+
+
+def candidate_bytes(value: object) -> Optional[bytes]:
+    """بايتات الثابت إن كان يبدو payload (blob مرمّز أو ترويسة حاوية)، وإلا None."""
+    if isinstance(value, str):
+        try:
+            value = value.encode("latin-1")
+        except UnicodeEncodeError:
+            return None
+    if not isinstance(value, bytes) or len(value) < MIN_CONST_LEN:
+        return None
+    if header_kind(value[:8]) in _CONTAINERS or looks_encoded(value):
+        return value
+    return None
+
+
+def as_code(value: object, kind: str) -> Optional[types.CodeType]:
+    """code object للطبقة: كما هو، أو compile لمصدر بايثون (بدون تنفيذ)."""
+    if kind == "code":
+        return value
+    if kind == "source":
+        try:
+            return compile(value, "<layer>", "exec", dont_inherit=True)
+        except Exception:
+            return None
+    return None
+
+
+def _layers(code: types.CodeType, depth: int, seen: Set[bytes], cache: Optional[DecodeCache],
+            max_depth: int) -> List[dict]:
+    found = []
+    if depth >= max_depth:
+        return found
+    for origin, const in iter_consts(code):
+        data = candidate_bytes(const)
+        if data is None:
+            continue
+        digest = hashlib.sha256(data).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        res = decode_bytes(data, cache=cache)
+        if not res["chain"]:
+            continue
+        inner = as_code(res["value"], res["kind"])
+        found.append({
+            "origin": origin,
+            "digest": digest.hex(),
+            "chain": res["chain"],
+            "kind": res["kind"],
+            "ok": res["ok"],
+            "value": res["value"],
+            "children": _layers(inner, depth + 1, seen, cache, max_depth) if inner else [],
+        })
+    return found
+
+
+def walk_code(code: types.CodeType, cache: Optional[DecodeCache] = None,
+              max_depth: int = MAX_NESTED_DEPTH) -> dict:
+    """
+    Recover every payload nested under code as a tree. Each node holds the
+    constant it came from (origin), the sha256 of that constant, the
+    transform chain, the decoded kind/value and its own recovered children.
+    Identical constants are decoded once per walk; nesting is capped at
+    max_depth levels. Nothing is executed: sources are only compiled.
+    """
+    return {
+        "origin": code.co_name,
+        "digest": None,
+        "chain": [],
+        "kind": "code",
+        "ok": True,
+        "value": code,
+        "children": _layers(code, 0, set(), cache, max_depth),
+    }
+
+
+def walk_bytes(data: bytes, cache: Optional[DecodeCache] = None,
+               max_depth: int = MAX_NESTED_DEPTH) -> Optional[dict]:
+    """walk_code بعد فك data بالمحرك (أو compile لها إن كانت مصدراً)؛ None إن لم تنتج code."""
+    res = decode_bytes(data, cache=cache)
+    code = as_code(res["value"], res["kind"])
+    if code is None:
+        return None
+    tree = walk_code(code, cache, max_depth)
+    tree.update(chain=res["chain"], kind=res["kind"], value=res["value"])
+    return tree
+
+
+def iter_tree(tree: dict, path: str = "") -> Iterator[Tuple[str, dict]]:
+    """(layer_id, node) لكل طبقة مسترجعة بترتيب العمق أولاً؛ layer_id مثل "1.2.1"."""
+    for i, child in enumerate(tree["children"], 1):
+        layer_id = f"{path}.{i}" if path else str(i)
+        yield layer_id, child
+        yield from iter_tree(child, layer_id)
+
+
+def format_tree(tree: dict) -> str:
+    lines = [f"{tree['origin']} ({tree['kind']})"]
+    for layer_id, node in iter_tree(tree):
+        indent = "  " * layer_id.count(".")
+        chain = " -> ".join(node["chain"])
+        lines.append(f"{indent}[{layer_id}] {node['origin']}: {chain} ({node['kind']}) sha256={node['digest'][:16]}")
+    return "\n".join(lines) + "\n"
+
+
+def write_tree(tree: dict, out_stem: str) -> List[str]:
+    """
+    Write every recovered layer as <out_stem>.L<layer_id>.<ext> plus an
+    index <out_stem>.tree.txt and return the written paths.
+    """
+    from .output import render_value
+
+    written = []
+    for layer_id, node in iter_tree(tree):
+        ext = ".dis.txt" if node["kind"] == "code" else ".py" if node["kind"] == "source" else ".bin"
+        path = f"{out_stem}.L{layer_id}{ext}"
+        with open(path, "wb") as f:
+            f.write(render_value(node))
+        written.append(path)
+    index = f"{out_stem}.tree.txt"
+    with open(index, "w", encoding="utf-8") as f:
+        f.write(format_tree(tree))
+    written.append(index)
+    return written
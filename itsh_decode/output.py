@@ -0,0 +1,64 @@
+"""
+output.py
+كتابة ناتج محرّك الفك (decode_bytes / decode_file) إلى القرص.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Optional
+
+AUTO_SUFFIX = ".auto_decoded"
+
+
+def output_path_for(res: dict, input_path: str, out_dir: Optional[str] = None) -> str:
+    """مسار المخرج: بجانب الملف الأصلي، أو داخل out_dir بنفس الاسم."""
+    suffix = AUTO_SUFFIX + (".dis.txt" if res["kind"] == "code" else ".py")
+    path = Path(input_path).with_suffix(suffix)
+    if out_dir:
+        path = Path(out_dir) / path.name
+    return str(path)
+
+
+def result_status(res: dict) -> str:
+    """حالة الناتج كما تطبعها cli: ok أو partial أو truncated (أوقفته limits) أو skip."""
+    if not res["ok"] and res["aborted"]:
+        return "truncated"
+    if not res["chain"]:
+        return "skip"
+    return "ok" if res["ok"] else "partial"
+
+
+def render_value(res: dict) -> bytes:
+    """
+    Bytes to write for the final value of res: a disassembly listing headed
+    by the transform chain for code objects, raw bytes otherwise (non-bytes
+    values as their repr).
+    """
+    value = res["value"]
+    if res["kind"] == "code":
+        from .disasm import disassemble
+
+        # كل code objects المتداخلة؛ bytecode لإصدار آخر يُعرض عبر format_code
+        return (f"# chain: {' -> '.join(res['chain'])}\n" + disassemble(value)).encode("utf-8")
+    return value if isinstance(value, bytes) else repr(value).encode("utf-8")
+
+
+def write_result(res: dict, input_path: str, out_dir: Optional[str] = None) -> str:
+    """
+    Write the final layer of res (see render_value) and return the output
+    path. Code objects are written per $ITSH_DIS_FORMAT: the text listing,
+    a .dis.json instruction stream next to it, or both.
+    """
+    out_path = output_path_for(res, input_path, out_dir)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if res["kind"] == "code":
+        from .disasm import write_disassembly
+
+        header = f"# chain: {' -> '.join(res['chain'])}\n"
+        return write_disassembly(res["value"], out_path[:-len(".dis.txt")], header=header)[0]
+    with open(out_path, "wb") as f:
+        f.write(render_value(res))
+    return out_path
@@ -0,0 +1,292 @@
+"""
+payloads.py
+فهرس payloads على مستوى المجموعة كاملة: كل blob مضمّن (بعد التطبيع) يُعرَّف
+بـ sha256، ويُسجَّل أي الملفات تحمله وإلى ماذا فُكّ. نفس الـ payload المُعاد
+تغليفه في مئات الـ droppers يُفك مرة واحدة، والنتيجة تُعطى لكل ملف يحمله.
+
+النتيجة مخزّنة لكل (blob، دالة فك): الخيارات 10 و11 و12 والمحرّك تفك نفس
+السلسلة إلى نواتج مختلفة (base64 خام، base64->zlib، ...)، فلا يأخذ أحدها ناتج
+الآخر. والفك الذي أوقفته حدود فك الضغط لا يُخزَّن، فيُعاد بحدود أعلى.
+
+يُفعَّل في الخيارات 10 و11 و12 بتمرير مسار قاعدة البيانات في متغير البيئة
+ITSH_PAYLOAD_INDEX (بنفس أسلوب ITSH_CACHE). ولمسح مجموعة كاملة:
+
+    python -m itsh_decode.payloads scan index.sqlite samples/ -o unique/
+    python -m itsh_decode.payloads report index.sqlite
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+INDEX_ENV = "ITSH_PAYLOAD_INDEX"
+MAX_OUTPUT_BYTES = 64 * 1024 * 1024  # الناتج الأكبر لا يُخزَّن (تُخزَّن السلسلة فقط)
+MIN_BLOB_LEN = 80
+_WS = b" \t\r\n"
+
+
+
+class Limited(NamedTuple):
+    """A decode stopped by the decompression limits: not a failure, so not stored."""
+    reason: str
+
+
+# fn(normalized_blob) -> (chain, output)، أو None عند الفشل، أو Limited
+DecodeFn = Callable[[bytes], Union[Tuple[str, bytes], Limited, None]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    blob_hash TEXT NOT NULL,
+    decoder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    found INTEGER NOT NULL,
+    chain TEXT,
+    output BLOB,
+    output_size INTEGER NOT NULL,
+    first_seen REAL NOT NULL,
+    PRIMARY KEY (blob_hash, decoder)
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    blob_hash TEXT NOT NULL,
+    path TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY (blob_hash, path, label)
+);
+CREATE INDEX IF NOT EXISTS occurrences_path ON occurrences (path);
+"""
+
+
+class Payload(NamedTuple):
+    key: str
+    found: bool
+    chain: str
+    output: Optional[bytes]
+    output_size: int
+    reused: bool  # فُك سابقاً (في ملف آخر أو تشغيل سابق)
+
+
+def normalize(blob: Union[str, bytes]) -> bytes:
+    """نص الـ blob بدون مسافات وأسطر جديدة، حتى يتطابق نفس الـ payload بأي تنسيق."""
+    if isinstance(blob, str):
+        blob = blob.encode("latin-1", errors="ignore")
+    return blob.translate(None, _WS)
+
+
+def blob_key(blob: Union[str, bytes]) -> str:
+    return hashlib.sha256(normalize(blob)).hexdigest()
+
+
+def decoder_name(decode: Callable) -> str:
+    """اسم دالة الفك كما يُخزَّن مع كل نتيجة (candidates.b64_zlib، payloads.engine_decode...)."""
+    module = getattr(decode, "__module__", "") or ""
+    return f"{module.rsplit('.', 1)[-1]}.{getattr(decode, '__qualname__', repr(decode))}"
+
+
+class PayloadIndex:
+    """
+    (sha256(normalized blob), decoder) -> decode result, plus every
+    (path, label) the blob was seen in. resolve() decodes a blob only the
+    first time its hash is seen with that decoder and returns the stored
+    result for every later carrier.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        columns = [r[1] for r in self.db.execute("PRAGMA table_info(blobs)")]
+        if columns and "decoder" not in columns:
+            # فهرس أقدم بلا اسم دالة الفك: نتائجه لا يُعرف أي خيار أنتجها، فتُفك من جديد (occurrences تبقى)
+            self.db.execute("DROP TABLE blobs")
+        self.db.executescript(_SCHEMA)
+        self.decoded = 0
+        self.reused = 0
+
+    def _row(self, key: str, decoder: str) -> Optional[tuple]:
+        return self.db.execute("SELECT found, chain, output, output_size FROM blobs WHERE blob_hash=? AND decoder=?",
+                               (key, decoder)).fetchone()
+
+    def add(self, key: str, path: str, label: str = "") -> None:
+        self.db.execute("INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?)", (key, path, label))
+
+    def lookup(self, blob: Union[str, bytes], path: str, label: str = "",
+               decoder: str = "") -> Tuple[str, Optional[Payload]]:
+        """
+        Record that path carries blob and return (key, result stored for
+        decoder) or (key, None) when the blob still has to be decoded with
+        it (see record).
+        """
+        key = hashlib.sha256(normalize(blob)).hexdigest()
+        self.add(key, path, label)
+        row = self._row(key, decoder)
+        # ناتج أكبر من MAX_OUTPUT_BYTES لم يُخزَّن: يُعاد فكه
+        if row is not None and not (row[0] and row[2] is None):
+            self.reused += 1
+            return key, Payload(key, bool(row[0]), row[1] or "", row[2], row[3], True)
+        return key, None
+
+    def record(self, key: str, size: int, res, decoder: str = "") -> Payload:
+        """
+        Store the decode result res ((chain, output) or None) of a blob
+        looked up as key with decoder. A Limited result is returned as a
+        failure but not stored.
+        """
+        self.decoded += 1
+        if isinstance(res, Limited):
+            return Payload(key, False, "", None, 0, False)
+        chain, output = res if res else ("", None)
+        stored = output if output is not None and len(output) <= MAX_OUTPUT_BYTES else None
+        self.db.execute("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, decoder, size, int(res is not None), chain, stored,
+                         len(output) if output is not None else 0, time.time()))
+        return Payload(key, res is not None, chain, output, len(output) if output is not None else 0, False)
+
+    def resolve(self, blob: Union[str, bytes], decode: DecodeFn, path: str, label: str = "") -> Payload:
+        """Record that path carries blob and return its (possibly stored) decode result."""
+        from .limits import DecompressionLimit
+
+        decoder = decoder_name(decode)
+        key, payload = self.lookup(blob, path, label, decoder)
+        if payload is not None:
+            return payload
+        data = normalize(blob)
+        try:
+            res = decode(data)
+        except DecompressionLimit as e:
+            res = Limited(str(e))
+        except Exception:
+            res = None
+        return self.record(key, len(data), res, decoder)
+
+    def files_for(self, key: str) -> List[Tuple[str, str]]:
+        return self.db.execute("SELECT path, label FROM occurrences WHERE blob_hash=? ORDER BY path",
+                               (key,)).fetchall()
+
+    def payloads_for(self, path: str) -> List[Payload]:
+        rows = self.db.execute(
+            "SELECT b.blob_hash, b.found, b.chain, b.output, b.output_size FROM occurrences o "
+            "JOIN blobs b ON b.blob_hash = o.blob_hash WHERE o.path=?", (path,)).fetchall()
+        return [Payload(k, bool(f), c or "", out, size, True) for k, f, c, out, size in rows]
+
+    def shared(self, min_files: int = 2) -> List[Tuple[str, int, str, int]]:
+        """(key, عدد الملفات, السلسلة, حجم الناتج) للـ blobs المشتركة، الأكثر انتشاراً أولاً (سطر لكل دالة فك)."""
+        return self.db.execute(
+            "SELECT b.blob_hash, COUNT(DISTINCT o.path) AS n, b.chain, b.output_size FROM blobs b "
+            "JOIN occurrences o ON o.blob_hash = b.blob_hash GROUP BY b.blob_hash, b.decoder HAVING n >= ? "
+            "ORDER BY n DESC", (min_files,)).fetchall()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "blobs": self.db.execute("SELECT COUNT(*) FROM blobs").fetchone()[0],
+            "decoded_ok": self.db.execute("SELECT COUNT(*) FROM blobs WHERE found=1").fetchone()[0],
+            "occurrences": self.db.execute("SELECT COUNT(*) FROM occurrences").fetchone()[0],
+            "files": self.db.execute("SELECT COUNT(DISTINCT path) FROM occurrences").fetchone()[0],
+            "decoded": self.decoded,
+            "reused": self.reused,
+        }
+
+    def close(self) -> None:
+        self.db.close()
+
+
+_OPEN: Dict[str, PayloadIndex] = {}
+
+
+def open_index(path: Optional[str] = None) -> Optional[PayloadIndex]:
+    """الفهرس لـ path (أو $ITSH_PAYLOAD_INDEX)، مفتوح مرة واحدة لكل عملية. None إن لم يُفعَّل."""
+    path = path or os.environ.get(INDEX_ENV)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path not in _OPEN:
+        _OPEN[path] = PayloadIndex(path)
+    return _OPEN[path]
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    return (f"فهرس الـ payloads: blobs={stats['blobs']} (ok={stats['decoded_ok']}) files={stats['files']} "
+            f"occurrences={stats['occurrences']} decoded={stats['decoded']} reused={stats['reused']}")
+
+
+def engine_decode(data: bytes) -> Union[Tuple[str, bytes], Limited, None]:
+    """DecodeFn عام: محرّك الفك على نص الـ blob وحده."""
+    from .engine import decode_bytes
+    from .output import render_value
+
+    res = decode_bytes(data)
+    if not res["ok"] and res["aborted"]:
+        return Limited("; ".join(res["aborted"]))
+    if not res["chain"]:
+        return None
+    return "->".join(res["chain"]), render_value(res)
+
+
+def iter_blobs(data: bytes, min_len: int = MIN_BLOB_LEN) -> Iterable[Tuple[str, bytes]]:
+    """(label, text) لكل سلسلة base64/hex طويلة في البافر (bytes أو mmap)، من ماسح locator."""
+    from .locator import ALNUM, B64, B64URL, HEX, iter_runs
+
+    classes = (HEX, ALNUM, B64, B64URL)
+    for run in iter_runs(data):
+        if run.cls in classes and run.end - run.start >= min_len:
+            yield f"@{run.start}", data[run.start:run.end]
+
+
+def scan_paths(index: PayloadIndex, paths: Iterable[str],
+               decode: DecodeFn = engine_decode) -> Iterable[Tuple[str, Payload]]:
+    from .cli import iter_inputs
+    from .mapped import map_file
+
+    for path in iter_inputs(list(paths)):
+        # عبر mmap: لا يُقرأ الملف كاملاً، تُنسخ السلاسل المطابقة فقط
+        try:
+            with map_file(path) as data:
+                for label, text in iter_blobs(data):
+                    yield path, index.resolve(text, decode, path, label)
+        except OSError:
+            continue
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.payloads", description="cross-file payload index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    scan = sub.add_parser("scan", help="index and decode every embedded blob under PATH")
+    scan.add_argument("db")
+    scan.add_argument("paths", nargs="+", metavar="PATH")
+    scan.add_argument("-o", "--out", help="write each unique decoded payload once as OUT/<sha256>.bin")
+    report = sub.add_parser("report", help="list blobs carried by more than one file")
+    report.add_argument("db")
+    report.add_argument("--min-files", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    index = PayloadIndex(args.db)
+    if args.command == "scan":
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+        for path, payload in scan_paths(index, args.paths):
+            status = "reuse" if payload.reused else ("ok" if payload.found else "fail")
+            print(f"{status}\t{path}\t{payload.key[:16]}\t{payload.chain}")
+            if args.out and payload.found and not payload.reused and payload.output is not None:
+                with open(os.path.join(args.out, payload.key + ".bin"), "wb") as f:
+                    f.write(payload.output)
+        print(format_stats(index.stats()), file=sys.stderr)
+    else:
+        for key, n, chain, size in index.shared(args.min_files):
+            print(f"{key}\t{n}\t{chain}\t{size}")
+            for path, label in index.files_for(key):
+                print(f"    {path}\t{label}")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+pipe.py
+وضع الفلتر: العينة تُقرأ من stdin والناتج يُكتب على stdout، فتُركّب الأداة
+في pipelines (find | xargs، عمّال الطوابير) بلا ملفات مؤقتة ولا كتابة على
+القرص. ثلاثة أشكال للمدخل:
+
+- عينة واحدة (الافتراضي): كل stdin عينة، والطبقة النهائية تُكتب كما هي على
+  stdout. إن لم يُفك شيء تمر العينة دون تغيير، فيبقى الفلتر صالحاً في وسط
+  أي سلسلة. سطر الحالة (كما في decode) على stderr.
+- قائمة مسارات مفصولة بـ NUL (-0، مثل find -print0): سطر JSON لكل ملف. الملفات
+  الضخمة تُفك blob بـ blob من mmap كما في decode --mmap (انظر mapped.py).
+- سجلات JSONL من مرحلة فلتر سابقة (--jsonl-in): ناتج كل سجل يُفك مرة أخرى
+  وتُلحق السلسلة بسلسلته، والسجل الذي لا يُفك منه شيء يمر كما هو. سجل skip
+  لملف من مرحلة -0 (بوضع --mode آخر) يُعاد فكه من الملف نفسه.
+
+كل سجل JSONL:
+    {"path", "status", "chain", "kind", "encoding", "output"[, "offset"][, "error"]}
+status كما في decode (ok/partial/truncated/skip/error). output هو الطبقة
+النهائية: نص إن كانت UTF-8 صالحاً (encoding = "utf-8") وإلا base64.
+
+    python -m itsh_decode filter < obf.py > decoded.py
+    find samples -name '*.py' -print0 | python -m itsh_decode filter -0 > results.jsonl
+    ... | python -m itsh_decode filter -0 --mode zlib-b64 | python -m itsh_decode filter --jsonl-in
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import os
+from typing import BinaryIO, Iterator, Optional
+
+from .output import render_value, result_status
+
+READ_CHUNK = 64 * 1024
+
+
+def output_fields(data: bytes) -> dict:
+    """output وencoding لسجل JSONL: نص إن أمكن، وإلا base64."""
+    try:
+        return {"encoding": "utf-8", "output": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"encoding": "base64", "output": base64.b64encode(data).decode("ascii")}
+
+
+def output_bytes(row: dict) -> Optional[bytes]:
+    """The final layer carried by a JSONL record (None if it has none)."""
+    if "output" not in row:
+        return None
+    if row.get("encoding") == "base64":
+        try:
+            return base64.b64decode(row["output"])
+        except (binascii.Error, ValueError):
+            return None
+    return row["output"].encode("utf-8", errors="surrogateescape")
+
+
+def result_record(res: dict, path: str) -> dict:
+    """سجل JSONL لناتج المحرّك (decode_bytes / decode_file)."""
+    status = result_status(res)
+    row = {"path": path, "status": status, "chain": "->".join(res["chain"]), "kind": res["kind"]}
+    if "offset" in res:
+        row["offset"] = res["offset"]
+    if res["aborted"]:
+        row["error"] = "; ".join(res["aborted"])
+    if status in ("ok", "partial"):
+        row.update(output_fields(render_value(res)))
+    return row
+
+
+def iter_null_paths(stream: BinaryIO) -> Iterator[str]:
+    """المسارات من stdin مفصولة بـ NUL، تُقرأ قطعة قطعة (القائمة قد لا تنتهي)."""
+    pending = b""
+    while True:
+        chunk = stream.read1(READ_CHUNK) if hasattr(stream, "read1") else stream.read(READ_CHUNK)
+        if not chunk:
+            break
+        *done, pending = (pending + chunk).split(b"\0")
+        for raw in done:
+            if raw:
+                yield os.fsdecode(raw)
+    if pending.strip(b"\r\n"):
+        yield os.fsdecode(pending.rstrip(b"\r\n"))
+
+
+def _write_row(out: BinaryIO, row: dict) -> None:
+    out.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8", errors="surrogateescape"))
+    out.flush()
+
+
+def filter_sample(source: BinaryIO, out: BinaryIO, label: str = "-", jsonl: bool = False, **kwargs) -> dict:
+    """
+    Decode all of source as one sample and write the final layer to out
+    (source unchanged when nothing decodes), or one JSONL record with
+    jsonl. Returns the record. kwargs go to decode_bytes.
+    """
+    from .engine import decode_bytes, improves
+
+    data = source.read()
+    res = decode_bytes(data, file=label, **kwargs)
+    row = result_record(res, label)
+    if jsonl:
+        _write_row(out, row)
+    else:
+        out.write(output_bytes(row) if "output" in row and improves(res, data) else data)
+        out.flush()
+    return row
+
+
+def filter_paths(source: BinaryIO, out: BinaryIO, mmap: bool = False, **kwargs) -> Iterator[dict]:
+    """
+    One JSONL record per NUL-delimited path read from source, written to
+    out as soon as it is decoded; each record is also yielded.
+    """
+    from .engine import decode_file
+    from .mapped import decode_mapped, use_mmap
+
+    for path in iter_null_paths(source):
+        try:
+            if use_mmap(path, mmap):
+                rows = [result_record(res, res["path"]) for res in decode_mapped(path, **kwargs)]
+                rows = rows or [{"path": path, "status": "skip", "chain": "", "kind": ""}]
+            else:
+                rows = [result_record(decode_file(path, **kwargs), path)]
+        except Exception as e:
+            rows = [{"path": path, "status": "error", "chain": "", "kind": "", "error": str(e)}]
+        for row in rows:
+            _write_row(out, row)
+            yield row
+
+
+def filter_records(source: BinaryIO, out: BinaryIO, **kwargs) -> Iterator[dict]:
+    """
+    Decode the output of every JSONL record read from source one stage
+    further, appending to its chain (a skipped record from a -0 stage is
+    retried from its file); records with nothing more to decode pass
+    through unchanged.
+    """
+    from .engine import decode_bytes, improves
+
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {"path": "-", "status": "error", "chain": "", "kind": "", "error": f"bad record: {e}"}
+            _write_row(out, row)
+            yield row
+            continue
+        path = row.get("path", "-")
+        data = output_bytes(row)
+        if data is None and row.get("status") == "skip" and os.path.isfile(path):
+            # مرحلة سابقة بوضع آخر (-0 --mode ...) لم تفك الملف: تُعاد المحاولة من الملف نفسه
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            except OSError as e:
+                row = dict(row, status="error", error=str(e))
+        if data is not None and row.get("status") in ("ok", "partial", "skip"):
+            try:
+                res = decode_bytes(data, file=path, **kwargs)
+            except Exception as e:
+                row = dict(row, status="error", error=str(e))
+            else:
+                if improves(res, data):
+                    new = result_record(res, path)
+                    new["chain"] = "->".join(c for c in (row.get("chain"), new["chain"]) if c)
+                    row = dict(row, **new)
+        _write_row(out, row)
+        yield row
@@ -0,0 +1,351 @@
+"""
+pymarshal.py
+قارئ marshal بلغة بايثون فقط لصيغ 3.7 حتى 3.13، مستقل عن إصدار المفسّر
+الحالي. يقرأ code objects والثوابت والأسماء إلى بنية محايدة (Code) بدل
+types.CodeType، فيمكن فرز عينات من إصدارات مختلفة في عملية واحدة.
+
+marshal.loads الأصلي يبقى الأسرع ويُستعمل أولاً حين تطابق الصيغة المفسّر؛
+هذا القارئ للحالات التي يفشل فيها أو يعطي bytecode لإصدار آخر.
+"""
+
+from __future__ import annotations
+
+import marshal
+import struct
+import sys
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+# الإصدارات المدعومة بترتيب التجربة عند غياب رقم الإصدار (الأحدث أولاً)
+VERSIONS = ((3, 13), (3, 12), (3, 11), (3, 10), (3, 9), (3, 8), (3, 7))
+HOST_VERSION = sys.version_info[:2]
+# إصدارات تتطابق صيغة code object فيها: بلا رقم إصدار لا يمكن التمييز بينها
+LAYOUTS = (((3, 11), (3, 13)), ((3, 8), (3, 10)), ((3, 7), (3, 7)))
+MAX_NESTING = 2000
+
+FLAG_REF = 0x80
+# co_localspluskinds (3.11+)
+CO_FAST_LOCAL = 0x20
+CO_FAST_CELL = 0x40
+CO_FAST_FREE = 0x80
+
+# أرقام MAGIC لملفات .pyc: (أول رقم, آخر رقم) لكل إصدار
+_MAGIC_RANGES = (
+    ((3, 7), 3390, 3399),
+    ((3, 8), 3400, 3419),
+    ((3, 9), 3420, 3429),
+    ((3, 10), 3430, 3449),
+    ((3, 11), 3450, 3499),
+    ((3, 12), 3500, 3549),
+    ((3, 13), 3550, 3599),
+)
+
+
+class MarshalError(ValueError):
+    pass
+
+
+class Code(NamedTuple):
+    """Version-neutral code object. Fields missing in a format are empty/0."""
+    version: Tuple[int, int]
+    argcount: int
+    posonlyargcount: int
+    kwonlyargcount: int
+    nlocals: int
+    stacksize: int
+    flags: int
+    code: bytes
+    consts: tuple
+    names: Tuple[str, ...]
+    varnames: Tuple[str, ...]
+    freevars: Tuple[str, ...]
+    cellvars: Tuple[str, ...]
+    filename: str
+    name: str
+    qualname: str
+    firstlineno: int
+    linetable: bytes
+    exceptiontable: bytes
+    # True حين خُمّن الإصدار من الصيغة (loads بلا version)؛ version عندها أحدث إصدار في LAYOUTS
+    inferred: bool = False
+
+    # نفس أسماء types.CodeType حتى يعمل الكود الذي يقرأ co_* على الاثنين
+    co_name = property(lambda self: self.name)
+    co_consts = property(lambda self: self.consts)
+    co_names = property(lambda self: self.names)
+    co_varnames = property(lambda self: self.varnames)
+    co_filename = property(lambda self: self.filename)
+    co_firstlineno = property(lambda self: self.firstlineno)
+
+
+def version_from_magic(magic: bytes) -> Optional[Tuple[int, int]]:
+    """(major, minor) من أول 4 بايتات في ملف .pyc، أو None."""
+    if len(magic) < 4 or magic[2:4] != b"\r\n":
+        return None
+    number = int.from_bytes(magic[:2], "little")
+    for version, lo, hi in _MAGIC_RANGES:
+        if lo <= number <= hi:
+            return version
+    return None
+
+
+class _Reader:
+    def __init__(self, data: bytes, version: Tuple[int, int], inferred: bool = False):
+        self.data = data
+        self.pos = 0
+        self.version = version
+        self.inferred = inferred
+        self.refs: List[object] = []
+        self.depth = 0
+
+    def _take(self, n: int) -> bytes:
+        end = self.pos + n
+        if n < 0 or end > len(self.data):
+            raise MarshalError(f"truncated data at offset {self.pos}")
+        chunk = self.data[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def byte(self) -> int:
+        return self._take(1)[0]
+
+    def long(self) -> int:
+        return struct.unpack("<i", self._take(4))[0]
+
+    def size(self) -> int:
+        n = self.long()
+        if n < 0:
+            raise MarshalError(f"negative size at offset {self.pos - 4}")
+        return n
+
+    def _sized(self, short: bool) -> bytes:
+        return self._take(self.byte() if short else self.size())
+
+    def _tuple(self, n: int) -> tuple:
+        return tuple(self.object() for _ in range(n))
+
+    def object(self) -> object:
+        self.depth += 1
+        if self.depth > MAX_NESTING:
+            raise MarshalError("object nesting too deep")
+        try:
+            code = self.byte()
+            flag, t = code & FLAG_REF, chr(code & ~FLAG_REF)
+            slot = None
+            if flag:
+                slot = len(self.refs)
+                self.refs.append(None)
+            value = self._read(t)
+            if slot is not None:
+                self.refs[slot] = value
+            return value
+        finally:
+            self.depth -= 1
+
+    def _read(self, t: str) -> object:
+        if t == "0":
+            return _NULL
+        if t == "N":
+            return None
+        if t == "F":
+            return False
+        if t == "T":
+            return True
+        if t == "S":
+            return StopIteration
+        if t == ".":
+            return Ellipsis
+        if t == "i":
+            return self.long()
+        if t == "I":
+            return struct.unpack("<q", self._take(8))[0]
+        if t == "l":
+            n = self.long()
+            digits = struct.unpack(f"<{abs(n)}H", self._take(2 * abs(n)))
+            value = sum(d << (15 * i) for i, d in enumerate(digits))
+            return -value if n < 0 else value
+        if t == "g":
+            return struct.unpack("<d", self._take(8))[0]
+        if t == "f":
+            return float(self._sized(True))
+        if t == "y":
+            real, imag = struct.unpack("<dd", self._take(16))
+            return complex(real, imag)
+        if t == "x":
+            real = float(self._sized(True))
+            return complex(real, float(self._sized(True)))
+        if t == "s":
+            return self._sized(False)
+        if t in "tu":
+            return self._sized(False).decode("utf-8", "surrogatepass")
+        if t in "aA":
+            return self._sized(False).decode("latin-1")
+        if t in "zZ":
+            return self._sized(True).decode("latin-1")
+        if t == "(":
+            return self._tuple(self.size())
+        if t == ")":
+            return self._tuple(self.byte())
+        if t == "[":
+            return list(self._tuple(self.size()))
+        if t in "<>":
+            items = self._tuple(self.size())
+            try:
+                return frozenset(items) if t == ">" else set(items)
+            except TypeError as e:
+                raise MarshalError(f"set item: {e}") from None
+        if t == "{":
+            out = {}
+            while True:
+                key = self.object()
+                if key is _NULL:
+                    return out
+                try:
+                    out[key] = self.object()
+                except TypeError as e:
+                    raise MarshalError(f"dict key: {e}") from None
+        if t == "r":
+            idx = self.long()
+            if not 0 <= idx < len(self.refs):
+                raise MarshalError(f"bad ref {idx}")
+            return self.refs[idx]
+        if t == "c":
+            return self._code()
+        raise MarshalError(f"unknown type code {t!r} at offset {self.pos - 1}")
+
+    def _expect(self, types_, what: str) -> object:
+        value = self.object()
+        if not isinstance(value, types_):
+            raise MarshalError(f"{what}: expected {types_}, got {type(value).__name__} ({self.version})")
+        return value
+
+    def _names(self, what: str) -> Tuple[str, ...]:
+        value = self._expect(tuple, what)
+        if not all(isinstance(v, str) for v in value):
+            raise MarshalError(f"{what}: non-str name ({self.version})")
+        return value
+
+    def _code(self) -> Code:
+        v = self.version
+        argcount = self.long()
+        posonly = self.long() if v >= (3, 8) else 0
+        kwonly = self.long()
+        nlocals = self.long() if v < (3, 11) else 0
+        stacksize = self.long()
+        flags = self.long()
+        code = self._expect(bytes, "co_code")
+        consts = self._expect(tuple, "co_consts")
+        names = self._names("co_names")
+        if v >= (3, 11):
+            plus_names = self._names("co_localsplusnames")
+            kinds = self._expect(bytes, "co_localspluskinds")
+            if len(kinds) != len(plus_names):
+                raise MarshalError(f"co_localspluskinds length mismatch ({v})")
+            varnames = tuple(n for n, k in zip(plus_names, kinds) if k & CO_FAST_LOCAL)
+            cellvars = tuple(n for n, k in zip(plus_names, kinds) if k & CO_FAST_CELL)
+            freevars = tuple(n for n, k in zip(plus_names, kinds) if k & CO_FAST_FREE)
+            nlocals = len(varnames)
+        else:
+            varnames = self._names("co_varnames")
+            freevars = self._names("co_freevars")
+            cellvars = self._names("co_cellvars")
+        filename = self._expect(str, "co_filename")
+        name = self._expect(str, "co_name")
+        qualname = self._expect(str, "co_qualname") if v >= (3, 11) else name
+        firstlineno = self.long()
+        linetable = self._expect(bytes, "co_linetable")
+        exceptiontable = self._expect(bytes, "co_exceptiontable") if v >= (3, 11) else b""
+        return Code(v, argcount, posonly, kwonly, nlocals, stacksize, flags, code, consts, names,
+                    varnames, freevars, cellvars, filename, name, qualname, firstlineno, linetable,
+                    exceptiontable, self.inferred)
+
+
+_NULL = object()
+
+
+def loads(data: bytes, version: Optional[Tuple[int, int]] = None) -> object:
+    """
+    Parse a marshal stream written by Python `version` (3.7-3.13). Without a
+    version every supported format is tried, newest first, and the first one
+    that parses wins; formats that share a layout (3.8-3.10, 3.11-3.13)
+    cannot be told apart, so their Code objects get the newest version with
+    inferred=True (see version_label). Code objects come back as Code.
+    """
+    errors = []
+    for v in ((version,) if version else VERSIONS):
+        if v not in VERSIONS:
+            raise MarshalError(f"unsupported marshal version {v}")
+        reader = _Reader(data, v, inferred=version is None)
+        try:
+            value = reader.object()
+        except (MarshalError, struct.error, ValueError, TypeError, RecursionError) as e:
+            errors.append(f"{v[0]}.{v[1]}: {e}")
+            continue
+        if value is _NULL:
+            errors.append(f"{v[0]}.{v[1]}: NULL object")
+            continue
+        return value
+    raise MarshalError("; ".join(errors))
+
+
+def version_label(code: Code) -> str:
+    """"3.12" for a known version, the layout range ("3.11-3.13") when it was inferred."""
+    if code.inferred:
+        for lo, hi in LAYOUTS:
+            if lo <= code.version <= hi and lo != hi:
+                return f"{lo[0]}.{lo[1]}-{hi[0]}.{hi[1]}"
+    return f"{code.version[0]}.{code.version[1]}"
+
+
+def load_pyc(data: bytes) -> Tuple[Optional[Tuple[int, int]], object]:
+    """(version, object) لمحتوى ملف .pyc: الإصدار من MAGIC ثم marshal بعد ترويسة 16 بايت."""
+    version = version_from_magic(data[:4])
+    return version, loads(data[16:], version)
+
+
+def is_code(value: object) -> bool:
+    return isinstance(value, Code) or hasattr(value, "co_code")
+
+
+def load_any(data: bytes, version: Optional[Tuple[int, int]] = None) -> object:
+    """
+    marshal.loads of the host interpreter when the format matches it (fast
+    path, real code objects), otherwise the pure-Python reader.
+    """
+    if version is None or version == HOST_VERSION:
+        try:
+            return marshal.loads(data)
+        except Exception:
+            if version == HOST_VERSION:
+                raise
+    return loads(data, version)
+
+
+def iter_code(code: Code) -> Iterator[Code]:
+    """code نفسه ثم كل Code متداخل في ثوابته."""
+    yield code
+    for const in code.consts:
+        if isinstance(const, Code):
+            yield from iter_code(const)
+
+
+def format_code(code: Code) -> str:
+    """
+    Text listing of a Code and its nested code objects: names, constants
+    and raw bytecode. The host dis module cannot decode another version's
+    opcodes, so bytecode is shown as hex.
+    """
+    lines = [f"# marshal format {version_label(code)}{' (inferred)' if code.inferred else ''} (pure-Python reader)"]
+    for c in iter_code(code):
+        lines.append(f"\n== {c.qualname} ({c.filename}:{c.firstlineno}) ==")
+        lines.append(f"argcount={c.argcount} posonly={c.posonlyargcount} kwonly={c.kwonlyargcount} "
+                     f"nlocals={c.nlocals} stacksize={c.stacksize} flags=0x{c.flags:x}")
+        lines.append(f"names: {', '.join(c.names)}")
+        lines.append(f"varnames: {', '.join(c.varnames)}")
+        if c.freevars or c.cellvars:
+            lines.append(f"freevars: {', '.join(c.freevars)}  cellvars: {', '.join(c.cellvars)}")
+        lines.append("consts:")
+        for i, const in enumerate(c.consts):
+            shown = f"<code {const.qualname}>" if isinstance(const, Code) else repr(const)
+            lines.append(f"  [{i}] {shown[:200]}")
+        lines.append(f"code ({len(c.code)} bytes): {c.code.hex()}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,312 @@
+"""
+similarity.py
+بصمة تشابه لكل طبقة نهائية مفكوكة، وفهرس يجمع المخرجات المتقاربة في عائلات
+(clusters) لكل منها عينة ممثّلة، حتى يراجع المحلل عشرات العائلات بدل آلاف
+الملفات المتشابهة.
+
+البصمة MinHash على shingles من 4 tokens (بطريقة one-permutation hashing:
+hash واحد لكل shingle بدل 128، مع densification للخانات الفارغة)، فتُحسب
+في مرور واحد على الملف. الفهرس SQLite مع LSH banding: كل بصمة تُقسم إلى
+BANDS شريحة، والبحث عن المرشحين استعلامات مفهرسة بعدد الشرائح مهما كبر
+الفهرس، ثم يُتحقق من التشابه المقدَّر على المرشحين فقط.
+
+يُفعَّل بتمرير مسار قاعدة البيانات في ITSH_SIMILARITY (بنفس أسلوب ITSH_CACHE)
+لـ decode وللخيارات 1 و13 ولوضع watch. ولإدارة الفهرس مباشرة:
+
+    python -m itsh_decode.similarity add index.sqlite decoded/
+    python -m itsh_decode.similarity clusters index.sqlite --min-size 2
+    python -m itsh_decode.similarity query index.sqlite sample.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+SIMILARITY_ENV = "ITSH_SIMILARITY"
+NUM_BINS = 128
+BANDS = 32             # 32 شريحة × 4 خانات: المرشح يظهر من تشابه ~0.42
+ROWS = NUM_BINS // BANDS
+THRESHOLD = 0.5        # التشابه المقدَّر المطلوب للانضمام لعائلة
+SHINGLE = 4
+MIN_SHINGLES = 8       # أقل من ذلك لا بصمة (تُجمع النسخ المتطابقة فقط)
+MAX_BYTES = 4 * 1024 * 1024  # تُبصم أول 4MB فقط من الطبقات الأكبر
+CANDIDATES_PER_BAND = 8  # عائلة كبيرة تملأ الشريحة: تكفي بضع عينات منها للتحقق
+
+_TOKEN = re.compile(rb"[A-Za-z_][A-Za-z0-9_]*|\d+|[^\sA-Za-z0-9_]")
+_MASK = (1 << 64) - 1
+_MULT = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_BIN_SHIFT = 64 - (NUM_BINS.bit_length() - 1)
+_VALUE_MASK = (1 << _BIN_SHIFT) - 1
+_EMPTY = _VALUE_MASK + 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    signature BLOB,
+    cluster INTEGER NOT NULL,
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_sha ON samples (sha256);
+CREATE INDEX IF NOT EXISTS samples_cluster ON samples (cluster);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    sample INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket);
+"""
+
+
+class Match(NamedTuple):
+    sample: int
+    path: str
+    cluster: int
+    similarity: float
+
+
+class Cluster(NamedTuple):
+    id: int
+    size: int
+    representative: str
+    members: List[str]
+
+
+def _mix(h: int) -> int:
+    # splitmix64 finalizer: يوزّع البتات قبل أخذ الخانة والقيمة
+    h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK
+    return h ^ (h >> 31)
+
+
+def fingerprint(data: bytes) -> Optional[array]:
+    """
+    NUM_BINS-slot MinHash signature (array of uint64) over SHINGLE-token
+    windows, or None when the text has fewer than MIN_SHINGLES shingles.
+    Stable across processes and runs (crc32 token hashes, no hash()).
+    """
+    tokens = [zlib.crc32(t) for t in _TOKEN.findall(data[:MAX_BYTES])]
+    n = len(tokens) - SHINGLE + 1
+    if n < MIN_SHINGLES:
+        return None
+    m0, m1, m2, m3 = _MULT
+    bins = [_EMPTY] * NUM_BINS
+    for i in range(n):
+        h = _mix((tokens[i] * m0 ^ tokens[i + 1] * m1 ^ tokens[i + 2] * m2 ^ tokens[i + 3] * m3) & _MASK)
+        b = h >> _BIN_SHIFT
+        v = h & _VALUE_MASK
+        if v < bins[b]:
+            bins[b] = v
+    # densification: الخانة الفارغة تأخذ قيمة أقرب خانة ممتلئة على يمينها مع إزاحة بالمسافة
+    for b in range(NUM_BINS):
+        if bins[b] == _EMPTY:
+            for d in range(1, NUM_BINS):
+                v = bins[(b + d) % NUM_BINS]
+                if v < _EMPTY:
+                    bins[b] = (v + d * 0x9E3779B97F4A7C15) & _VALUE_MASK
+                    break
+    return array("Q", bins)
+
+
+def similarity(a: array, b: array) -> float:
+    """تشابه Jaccard المقدَّر: نسبة الخانات المتساوية."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_BINS
+
+
+def band_keys(sig: array) -> List[int]:
+    return [zlib.crc32(sig[i * ROWS:(i + 1) * ROWS].tobytes()) for i in range(BANDS)]
+
+
+def _load(blob: bytes) -> array:
+    sig = array("Q")
+    sig.frombytes(blob)
+    return sig
+
+
+class SimilarityIndex:
+    """
+    Fingerprints of decoded final layers, clustered on insert: a sample joins
+    the cluster of its best match at or above THRESHOLD (found through LSH
+    band buckets), otherwise starts a new one with itself as representative.
+    A sample matching several clusters merges them into the largest.
+    """
+
+    def __init__(self, path: str = ":memory:", threshold: float = THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def candidates(self, sig: array, limit: int = CANDIDATES_PER_BAND) -> List[Match]:
+        """العينات التي تشترك مع sig في شريحة واحدة على الأقل، مرتبة بالتشابه."""
+        seen = set()
+        for band, bucket in enumerate(band_keys(sig)):
+            seen.update(r[0] for r in self.db.execute(
+                "SELECT sample FROM bands WHERE band=? AND bucket=? LIMIT ?", (band, bucket, limit)))
+        if not seen:
+            return []
+        rows = self.db.execute(f"SELECT id, path, cluster, signature FROM samples WHERE id IN "
+                               f"({','.join('?' * len(seen))})", tuple(seen)).fetchall()
+        out = [Match(sid, path, cluster, similarity(sig, _load(blob))) for sid, path, cluster, blob in rows]
+        return sorted(out, key=lambda m: m.similarity, reverse=True)
+
+    def query(self, data: bytes) -> List[Match]:
+        sig = fingerprint(data)
+        if sig is None:
+            digest = hashlib.sha256(data).hexdigest()
+            return [Match(i, p, c, 1.0) for i, p, c in self.db.execute(
+                "SELECT id, path, cluster FROM samples WHERE sha256=?", (digest,))]
+        return [m for m in self.candidates(sig) if m.similarity >= self.threshold]
+
+    def _cluster_size(self, cluster: int) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM samples WHERE cluster=?", (cluster,)).fetchone()[0]
+
+    def add(self, path: str, data: Union[bytes, Path]) -> Tuple[int, int]:
+        """Fingerprint data (bytes or a file) for path; returns (sample id, cluster id)."""
+        if isinstance(data, Path):
+            with open(data, "rb") as f:
+                data = f.read(MAX_BYTES)
+        digest = hashlib.sha256(data).hexdigest()
+        sig = fingerprint(data)
+        self.db.execute("BEGIN")
+        try:
+            same = self.db.execute("SELECT cluster FROM samples WHERE sha256=? LIMIT 1", (digest,)).fetchone()
+            clusters = [same[0]] if same else []
+            if sig is not None and not same:
+                clusters = list(dict.fromkeys(m.cluster for m in self.candidates(sig)
+                                              if m.similarity >= self.threshold))
+            cur = self.db.execute("INSERT INTO samples VALUES (NULL, ?, ?, ?, ?, 0, ?)",
+                                  (path, digest, len(data), sig.tobytes() if sig is not None else None,
+                                   time.time()))
+            sid = cur.lastrowid
+            if clusters:
+                target = max(clusters, key=self._cluster_size)
+                for other in clusters:
+                    if other != target:
+                        self.db.execute("UPDATE samples SET cluster=? WHERE cluster=?", (target, other))
+            else:
+                target = sid  # عائلة جديدة: العينة نفسها هي الممثّلة
+            self.db.execute("UPDATE samples SET cluster=? WHERE id=?", (target, sid))
+            # النسخ المتطابقة لا تحتاج شرائح: تُجمع عبر sha256
+            if sig is not None and not same:
+                self.db.executemany("INSERT INTO bands VALUES (?, ?, ?)",
+                                    [(b, k, sid) for b, k in enumerate(band_keys(sig))])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return sid, target
+
+    def clusters(self, min_size: int = 2, members: int = 5) -> List[Cluster]:
+        """العائلات الأكبر أولاً، مع مسار العينة الممثّلة (عينة العائلة الأولى) وأول members مسار."""
+        out = []
+        rows = self.db.execute("SELECT cluster, COUNT(*) AS n FROM samples GROUP BY cluster HAVING n >= ? "
+                               "ORDER BY n DESC", (min_size,)).fetchall()
+        for cluster, n in rows:
+            paths = [r[0] for r in self.db.execute(
+                "SELECT path FROM samples WHERE cluster=? ORDER BY id LIMIT ?", (cluster, members + 1))]
+            rep = self.db.execute("SELECT path FROM samples WHERE id=?", (cluster,)).fetchone()
+            out.append(Cluster(cluster, n, rep[0] if rep else paths[0], paths))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "samples": self.db.execute("SELECT COUNT(*) FROM samples").fetchone()[0],
+            "clusters": self.db.execute("SELECT COUNT(DISTINCT cluster) FROM samples").fetchone()[0],
+            "multi": self.db.execute("SELECT COUNT(*) FROM (SELECT cluster FROM samples GROUP BY cluster "
+                                     "HAVING COUNT(*) > 1)").fetchone()[0],
+        }
+
+    def close(self) -> None:
+        self.db.close()
+
+
+_OPEN: Dict[str, SimilarityIndex] = {}
+
+
+def open_index(path: Optional[str] = None) -> Optional[SimilarityIndex]:
+    """الفهرس لـ path (أو $ITSH_SIMILARITY)، مفتوح مرة واحدة لكل عملية. None إن لم يُفعَّل."""
+    path = path or os.environ.get(SIMILARITY_ENV)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path not in _OPEN:
+        _OPEN[path] = SimilarityIndex(path)
+    return _OPEN[path]
+
+
+def final_layer(entries: List[Tuple[str, Union[bytes, Path]]]) -> Optional[Union[bytes, Path]]:
+    """بيانات آخر طبقة في مدخلات الخيار 1 (layerNN.*)، أو None إن لم تُفك أي طبقة."""
+    layers = [data for name, data in entries if name.rsplit("/", 1)[-1].startswith("layer")]
+    return layers[-1] if layers else None
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    return (f"فهرس التشابه: samples={stats['samples']} clusters={stats['clusters']} "
+            f"(منها {stats['multi']} بأكثر من عينة)")
+
+
+def format_clusters(clusters: Iterable[Cluster]) -> str:
+    lines = []
+    for c in clusters:
+        lines.append(f"cluster {c.id}\t{c.size} samples\trepresentative: {c.representative}")
+        lines.extend(f"    {p}" for p in c.members if p != c.representative)
+        if c.size > len(c.members):
+            lines.append(f"    ... (+{c.size - len(c.members)})")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .cli import iter_inputs
+
+    parser = argparse.ArgumentParser(prog="itsh_decode.similarity", description="fuzzy clustering of decoded layers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="fingerprint files (already decoded outputs) into the index")
+    add.add_argument("db")
+    add.add_argument("paths", nargs="+", metavar="PATH")
+    cl = sub.add_parser("clusters", help="list clusters, largest first")
+    cl.add_argument("db")
+    cl.add_argument("--min-size", type=int, default=2)
+    cl.add_argument("--members", type=int, default=5, help="member paths shown per cluster")
+    q = sub.add_parser("query", help="indexed samples similar to FILE")
+    q.add_argument("db")
+    q.add_argument("file")
+    args = parser.parse_args(argv)
+
+    index = SimilarityIndex(args.db)
+    if args.command == "add":
+        for path in iter_inputs(args.paths):
+            sid, cluster = index.add(path, Path(path))
+            print(f"{cluster}\t{path}")
+        print(format_stats(index.stats()), file=sys.stderr)
+    elif args.command == "clusters":
+        print(format_clusters(index.clusters(args.min_size, args.members)))
+        print(format_stats(index.stats()), file=sys.stderr)
+    else:
+        with open(args.file, "rb") as f:
+            data = f.read(MAX_BYTES)
+        for m in index.query(data):
+            print(f"{m.similarity:.2f}\t{m.cluster}\t{m.path}")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
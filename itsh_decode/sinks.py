@@ -0,0 +1,380 @@
+"""
+sinks.py
+طبقة مخرجات مشتركة: كل ما تنتجه الأداة (طبقات الخيار 1، وملفات الخيارات
+الأخرى) يُكتب عبر Sink واحد بخلفية قابلة للاختيار:
+
+    dir:PATH            شجرة مجلدات عادية
+    zip:PATH            أرشيف ZIP واحد (DEFLATE، سلوك الخيار 1 الافتراضي)
+    zip-stored:PATH     أرشيف ZIP بدون ضغط (ZIP_STORED)
+    shards:PATH         عدة أرشيفات PATH.NN.zip، كل منها بخيط ضغط خاص به
+    shards-stored:PATH  نفسه بدون ضغط
+    tar:PATH / tar.gz:PATH   tar متدفّق
+    sqlite:PATH         جدول blobs واحد في SQLite
+
+بدون بادئة يُستنتج النوع من الامتداد (.zip / .tar / .tar.gz / .sqlite،
+وإلا مجلد). الاختيار عبر متغير البيئة ITSH_SINK (أو --sink في سطر الأوامر)،
+وعدد الـ shards عبر ITSH_SINK_SHARDS (الافتراضي عدد المعالجات).
+
+الأسماء لا تتصادم أبداً: اسم مكرر في نفس الـ sink (أو ملف موجود على القرص)
+يأخذ لاحقة _1، _2، ... بدل الكتابة فوق الناتج السابق.
+"""
+
+from __future__ import annotations
+
+import atexit
+import io
+import os
+import shutil
+import sqlite3
+import tarfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+SINK_ENV = "ITSH_SINK"
+SHARDS_ENV = "ITSH_SINK_SHARDS"
+COPY_CHUNK = 1024 * 1024
+
+# بيانات مدخل: bytes، أو مسار ملف طبقة على القرص (انظر layered.EntryData)
+EntryData = Union[bytes, Path]
+Entries = List[Tuple[str, EntryData]]
+
+
+def _split_name(name: str) -> Tuple[str, str]:
+    base = name.rsplit("/", 1)[-1]
+    dot = base.find(".", 1)
+    if dot < 0:
+        return name, ""
+    cut = len(name) - len(base) + dot
+    return name[:cut], name[cut:]
+
+
+def numbered(name: str, n: int) -> str:
+    """a/b.py -> a/b_1.py (الرقم قبل أول امتداد، فيبقى layer01.zlib.bin مقروءاً)."""
+    stem, ext = _split_name(name)
+    return f"{stem}_{n}{ext}"
+
+
+class Sink:
+    """
+    Destination for decoded outputs. write() stores one entry and returns
+    the name it was stored under (renamed on collision); submit() may hand a
+    whole file's entries to a background writer; close() flushes everything.
+    Path entries are streamed from disk and their temp layer dir removed.
+    """
+
+    kind = "sink"
+
+    def __init__(self, location: str):
+        self.location = location
+        self._names: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _taken(self, name: str) -> bool:
+        return name in self._names
+
+    def unique(self, name: str) -> str:
+        # لا مسارات مطلقة ولا ".." تخرج من جذر الـ sink
+        name = "/".join(p if p not in (".", "..") else "_" for p in name.replace("\\", "/").split("/") if p)
+        out, n = name, 0
+        while self._taken(out):
+            n += 1
+            out = numbered(name, n)
+        self._names.add(out)
+        return out
+
+    def _put(self, name: str, data: EntryData) -> None:
+        raise NotImplementedError
+
+    def write(self, name: str, data: EntryData) -> str:
+        with self._lock:
+            name = self.unique(name)
+            self._put(name, data)
+        return name
+
+    def write_entries(self, entries: Entries) -> List[str]:
+        from .stream import cleanup_layer_tmp
+
+        names = [self.write(name, data) for name, data in entries]
+        for _, data in entries:
+            if isinstance(data, Path):
+                cleanup_layer_tmp(str(data))
+        return names
+
+    def submit(self, entries: Entries) -> None:
+        self.write_entries(entries)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Sink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{self.kind}:{self.location}"
+
+
+class DirSink(Sink):
+    """Plain directory tree: entry a/b.bin -> ROOT/a/b.bin."""
+
+    kind = "dir"
+
+    def __init__(self, root: str):
+        super().__init__(root)
+        os.makedirs(root, exist_ok=True)
+
+    def _taken(self, name: str) -> bool:
+        return name in self._names or os.path.exists(self.path_of(name))
+
+    def path_of(self, name: str) -> str:
+        return os.path.join(self.location, *name.split("/"))
+
+    def _put(self, name: str, data: EntryData) -> None:
+        path = self.path_of(name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if isinstance(data, Path):
+            shutil.copyfile(data, path)
+        else:
+            with open(path, "wb") as f:
+                f.write(data)
+
+
+class ZipSink(Sink):
+    """One ZIP archive; compression is ZIP_DEFLATED (option 1) or ZIP_STORED."""
+
+    kind = "zip"
+
+    def __init__(self, path: str, compression: int = zipfile.ZIP_DEFLATED):
+        super().__init__(path)
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.zip = zipfile.ZipFile(path, "w", compression=compression, allowZip64=True)
+
+    def _put(self, name: str, data: EntryData) -> None:
+        if isinstance(data, Path):
+            with open(data, "rb") as src, self.zip.open(name, "w", force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, COPY_CHUNK)
+        else:
+            self.zip.writestr(name, data)
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+class ShardedZipSink(Sink):
+    """
+    N archives STEM.00.zip .. STEM.NN.zip, each with its own writer thread,
+    so compression runs in parallel (zlib releases the GIL). All entries of
+    one input file (same first path component) land in the same shard.
+    """
+
+    kind = "shards"
+
+    def __init__(self, stem: str, shards: Optional[int] = None, compression: int = zipfile.ZIP_DEFLATED):
+        super().__init__(stem)
+        if stem.lower().endswith(".zip"):
+            stem = stem[:-4]
+        if shards is None:
+            shards = int(os.environ.get(SHARDS_ENV) or os.cpu_count() or 1)
+        shards = max(1, shards)
+        self.shards = [ZipSink(f"{stem}.{i:02d}.zip", compression) for i in range(shards)]
+        # خيط واحد لكل shard: الكتابة في أرشيف واحد تبقى متسلسلة
+        self.pools = [ThreadPoolExecutor(max_workers=1) for _ in range(shards)]
+        self.futures: List[Future] = []
+
+    def shard_for(self, name: str) -> int:
+        return zlib.crc32(name.split("/", 1)[0].encode("utf-8")) % len(self.shards)
+
+    def write(self, name: str, data: EntryData) -> str:
+        with self._lock:
+            name = self.unique(name)
+        shard = self.shards[self.shard_for(name)]
+        with shard._lock:
+            shard._put(name, data)
+        return name
+
+    def submit(self, entries: Entries) -> None:
+        if not entries:
+            return
+        i = self.shard_for(entries[0][0])
+        self.futures.append(self.pools[i].submit(self.write_entries, entries))
+        # أخطاء الكتابة تظهر مبكراً بدل نهاية التشغيل
+        running = []
+        for f in self.futures:
+            if f.done():
+                f.result()
+            else:
+                running.append(f)
+        self.futures = running
+
+    def close(self) -> None:
+        for f in self.futures:
+            f.result()
+        for pool in self.pools:
+            pool.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+
+class TarSink(Sink):
+    """Streaming tar (mode "w|" or "w|gz"): entries are appended as they come."""
+
+    kind = "tar"
+
+    def __init__(self, path: str, gz: bool = False):
+        super().__init__(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.tar = tarfile.open(path, "w|gz" if gz else "w|")
+
+    def _put(self, name: str, data: EntryData) -> None:
+        info = tarfile.TarInfo(name)
+        info.mtime = int(time.time())
+        if isinstance(data, Path):
+            info.size = os.path.getsize(data)
+            with open(data, "rb") as f:
+                self.tar.addfile(info, f)
+        else:
+            info.size = len(data)
+            self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        self.tar.close()
+
+
+class SqliteSink(Sink):
+    """
+    Single table outputs(name, size, ts, data) in one SQLite file, committed
+    after every file. Path entries are streamed into the blob in chunks.
+    """
+
+    kind = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS outputs (name TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                        "ts REAL NOT NULL, data BLOB NOT NULL)")
+        self._names.update(r[0] for r in self.db.execute("SELECT name FROM outputs"))
+        # zeroblob يبقى كسولاً فقط إن كان العمود الأخير (ملفات أقدم فيها data قبل size, ts)؛ blobopen منذ 3.11
+        columns = [r[1] for r in self.db.execute("PRAGMA table_info(outputs)")]
+        self._stream = columns[-1] == "data" and hasattr(self.db, "blobopen")
+
+    def _put(self, name: str, data: EntryData) -> None:
+        if isinstance(data, Path) and self._stream:
+            # طبقة على القرص: blob بحجمها ثم تُنسخ إليه قطعة قطعة بدل قراءتها كاملة في الذاكرة
+            size = os.path.getsize(data)
+            row = self.db.execute("INSERT INTO outputs (name, size, ts, data) VALUES (?, ?, ?, zeroblob(?))",
+                                  (name, size, time.time(), size)).lastrowid
+            with open(data, "rb") as f, self.db.blobopen("outputs", "data", row) as blob:
+                for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+                    blob.write(chunk)
+            return
+        if isinstance(data, Path):
+            data = data.read_bytes()
+        self.db.execute("INSERT INTO outputs (name, size, ts, data) VALUES (?, ?, ?, ?)",
+                        (name, len(data), time.time(), data))
+
+    def write_entries(self, entries: Entries) -> List[str]:
+        names = super().write_entries(entries)
+        # commit لكل ملف: ما كُتب يبقى إن توقف التشغيل قبل close
+        with self._lock:
+            self.db.commit()
+        return names
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+
+_KINDS = ("dir", "zip", "zip-stored", "shards", "shards-stored", "tar", "tar.gz", "sqlite")
+
+
+def parse_spec(spec: str) -> Tuple[str, str]:
+    """'KIND:PATH' -> (kind, path)؛ بدون KIND يُستنتج من الامتداد."""
+    kind, sep, path = spec.partition(":")
+    if sep and kind in _KINDS:
+        return kind, path
+    low = spec.lower()
+    if low.endswith(".zip"):
+        return "zip", spec
+    if low.endswith((".tar.gz", ".tgz")):
+        return "tar.gz", spec
+    if low.endswith(".tar"):
+        return "tar", spec
+    if low.endswith((".sqlite", ".sqlite3", ".db")):
+        return "sqlite", spec
+    return "dir", spec
+
+
+def open_sink(spec: str) -> Sink:
+    """New sink for spec (see the module docstring for the forms)."""
+    kind, path = parse_spec(spec)
+    if kind == "dir":
+        return DirSink(path)
+    if kind in ("zip", "zip-stored"):
+        return ZipSink(path, zipfile.ZIP_STORED if kind == "zip-stored" else zipfile.ZIP_DEFLATED)
+    if kind in ("shards", "shards-stored"):
+        return ShardedZipSink(path, compression=zipfile.ZIP_STORED if kind == "shards-stored"
+                              else zipfile.ZIP_DEFLATED)
+    if kind in ("tar", "tar.gz"):
+        return TarSink(path, gz=kind == "tar.gz")
+    return SqliteSink(path)
+
+
+_OPEN: Dict[str, Sink] = {}
+
+
+def shared_sink(spec: Optional[str] = None) -> Optional[Sink]:
+    """Sink لـ spec (أو $ITSH_SINK)، مفتوح مرة واحدة لكل عملية ويُغلق عند الخروج. None إن لم يُفعَّل."""
+    spec = spec or os.environ.get(SINK_ENV)
+    if not spec:
+        return None
+    if spec not in _OPEN:
+        _OPEN[spec] = open_sink(spec)
+    return _OPEN[spec]
+
+
+@atexit.register
+def _close_shared() -> None:
+    while _OPEN:
+        _OPEN.popitem()[1].close()
+
+
+def unique_path(path: str) -> str:
+    """path نفسه إن لم يوجد، وإلا أول path_N غير موجود."""
+    if not os.path.exists(path):
+        return path
+    d, base = os.path.split(path)
+    n = 1
+    while os.path.exists(os.path.join(d, numbered(base, n))):
+        n += 1
+    return os.path.join(d, numbered(base, n))
+
+
+def save_output(default_path: Union[str, Path], data: Union[bytes, str], group: str = "") -> str:
+    """
+    Store one output file of a menu option. With $ITSH_SINK it goes into
+    the shared sink as GROUP/<file name>; otherwise to default_path, or to
+    a numbered sibling when that file already exists. Returns where it went.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8", errors="replace")
+    default_path = str(default_path)
+    sink = shared_sink()
+    if sink is not None:
+        name = os.path.basename(default_path)
+        name = sink.write(f"{group}/{name}" if group else name, data)
+        return f"{sink!r}/{name}"
+    path = unique_path(default_path)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
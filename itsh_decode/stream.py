@@ -0,0 +1,345 @@
+"""
+stream.py
+فك طبقات base64/base16 → zlib/bz2/lzma بشكل متدفّق (chunk by chunk) بذاكرة ثابتة.
+
+كل طبقة تُكتب مباشرة إلى ملف على القرص، والطبقة التالية تُقرأ منه، فلا
+تُحمَّل أي طبقة كاملة في الذاكرة مهما كان حجم الملف الأصلي.
+"""
+
+from __future__ import annotations
+
+import binascii
+import bz2
+import lzma
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from .limits import DecompressionLimit, Limits, check, current_limits
+from .telemetry import FAIL, LIMIT, OK, Telemetry
+
+CHUNK_SIZE = 1024 * 1024
+OUT_CHUNK = 1024 * 1024
+MIN_HEX_RUN = 64
+MIN_B64_RUN = 80
+LAYER_TMP_PREFIX = "itsh_layers_"
+TRUNCATED = "_truncated"
+
+_HEX_RUN_RE = re.compile(rb"[0-9A-Fa-f]+")
+_B64_RUN_RE = re.compile(rb"[A-Za-z0-9+/=\r\n]+")
+_WHITESPACE = b" \t\r\n"
+
+
+def find_longest_run(f: BinaryIO, run_re: "re.Pattern[bytes]",
+                     chunk_size: int = CHUNK_SIZE) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) لأطول سلسلة متصلة من أحرف run_re في الملف، بقراءة واحدة
+    على دفعات. السلسلة التي تصل لنهاية دفعة تُكمَل في الدفعة التالية.
+    """
+    f.seek(0)
+    best = (0, 0)
+    run_start = None  # بداية سلسلة مفتوحة من الدفعة السابقة
+    pos = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        if run_start is not None and not run_re.match(chunk, 0, 1):
+            best = max(best, (run_start, pos), key=lambda r: r[1] - r[0])
+            run_start = None
+        for m in run_re.finditer(chunk):
+            s = run_start if (m.start() == 0 and run_start is not None) else pos + m.start()
+            run_start = None
+            if m.end() == len(chunk):
+                run_start = s
+            else:
+                best = max(best, (s, pos + m.end()), key=lambda r: r[1] - r[0])
+        pos += len(chunk)
+    if run_start is not None:
+        best = max(best, (run_start, pos), key=lambda r: r[1] - r[0])
+    return best if best[1] > best[0] else None
+
+
+def iter_span(f: BinaryIO, start: int, end: int, reverse: bool = False,
+              chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """أجزاء المقطع [start, end) من الملف، من الآخر للأول إذا reverse."""
+    if not reverse:
+        f.seek(start)
+        left = end - start
+        while left > 0:
+            chunk = f.read(min(chunk_size, left))
+            if not chunk:
+                break
+            left -= len(chunk)
+            yield chunk
+        return
+    pos = end
+    while pos > start:
+        step = min(chunk_size, pos - start)
+        pos -= step
+        f.seek(pos)
+        yield f.read(step)[::-1]
+
+
+def iter_b64_decode(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk.translate(None, _WHITESPACE)
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        if cut:
+            yield binascii.a2b_base64(data[:cut])
+    carry = carry.rstrip(b"=")
+    if len(carry) >= 2:
+        yield binascii.a2b_base64(carry + b"=" * (-len(carry) % 4))
+
+
+def iter_hex_decode(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk
+        cut = len(data) - len(data) % 2
+        carry = data[cut:]
+        if cut:
+            yield binascii.unhexlify(data[:cut])
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    if len(head) >= 2 and head[0] & 0x0F == 8 and (head[0] * 256 + head[1]) % 31 == 0:
+        return "zlib"
+    if head.startswith(b"BZh"):
+        return "bz2"
+    if head.startswith(b"\xfd7zXZ") or head.startswith(b"\x5d\x00\x00"):
+        return "lzma"
+    return None
+
+
+ZLIB_KINDS = ("zlib", "gzip")
+
+
+def _new_decompressor(kind: str):
+    if kind == "zlib":
+        return zlib.decompressobj()
+    if kind == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if kind == "bz2":
+        return bz2.BZ2Decompressor()
+    # lzma و xz: FORMAT_AUTO يتعرّف على الاثنين
+    return lzma.LZMADecompressor()
+
+
+def iter_decompress(kind: str, chunks: Iterator[bytes], out_chunk: int = OUT_CHUNK,
+                    limits: Optional[Limits] = None, multistream: bool = False) -> Iterator[bytes]:
+    """
+    فك ضغط متدفّق (zlib/gzip/bz2/lzma/xz) بمخرجات لا تتجاوز out_chunk في كل
+    خطوة. يرفع DecompressionLimit قبل أن يتجاوز الناتج حدود limits (الافتراضي:
+    limits.current_limits). مع multistream تُفك التدفقات المتتالية (gzip متعدد
+    الأعضاء، pbzip2، xz مجزّأ) بدل التوقف عند نهاية الأول؛ الحشو الصفري يُتجاهل.
+    """
+    limits = limits or current_limits()
+    d = _new_decompressor(kind)
+    consumed = produced = 0
+
+    def bounded(out: bytes) -> bytes:
+        nonlocal produced
+        produced += len(out)
+        check(kind, produced, consumed, limits)
+        return out
+
+    def feed(data: bytes) -> Iterator[bytes]:
+        # يرجع True حين لا حاجة لمزيد من المدخلات (نهاية التدفق بدون multistream)
+        nonlocal d
+        while True:
+            if d.eof:
+                if not (multistream and data.strip(b"\0")):
+                    return not multistream
+                d = _new_decompressor(kind)
+            if kind in ZLIB_KINDS:
+                out = d.decompress(data, out_chunk)
+                data = d.unconsumed_tail
+            else:
+                out = d.decompress(data, max_length=out_chunk)
+                data = b""
+            if out:
+                yield bounded(out)
+            if d.eof:
+                # zlib يترك ما بعد النهاية في unconsumed_tail و unused_data معاً
+                data = d.unused_data
+            elif not data and (kind in ZLIB_KINDS or d.needs_input):
+                return False
+
+    for chunk in chunks:
+        consumed += len(chunk)
+        if (yield from feed(chunk)):
+            return
+    if kind in ZLIB_KINDS:
+        tail = d.flush()
+        if tail:
+            yield bounded(tail)
+        if not d.eof:
+            raise zlib.error(f"incomplete {kind} stream")
+    elif not d.eof:
+        raise EOFError(f"incomplete {kind} stream")
+
+
+def decompress_bounded(kind: str, data: bytes, limits: Optional[Limits] = None) -> bytes:
+    """
+    In-memory zlib/bz2/lzma decompression through iter_decompress. On a
+    limit the raised DecompressionLimit carries the output produced so far
+    in .partial.
+    """
+    parts = []
+    try:
+        for out in iter_decompress(kind, iter((data,)), limits=limits):
+            parts.append(out)
+    except DecompressionLimit as e:
+        e.partial = b"".join(parts)
+        raise
+    return b"".join(parts)
+
+
+def _peek(chunks: Iterator[bytes], n: int = 16) -> Tuple[bytes, Iterator[bytes]]:
+    head = b""
+    buffered = []
+    for chunk in chunks:
+        buffered.append(chunk)
+        head += chunk[:n - len(head)]
+        if len(head) >= n:
+            break
+
+    def rest():
+        yield from buffered
+        yield from chunks
+    return head, rest()
+
+
+def write_chunks(chunks: Iterator[bytes], out_path: str) -> int:
+    total = 0
+    with open(out_path, "wb") as out:
+        for chunk in chunks:
+            out.write(chunk)
+            total += len(chunk)
+    return total
+
+
+def _span_decoder(f: BinaryIO, encoding: str, span: Tuple[int, int], reverse: bool) -> Iterator[bytes]:
+    chunks = iter_span(f, span[0], span[1], reverse)
+    return iter_hex_decode(chunks) if encoding == "base16" else iter_b64_decode(chunks)
+
+
+def _pick_span(f: BinaryIO) -> Optional[Tuple[str, Tuple[int, int]]]:
+    """نفس أولوية الخيار 1: base16 أولاً ثم base64."""
+    hex_span = find_longest_run(f, _HEX_RUN_RE)
+    b64_span = find_longest_run(f, _B64_RUN_RE)
+    hex_len = hex_span[1] - hex_span[0] if hex_span else 0
+    b64_len = b64_span[1] - b64_span[0] if b64_span else 0
+    if hex_len >= MIN_HEX_RUN and hex_len + 4 >= b64_len:
+        return "base16", hex_span
+    if b64_len >= MIN_B64_RUN:
+        return "base64", b64_span
+    return None
+
+
+def stream_layer(in_path: str, out_path: str) -> Optional[str]:
+    """
+    Decode one layer of in_path straight into out_path with bounded memory.
+    Returns the layer label in option 1 naming ("base64_then_zlib",
+    "reverse_base16", "zlib", ...) or None when nothing was recognised.
+    A layer cut off by the decompression limits is kept as written so far
+    and its label ends in TRUNCATED.
+    """
+    with open(in_path, "rb") as f:
+        kind = detect_compression(f.read(16))
+        if kind:
+            f.seek(0)
+            try:
+                write_chunks(iter_decompress(kind, iter(lambda: f.read(CHUNK_SIZE), b"")), out_path)
+                return kind
+            except DecompressionLimit:
+                return kind + TRUNCATED
+            except Exception:
+                pass
+
+        picked = _pick_span(f)
+        if not picked:
+            return None
+        encoding, span = picked
+
+        # السلسلة قد تكون معكوسة: نختار الاتجاه الذي يبدأ بترويسة ضغط
+        # (الخيار 1 يجرّب base16 المعكوس أولاً)
+        directions = [True, False] if encoding == "base16" else [False, True]
+        chosen = None
+        for reverse in directions:
+            try:
+                head, _ = _peek(_span_decoder(f, encoding, span, reverse))
+            except Exception:
+                continue
+            if detect_compression(head):
+                chosen = reverse
+                break
+            if chosen is None:
+                chosen = reverse
+        if chosen is None:
+            return None
+        prefix = ("reverse_" if chosen else "") + encoding
+
+        head, rest = _peek(_span_decoder(f, encoding, span, chosen))
+        kind = detect_compression(head)
+        if kind:
+            try:
+                write_chunks(iter_decompress(kind, rest), out_path)
+                return f"{prefix}_then_{kind}"
+            except DecompressionLimit:
+                return f"{prefix}_then_{kind}{TRUNCATED}"
+            except Exception:
+                pass
+        try:
+            write_chunks(_span_decoder(f, encoding, span, chosen), out_path)
+        except Exception:
+            return None
+        return prefix
+
+
+def stream_decode_layers(in_path: str, max_layers: int, workdir: Optional[str] = None,
+                         telemetry: Optional[Telemetry] = None, file: Optional[str] = None
+                         ) -> Tuple[str, List[Tuple[str, str]]]:
+    """
+    Run stream_layer repeatedly. Returns (workdir, [(label, layer_path), ...]).
+    Layer files live in workdir (a fresh LAYER_TMP_PREFIX temp dir by default);
+    the caller removes it once the layers are consumed. With telemetry every
+    layer is recorded as one event under the file name `file`.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix=LAYER_TMP_PREFIX)
+    layers = []
+    current = in_path
+    for i in range(1, max_layers + 1):
+        out_path = os.path.join(workdir, f"layer{i:02d}.bin")
+        t0 = time.perf_counter()
+        label = stream_layer(current, out_path)
+        if telemetry is not None:
+            out_size = os.path.getsize(out_path) if label and os.path.exists(out_path) else 0
+            outcome = (LIMIT if label.endswith(TRUNCATED) else OK) if label else FAIL
+            telemetry.event(file or in_path, i, label or "stream", os.path.getsize(current), out_size,
+                            time.perf_counter() - t0, outcome)
+        if label is None:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            break
+        layers.append((label, out_path))
+        if label.endswith(TRUNCATED):
+            break  # طبقة مبتورة: لا فك بعدها
+        current = out_path
+    return workdir, layers
+
+
+def is_layer_tmp(path: str) -> bool:
+    return os.path.basename(os.path.dirname(os.path.abspath(path))).startswith(LAYER_TMP_PREFIX)
+
+
+def cleanup_layer_tmp(path: str) -> None:
+    if is_layer_tmp(path):
+        shutil.rmtree(os.path.dirname(os.path.abspath(path)), ignore_errors=True)
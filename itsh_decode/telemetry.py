@@ -0,0 +1,211 @@
+"""
+telemetry.py
+سجلّ منظَّم لكل خطوة فك: الملف، رقم الطبقة، التحويل، حجم الدخل والخرج،
+الزمن الفعلي والنتيجة، كسطر JSON في ملف JSONL و/أو لدالة callback.
+في نهاية التشغيل تُلخَّص الأحداث لكل تحويل (مجموع الزمن، p50/p95،
+هستوغرام زمني بمضاعفات 2) مع أبطأ الملفات، لمعرفة ما يستهلك وقت الدفعة.
+
+يُفعَّل بتمرير مسار JSONL (أو عبر متغير البيئة ITSH_TELEMETRY). عمليات
+الـ pool تكتب كل حدث بـ write واحد على ملف مفتوح بـ O_APPEND فلا تتداخل
+الأسطر. تلخيص ملف موجود:
+    python -m itsh_decode.telemetry events.jsonl
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from .limits import DecompressionLimit
+
+TELEMETRY_ENV = "ITSH_TELEMETRY"
+TOP_FILES = 10
+
+# النتائج الممكنة لكل خطوة
+OK = "ok"          # التحويل أنتج طبقة
+FAIL = "fail"      # جُرّب ولم ينتج شيئاً
+HIT = "hit"        # النتيجة جاءت من كاش الطبقات
+LIMIT = "limit"    # أوقفته حدود فك الضغط (limits.py)
+
+EventCallback = Callable[[dict], None]
+
+
+class Telemetry:
+    """Event sink: JSONL file (append-only, one write per event) and/or callbacks."""
+
+    def __init__(self, path: Optional[str] = None, callback: Optional[EventCallback] = None):
+        self.path = path
+        self.callbacks: List[EventCallback] = [callback] if callback else []
+        self._fd = None
+        if path:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+            self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def add_callback(self, callback: EventCallback) -> None:
+        self.callbacks.append(callback)
+
+    def event(self, file: str, layer: int, transform: str, in_size: int, out_size: int,
+              seconds: float, outcome: str) -> dict:
+        ev = {"ts": time.time(), "file": file, "layer": layer, "transform": transform, "in_size": in_size,
+              "out_size": out_size, "seconds": round(seconds, 6), "outcome": outcome}
+        if self._fd is not None:
+            os.write(self._fd, (json.dumps(ev, ensure_ascii=False) + "\n").encode("utf-8"))
+        for cb in self.callbacks:
+            cb(ev)
+        return ev
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class Step:
+    """
+    Time one decode step: `with Step(tel, file, layer, name, data) as s:
+    s.out = fn(data)`. s.out may be bytes, a transform result list or any
+    truthy/falsy value. Nothing is recorded when tel is None.
+    """
+
+    def __init__(self, tel: Optional[Telemetry], file: str, layer: int, transform: str, data: bytes,
+                 cache=None):
+        self.tel = tel
+        self.args = (file, layer, transform, len(data))
+        self.cache = cache
+        self.out = None
+
+    def __enter__(self) -> "Step":
+        self._hits = self.cache.hits if self.cache is not None else 0
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.tel is None:
+            return
+        seconds = time.perf_counter() - self._t0
+        if exc_type is not None and issubclass(exc_type, DecompressionLimit):
+            outcome = LIMIT
+        elif self.cache is not None and self.cache.hits > self._hits:
+            outcome = HIT
+        else:
+            outcome = OK if self.out and exc_type is None else FAIL
+        self.tel.event(*self.args, _size(self.out), seconds, outcome)
+
+
+def _size(out: object) -> int:
+    """حجم الناتج: bytes، أو مجموع مخرجات قائمة تحويل [(label, output), ...]."""
+    if isinstance(out, (bytes, bytearray)):
+        return len(out)
+    if isinstance(out, list):
+        return sum(len(o) for _, o in out if isinstance(o, (bytes, bytearray)))
+    return 0
+
+
+_OPEN: Dict[str, Telemetry] = {}
+
+
+def open_telemetry(path: Optional[str] = None) -> Optional[Telemetry]:
+    """Sink for path (or $ITSH_TELEMETRY), opened once per process. None when telemetry is off."""
+    path = path or os.environ.get(TELEMETRY_ENV)
+    if not path:
+        return None
+    path = os.path.abspath(path)
+    if path not in _OPEN:
+        _OPEN[path] = Telemetry(path)
+    return _OPEN[path]
+
+
+def resolve(telemetry) -> Optional[Telemetry]:
+    """Telemetry كما هو، أو مسار JSONL (يصلح للتمرير إلى عمليات الـ pool)، أو $ITSH_TELEMETRY."""
+    if isinstance(telemetry, Telemetry):
+        return telemetry
+    return open_telemetry(telemetry)
+
+
+def read_events(path: str, since: float = 0.0) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            if ev.get("ts", 0) >= since:
+                yield ev
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _bucket(seconds: float) -> int:
+    """حدّ الهستوغرام الأعلى بالميكروثانية، بمضاعفات 2 بدءاً من 1µs."""
+    return 2 ** math.ceil(math.log2(max(seconds * 1e6, 1.0)))
+
+
+def _bucket_label(edge_us: int) -> str:
+    return f"<={edge_us}us" if edge_us < 1000 else f"<={edge_us / 1000:g}ms"
+
+
+def summarize(events: Iterable[dict], top: int = TOP_FILES) -> dict:
+    """
+    Per-transform totals (count, outcomes, seconds, p50/p95/max, bytes in
+    and out, log2 duration histogram) and the files with the largest total
+    decode time.
+    """
+    per = defaultdict(lambda: {"count": 0, "outcomes": defaultdict(int), "seconds": 0.0, "in_bytes": 0,
+                               "out_bytes": 0, "durations": [], "histogram": defaultdict(int)})
+    per_file = defaultdict(float)
+    n = 0
+    for ev in events:
+        n += 1
+        t = per[ev["transform"]]
+        t["count"] += 1
+        t["outcomes"][ev["outcome"]] += 1
+        t["seconds"] += ev["seconds"]
+        t["in_bytes"] += ev["in_size"]
+        t["out_bytes"] += ev["out_size"]
+        t["durations"].append(ev["seconds"])
+        t["histogram"][_bucket(ev["seconds"])] += 1
+        per_file[ev["file"]] += ev["seconds"]
+
+    transforms = {}
+    for name, t in per.items():
+        d = sorted(t.pop("durations"))
+        t.update(p50=_percentile(d, 0.5), p95=_percentile(d, 0.95), max=d[-1] if d else 0.0,
+                 outcomes=dict(t["outcomes"]), histogram=dict(t["histogram"]))
+        transforms[name] = t
+    slowest = sorted(per_file.items(), key=lambda kv: kv[1], reverse=True)[:top]
+    return {"events": n, "transforms": transforms, "slowest_files": slowest,
+            "seconds": sum(t["seconds"] for t in transforms.values())}
+
+
+def format_summary(summary: dict) -> str:
+    lines = [f"telemetry: {summary['events']} events, {summary['seconds']:.3f}s in decode steps"]
+    by_time = sorted(summary["transforms"].items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+    for name, t in by_time:
+        outcomes = " ".join(f"{k}={v}" for k, v in sorted(t["outcomes"].items()))
+        lines.append(f"  {name:<16} n={t['count']:<6} total={t['seconds']:.3f}s p50={t['p50'] * 1e3:.2f}ms "
+                     f"p95={t['p95'] * 1e3:.2f}ms max={t['max'] * 1e3:.2f}ms "
+                     f"in={t['in_bytes'] / 1e6:.1f}MB out={t['out_bytes'] / 1e6:.1f}MB {outcomes}")
+        lines.append("    " + " ".join(f"{_bucket_label(k)}:{v}" for k, v in sorted(t["histogram"].items())))
+    if summary["slowest_files"]:
+        lines.append("  slowest files:")
+        for path, seconds in summary["slowest_files"]:
+            lines.append(f"    {seconds:8.3f}s  {path}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else os.environ.get(TELEMETRY_ENV)
+    if not target or not os.path.exists(target):
+        print("استخدام: python -m itsh_decode.telemetry <events.jsonl>")
+        sys.exit(1)
+    print(format_summary(summarize(read_events(target))))
@@ -0,0 +1,210 @@
+"""
+transforms.py
+عُقد التحويل (transform nodes) التي يبحث عبرها محرّك الفك.
+
+كل تحويل دالة بالشكل fn(data, hints) -> [(label, output), ...]
+ترجع قائمة فارغة عند الفشل، أو مخرجاً واحداً أو أكثر (مثل xor بعدة مفاتيح).
+التحويلات النصية تختار من فهرس locator.scan_blobs بدل تعابير منتظمة خاصة بها.
+المخرجات إما bytes أو كائن ناتج عن marshal.loads.
+"""
+
+from __future__ import annotations
+
+import ast
+import base64
+import binascii
+import io
+import marshal
+import re
+import zipfile
+from typing import Callable, Dict, List, Tuple
+
+from . import pymarshal
+from .fold import fold_outputs
+from .limits import DecompressionLimit, check, current_limits
+from .locator import ALNUM, B64, B64URL, ESCAPED, HEX, BlobIndex, scan_blobs
+from .stream import CHUNK_SIZE, decompress_bounded
+from .xorkey import best_xor, xor_table
+
+MIN_B64_MATCH_LEN = 80
+MIN_HEX_MATCH_LEN = 64
+
+XOR_KEY_RE = re.compile(rb"(?:_loader_key_stub|\bkey)\s*=\s*(\d{1,3})\b")
+
+TransformFn = Callable[[bytes, dict], List[Tuple[str, object]]]
+
+
+def node_index(data: bytes, hints: dict) -> BlobIndex:
+    """فهرس الـ blobs للعقدة (يمرّره المحرك في hints) أو مسح جديد."""
+    index = hints.get("index")
+    return index if index is not None and index.data is data else scan_blobs(data)
+
+
+def t_reverse(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    # العكس مفيد فقط إذا كان في البافر سلسلة مرمّزة (base64/base16 معكوسة)
+    if not node_index(data, hints).has_payload(MIN_B64_MATCH_LEN, MIN_HEX_MATCH_LEN):
+        return []
+    return [("reverse", data[::-1])]
+
+
+def t_base16(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    index = node_index(data, hints)
+    run = index.longest((HEX,), MIN_HEX_MATCH_LEN) or index.first((HEX,), 16, quoted=True)
+    if not run:
+        return []
+    hexs = index.text(run).translate(None, b"\r\n=")
+    if len(hexs) % 2:
+        hexs = hexs[:-1]
+    try:
+        return [("base16", binascii.unhexlify(hexs))]
+    except Exception:
+        return []
+
+
+def t_base64(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    index = node_index(data, hints)
+    run = index.longest((HEX, ALNUM, B64, B64URL), MIN_B64_MATCH_LEN)
+    if not run:
+        return []
+    b64 = b"".join(index.text(run).split()).rstrip(b"=")
+    if len(b64) % 4 == 1:
+        b64 = b64[:-1]
+    b64 += b"=" * (-len(b64) % 4)
+    try:
+        if run.cls == B64URL:
+            return [("base64", base64.urlsafe_b64decode(b64))]
+        return [("base64", base64.b64decode(b64))]
+    except Exception:
+        return []
+
+
+def t_literal(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    """قيمة أطول literal من نوع b'\\x78\\x9c...' (نمط الخيار 8)."""
+    index = node_index(data, hints)
+    run = index.longest((ESCAPED,), 16)
+    if not run:
+        return []
+    try:
+        value = ast.literal_eval(index.text(run).decode("latin-1"))
+    except Exception:
+        return []
+    return [("literal", value)] if isinstance(value, bytes) else []
+
+
+def _decompress(kind: str, data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    # فك محدود الحجم؛ تجاوز الحد يُسجَّل في hints["aborted"] بدل إيقاف البحث
+    try:
+        return [(kind, decompress_bounded(kind, data))]
+    except DecompressionLimit as e:
+        hints.setdefault("aborted", []).append(str(e))
+        return []
+    except Exception:
+        return []
+
+
+def t_zlib(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    return _decompress("zlib", data, hints)
+
+
+def t_bz2(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    if not data.startswith(b"BZh"):
+        return []
+    return _decompress("bz2", data, hints)
+
+
+def t_lzma(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    if not (data.startswith(b"\xfd7zXZ") or data.startswith(b"\x5d\x00\x00")):
+        return []
+    return _decompress("lzma", data, hints)
+
+
+def t_zip(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    """
+    أعضاء أرشيف ZIP في الذاكرة (نمط الخيار 10)، ملفات .py أولاً، كل عضو
+    ضمن حدود limits (الحجم الكلي ونسبة التوسّع وعدد الأعضاء).
+    """
+    if not data.startswith(b"PK\x03\x04"):
+        return []
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(data))
+    except (zipfile.BadZipFile, ValueError):
+        return []
+    limits = current_limits()
+    out, total = [], 0
+    with zf:
+        members = [info for info in zf.infolist() if not info.is_dir()][:limits.max_members]
+        members.sort(key=lambda info: not info.filename.lower().endswith((".py", ".pyw")))
+        for info in members:
+            parts = []
+            try:
+                with zf.open(info) as member:
+                    for chunk in iter(lambda: member.read(CHUNK_SIZE), b""):
+                        parts.append(chunk)
+                        total += len(chunk)
+                        check("zip", total, info.compress_size, limits)
+            except DecompressionLimit as e:
+                hints.setdefault("aborted", []).append(str(e))
+                break
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError, OSError, EOFError):
+                continue  # عضو مشفّر أو تالف
+            out.append((f"zip:{info.filename}", b"".join(parts)))
+    return out
+
+
+def t_marshal(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    # marshal المفسّر أولاً، ثم القارئ المستقل عن الإصدار (عينات من 3.x أخرى)
+    try:
+        obj = marshal.loads(data)
+    except Exception:
+        try:
+            obj = pymarshal.loads(data)
+        except Exception:
+            return []
+    if isinstance(obj, str):
+        obj = obj.encode("utf-8", errors="surrogatepass")
+    return [("marshal", obj)]
+
+
+def t_xor(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    # مفاتيح التلميح (_loader_key_stub = N) تُجرَّب دائماً، ثم أفضل مفتاح مسترجَع آلياً
+    out = []
+    keys = hints.get("xor_keys", ())
+    for key in keys:
+        out.append((f"xor:{key}", data.translate(xor_table(key))))
+    found = best_xor(data)
+    if found and not (len(found.key) == 1 and found.key[0] in keys):
+        label = f"xor:{found.key[0]}" if len(found.key) == 1 else f"xor:0x{found.key.hex()}"
+        out.append((label, found.plaintext))
+    return out
+
+
+def t_fold(data: bytes, hints: dict) -> List[Tuple[str, object]]:
+    """وسائط exec/eval/compile/marshal.loads مطويّة من الـ AST بلا تشغيل (انظر fold.py)."""
+    folded = hints.get("folded")
+    return folded if folded is not None else fold_outputs(data)
+
+
+# ترتيب العقد هنا هو ترتيب التوسيع عند تساوي الأولوية
+TRANSFORMS: Dict[str, TransformFn] = {
+    "zlib": t_zlib,
+    "bz2": t_bz2,
+    "lzma": t_lzma,
+    "marshal": t_marshal,
+    "zip": t_zip,
+    "fold": t_fold,
+    "base64": t_base64,
+    "base16": t_base16,
+    "literal": t_literal,
+    "reverse": t_reverse,
+    "xor": t_xor,
+}
+
+
+def collect_hints(source: bytes) -> dict:
+    """تلميحات من المصدر الأصلي تحتاجها بعض العقد (مثل مفاتيح xor)."""
+    keys = []
+    for m in XOR_KEY_RE.finditer(source):
+        k = int(m.group(1))
+        if 0 < k < 256 and k not in keys:
+            keys.append(k)
+    return {"xor_keys": keys}
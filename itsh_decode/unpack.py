@@ -0,0 +1,365 @@
+"""
+unpack.py
+فك متدفّق لحاويات الضغط المتداخلة (الخيار 9): يتعرّف على النوع من الـ magic
+bytes (gzip، bz2، xz، lzma، zlib، zip، tar) ويفك على دفعات ثابتة الحجم
+مباشرة إلى القرص، ثم يعيد الفحص على كل ناتج حتى يصل إلى ملفات ليست حاويات.
+الذاكرة المستخدمة لا تعتمد على حجم الملف، وكل فك ضغط يمر عبر حدود limits.
+
+unzip يفتح أرشيف zip من الذاكرة أو القرص ويستخرج أعضاءه بالتوازي (threads؛
+zlib يحرر الـ GIL)، ويفك أرشيفات zip المتداخلة في نفس المرور، ضمن حد عدد
+الأعضاء ومجموع الحجم (الخيار 10).
+
+    python -m itsh_decode.unpack archive.tar.gz [-o out_dir] [--max-depth 8]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from .limits import DecompressionLimit, Limits, check, current_limits
+from .sinks import numbered, unique_path
+from .stream import CHUNK_SIZE, TRUNCATED, iter_decompress, write_chunks
+
+MAX_DEPTH = 8
+HEAD_BYTES = 512
+ZIP_WORKERS = min(8, os.cpu_count() or 1)
+ZIP_MAGICS = (b"PK\x03\x04", b"PK\x05\x06")
+# الحاويات التي يُفك محتواها كتدفق واحد، والامتداد الذي يُحذف من اسم الناتج
+STREAM_KINDS = {"gzip": (".gz", ".gzip", ".tgz"), "bz2": (".bz2", ".tbz2", ".tbz"),
+                "xz": (".xz", ".txz"), "lzma": (".lzma",), "zlib": (".z", ".zz", ".zlib")}
+
+
+class Unpacked(NamedTuple):
+    path: str
+    chain: Tuple[str, ...]  # أنواع الحاويات من الملف الأصلي حتى هذا الناتج
+    truncated: bool = False
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Container kind from the first HEAD_BYTES of a file, or None."""
+    if head.startswith(b"\x1f\x8b"):
+        return "gzip"
+    if head[:3] == b"BZh" and head[3:4].isdigit():
+        return "bz2"
+    if head.startswith(b"\xfd7zXZ\x00"):
+        return "xz"
+    if head.startswith(ZIP_MAGICS):
+        return "zip"
+    if head[257:262] == b"ustar":
+        return "tar"
+    if head.startswith(b"\x5d\x00\x00"):
+        return "lzma"
+    if len(head) >= 2 and head[0] == 0x78 and (head[0] * 256 + head[1]) % 31 == 0:
+        return "zlib"
+    return None
+
+
+def _sniff_file(path: str) -> Optional[str]:
+    with open(path, "rb") as f:
+        return sniff(f.read(HEAD_BYTES))
+
+
+def _stream_name(path: str, kind: str) -> str:
+    base = os.path.basename(path)
+    stem, ext = os.path.splitext(base)
+    if ext.lower() in (".tgz", ".tbz2", ".tbz", ".txz"):
+        return stem + ".tar"
+    if ext.lower() in STREAM_KINDS[kind] and stem:
+        return stem
+    return base + ".out"
+
+
+def _safe_member_path(root: str, name: str) -> Optional[str]:
+    # لا مسارات مطلقة ولا .. (zip slip)
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        return None
+    return os.path.join(root, *parts)
+
+
+def _iter_bounded(f: BinaryIO, kind: str, consumed: int) -> Iterator[bytes]:
+    # عضو zip/tar: zipfile يفك داخلياً، فنطبّق الحدود على الناتج مقابل الحجم المضغوط
+    limits = current_limits()
+    produced = 0
+    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+        produced += len(chunk)
+        check(kind, produced, consumed, limits)
+        yield chunk
+
+
+def _write_member(f: BinaryIO, kind: str, consumed: int, out_path: str) -> Tuple[str, bool]:
+    """يكتب العضو ويرجع (path, truncated)؛ المبتور عند الحد يبقى جزؤه المكتوب باسم ينتهي بـ TRUNCATED."""
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with open(out_path, "wb") as out:
+        try:
+            for chunk in _iter_bounded(f, kind, consumed):
+                out.write(chunk)
+        except DecompressionLimit:
+            truncated = True
+        else:
+            truncated = False
+    if not truncated:
+        return out_path, False
+    final = unique_path(out_path + TRUNCATED)
+    os.replace(out_path, final)
+    return final, True
+
+
+def _unpack_stream(path: str, kind: str, out_dir: str) -> List[Tuple[str, bool]]:
+    out_path = unique_path(os.path.join(out_dir, _stream_name(path, kind)))
+    with open(path, "rb") as f:
+        chunks = iter(lambda: f.read(CHUNK_SIZE), b"")
+        try:
+            write_chunks(iter_decompress(kind, chunks, multistream=True), out_path)
+        except DecompressionLimit:
+            truncated = unique_path(out_path + TRUNCATED)
+            os.replace(out_path, truncated)
+            return [(truncated, True)]
+        except Exception:
+            # magic مطابق صدفةً أو ملف تالف: يبقى الأصل كما هو
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            raise
+    return [(out_path, False)]
+
+
+class ZipExtraction(NamedTuple):
+    files: List[Tuple[str, bool]]   # (path, truncated)
+    skipped: List[Tuple[str, str]]  # (member, reason)
+
+
+class _ZipExtractor:
+    """حالة unzip المشتركة بين الـ threads: العدّادات، الأسماء المحجوزة، والمهام المعلّقة."""
+
+    def __init__(self, pool: ThreadPoolExecutor, limits: Limits, max_depth: int):
+        self.pool = pool
+        self.limits = limits
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.members = 0
+        self.total = 0
+        self.stopped: Optional[str] = None
+        self.reserved = set()
+        self.files: List[Tuple[str, bool]] = []
+        self.skipped: List[Tuple[str, str]] = []
+
+    def add_archive(self, zf: zipfile.ZipFile, root: str, depth: int) -> None:
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            with self.lock:
+                if not self.stopped and self.members >= self.limits.max_members:
+                    self.stopped = f"member limit ({self.limits.max_members})"
+                if self.stopped:
+                    self.skipped.append((info.filename, self.stopped))
+                    continue
+                self.members += 1
+            target = _safe_member_path(root, info.filename)
+            if target is None:
+                with self.lock:
+                    self.skipped.append((info.filename, "unsafe path"))
+                continue
+            self.pending.append(self.pool.submit(self._member, zf, info, self._reserve(target), depth))
+
+    def _reserve(self, path: str) -> str:
+        # unique_path لا يكفي: عضوان بنفس الاسم قد يُكتبان في نفس اللحظة
+        d, base = os.path.split(path)
+        with self.lock:
+            candidate, n = path, 0
+            while candidate in self.reserved or os.path.exists(candidate):
+                n += 1
+                candidate = os.path.join(d, numbered(base, n))
+            self.reserved.add(candidate)
+        return candidate
+
+    def _count(self, n: int, info: zipfile.ZipInfo) -> None:
+        with self.lock:
+            self.total += n
+            over = self.total > self.limits.max_output
+            if over and not self.stopped:
+                self.stopped = f"total size limit ({self.limits.max_output} bytes)"
+            total = self.total
+        if over:
+            raise DecompressionLimit("zip", f"archive total over {self.limits.max_output} bytes",
+                                     total, info.compress_size)
+
+    def _member(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, target: str, depth: int) -> None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        nested, parts, truncated = False, [], False
+        try:
+            with zf.open(info) as member:
+                chunk = member.read(CHUNK_SIZE)
+                # zip داخل zip: يبقى في الذاكرة ويُفك في نفس المرور بدل كتابته
+                nested = depth + 1 < self.max_depth and chunk.startswith(ZIP_MAGICS)
+                out = None if nested else open(target, "wb")
+                produced = 0
+                try:
+                    while chunk:
+                        produced += len(chunk)
+                        check("zip", produced, info.compress_size, self.limits)
+                        self._count(len(chunk), info)
+                        if out is None:
+                            parts.append(chunk)
+                        else:
+                            out.write(chunk)
+                        chunk = member.read(CHUNK_SIZE)
+                except DecompressionLimit:
+                    truncated = True
+                finally:
+                    if out is not None:
+                        out.close()
+        except (zipfile.BadZipFile, RuntimeError, NotImplementedError, OSError, EOFError) as e:
+            # عضو مشفّر أو بطريقة ضغط غير مدعومة أو تالف: نتخطاه ونكمل الباقي
+            if os.path.exists(target):
+                os.remove(target)
+            with self.lock:
+                self.skipped.append((info.filename, str(e)))
+            return
+        if nested and not truncated:
+            data = b"".join(parts)
+            try:
+                inner = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                pass
+            else:
+                self.add_archive(inner, target + ".d", depth + 1)
+                return
+        if nested:
+            with open(target, "wb") as out:
+                out.write(b"".join(parts))
+        if truncated:
+            final = unique_path(target + TRUNCATED)
+            os.replace(target, final)
+            target = final
+        with self.lock:
+            self.files.append((target, truncated))
+
+
+def unzip(source: Union[bytes, str], out_dir: str, workers: Optional[int] = None,
+          max_depth: int = MAX_DEPTH, limits: Optional[Limits] = None) -> ZipExtraction:
+    """
+    Extract a zip archive given as bytes (opened from memory, never written
+    to a temp file) or a path into out_dir, members in parallel threads.
+    Zip members that are themselves zip archives are unpacked into
+    <member>.d/ in the same pass, up to max_depth levels. limits.max_members
+    caps the member count and limits.max_output the total size across all
+    levels; members past a limit are listed in skipped, a member cut off
+    mid-write is kept as <name>_truncated. Raises zipfile.BadZipFile if
+    source is not a zip archive.
+    """
+    limits = limits or current_limits()
+    zf = zipfile.ZipFile(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    with zf, ThreadPoolExecutor(workers or ZIP_WORKERS) as pool:
+        extractor = _ZipExtractor(pool, limits, max_depth)
+        extractor.add_archive(zf, out_dir, 0)
+        # المهام تضيف مهام الأرشيفات المتداخلة قبل أن تنتهي، فتفريغ الطابور يكفي
+        while extractor.pending:
+            extractor.pending.popleft().result()
+    return ZipExtraction(sorted(extractor.files), extractor.skipped)
+
+
+def _unpack_zip(path: str, out_dir: str) -> List[Tuple[str, bool]]:
+    root = unique_path(os.path.join(out_dir, os.path.basename(path) + ".d"))
+    # المتداخل (zip أو غيره) تتولاه حلقة unpack
+    return unzip(path, root, max_depth=1).files
+
+
+def _unpack_tar(path: str, out_dir: str) -> List[Tuple[str, bool]]:
+    root = unique_path(os.path.join(out_dir, os.path.basename(path) + ".d"))
+    out = []
+    # "r|": قراءة متدفّقة بدون seek ولا فهرس للأعضاء في الذاكرة
+    with tarfile.open(path, "r|") as tf:
+        try:
+            for member in tf:
+                target = _safe_member_path(root, member.name) if member.isfile() else None
+                if target is None:
+                    continue
+                target = unique_path(target)
+                out.append(_write_member(tf.extractfile(member), "tar", member.size, target))
+        except (tarfile.TarError, EOFError, OSError):
+            # tar مقطوع: نحتفظ بالأعضاء التي اكتملت
+            if not out:
+                raise
+    return out
+
+
+def unpack(path: str, out_dir: Optional[str] = None, max_depth: int = MAX_DEPTH,
+           keep_intermediate: bool = False) -> List[Unpacked]:
+    """
+    Unpack path and every container nested inside it into out_dir (default:
+    next to path). Returns the leaf files. Stream containers
+    (gzip/bz2/xz/lzma/zlib) become one file with the extension dropped;
+    zip/tar members go under <name>.d/. Intermediate layers are removed
+    unless keep_intermediate; the input itself is never touched. An empty
+    list means path is not a recognised container.
+    """
+    out_dir = out_dir or os.path.dirname(os.path.abspath(path))
+    os.makedirs(out_dir, exist_ok=True)
+    leaves = []
+    stack = [(path, (), 0)]
+    while stack:
+        current, chain, depth = stack.pop()
+        kind = _sniff_file(current) if depth < max_depth else None
+        produced = None
+        if kind:
+            # النواتج المتداخلة بجانب الحاوية التي خرجت منها
+            where = out_dir if depth == 0 else os.path.dirname(current)
+            try:
+                if kind == "zip":
+                    produced = _unpack_zip(current, where)
+                elif kind == "tar":
+                    produced = _unpack_tar(current, where)
+                else:
+                    produced = _unpack_stream(current, kind, where)
+            except Exception:
+                produced = None
+        if produced is None:
+            if depth:
+                leaves.append(Unpacked(current, chain))
+            continue
+        if depth and not keep_intermediate:
+            os.remove(current)
+        for out_path, truncated in reversed(produced):
+            if truncated:
+                leaves.append(Unpacked(out_path, chain + (kind,), True))
+            else:
+                stack.append((out_path, chain + (kind,), depth + 1))
+    return leaves
+
+
+def format_result(leaves: List[Unpacked]) -> str:
+    lines = []
+    for leaf in leaves:
+        mark = "  (مبتور عند حد فك الضغط)" if leaf.truncated else ""
+        lines.append(f"{' -> '.join(leaf.chain)}\t{leaf.path}{mark}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="itsh_decode.unpack",
+                                     description="streaming unpack of nested gzip/bz2/xz/lzma/zlib/zip/tar")
+    parser.add_argument("path")
+    parser.add_argument("-o", "--out-dir", help="output directory (default: next to the input)")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH)
+    parser.add_argument("--keep-intermediate", action="store_true", help="keep every intermediate layer")
+    args = parser.parse_args(argv)
+    leaves = unpack(args.path, args.out_dir, args.max_depth, args.keep_intermediate)
+    if not leaves:
+        print(f"not a recognised container: {args.path}", file=sys.stderr)
+        return 1
+    print(format_result(leaves))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+"""
+watch.py
+وضع المراقبة: عملية تعمل باستمرار على مجلد أو أكثر، وتفك كل ملف .py أو blob
+جديد أو متغيّر بمجرد اكتمال كتابته، بدل إعادة تشغيل الأداة وكتابة المسارات
+يدوياً في كل مرة.
+
+- inotify (لينكس، عبر ctypes) يبلّغ عن الملفات عند إغلاقها بعد الكتابة أو
+  نقلها إلى المجلد؛ وعلى الأنظمة الأخرى (أو مع --poll) فحص دوري يبلّغ عن
+  الملف بعد أن يثبت حجمه ووقت تعديله لدورة كاملة.
+- عمليات فك دائمة (ProcessPoolExecutor واحد طوال التشغيل) تنفّذ منطق
+  الخيار 1 (layered.decode_file_entries)، فلا يُدفع ثمن بدء المفسّر لكل عينة.
+- النتائج تُلحق بمخزن متدحرج في مجلد المخرجات: أرشيفات decoded_NNNN.zip
+  تُغلق بعد كل دفعة (فتبقى صالحة لو أوقفت العملية) ويُبدأ أرشيف جديد عند
+  ROLL_BYTES، وسطر JSON لكل عينة في results.jsonl.
+- state.json يحفظ sha256 كل ملف فُك، فالملفات التي لم يتغير محتواها لا تُفك
+  مرة ثانية ولو أُعيد تشغيل المراقبة.
+
+    python -m itsh_decode watch drops/ -o watch_out/ -j 4
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import signal
+import struct
+import sys
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from .layered import EntryData, decode_file_entries, layer_labels, write_entries
+from .similarity import final_layer, open_index as open_similarity
+from .stream import TRUNCATED
+
+WATCH_SUFFIXES = (".py", ".pyw", ".txt", ".b64", ".bin", ".dat", ".zlib", ".bz2", ".xz", ".marshal")
+DEFAULT_INTERVAL = 1.0
+ROLL_BYTES = 256 * 1024 * 1024  # حجم الأرشيف قبل بدء أرشيف جديد
+STATE_FILE = "state.json"
+RESULTS_FILE = "results.jsonl"
+
+# inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+_EVENT = struct.Struct("iIII")
+
+
+class Signature(NamedTuple):
+    size: int
+    mtime_ns: int
+
+
+def signature(path: str) -> Optional[Signature]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return Signature(st.st_size, st.st_mtime_ns)
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def is_candidate(path: str, suffixes: Tuple[str, ...] = WATCH_SUFFIXES) -> bool:
+    name = os.path.basename(path).lower()
+    return name.endswith(suffixes) and not name.startswith(".") and ".auto_decoded" not in name
+
+
+def iter_files(roots: Iterable[str], skip: Optional[str] = None) -> Iterator[str]:
+    """كل ملف مرشّح تحت roots، مع تخطي مجلد المخرجات skip إن كان داخلها."""
+    for root in roots:
+        if os.path.isfile(root):
+            yield root
+            continue
+        for d, dirs, files in os.walk(root):
+            if skip:
+                dirs[:] = [x for x in dirs if os.path.abspath(os.path.join(d, x)) != skip]
+            for fn in sorted(files):
+                if is_candidate(fn):
+                    yield os.path.join(d, fn)
+
+
+class PollingWatcher:
+    """
+    Snapshot (size, mtime) of every candidate each interval. A path is
+    reported once its signature has been stable for one full interval, so
+    files still being copied in are not decoded half-written.
+    """
+
+    def __init__(self, roots: List[str], interval: float = DEFAULT_INTERVAL, skip: Optional[str] = None):
+        self.roots = roots
+        self.interval = interval
+        self.skip = skip
+        self.prev: Dict[str, Signature] = {}
+        self.reported: Dict[str, Signature] = {}
+        self.next_scan = 0.0
+
+    def changes(self, timeout: float) -> List[str]:
+        wait_for = self.next_scan - time.monotonic()
+        if wait_for > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait_for))
+        self.next_scan = time.monotonic() + self.interval
+        snap = {}
+        for path in iter_files(self.roots, self.skip):
+            sig = signature(path)
+            if sig is not None:
+                snap[path] = sig
+        out = [p for p, sig in snap.items() if self.prev.get(p) == sig and self.reported.get(p) != sig]
+        for p in out:
+            self.reported[p] = snap[p]
+        self.prev = snap
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify through ctypes: IN_CLOSE_WRITE / IN_MOVED_TO report
+    finished files; new subdirectories are watched as they appear. A queue
+    overflow falls back to a full rescan (already decoded files are then
+    dropped by the state check).
+    """
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, roots: List[str], skip: Optional[str] = None):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.skip = skip
+        self.dirs: Dict[int, str] = {}
+        for root in roots:
+            self._watch_tree(root if os.path.isdir(root) else os.path.dirname(os.path.abspath(root)))
+
+    def _watch_tree(self, top: str) -> List[str]:
+        """يراقب top وكل مجلداته الفرعية، ويعيد الملفات الموجودة فيها (قد تسبق المراقبة)."""
+        found = []
+        for d, dirs, files in os.walk(top):
+            if self.skip:
+                dirs[:] = [x for x in dirs if os.path.abspath(os.path.join(d, x)) != self.skip]
+            wd = self._add(self.fd, os.fsencode(d), self.MASK)
+            if wd >= 0:
+                self.dirs[wd] = d
+            found.extend(os.path.join(d, fn) for fn in files if is_candidate(fn))
+        return found
+
+    def changes(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            buf = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        out = []
+        pos = 0
+        while pos + _EVENT.size <= len(buf):
+            wd, mask, _, length = _EVENT.unpack_from(buf, pos)
+            name = buf[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+            pos += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                out.extend(iter_files(self.roots, self.skip))
+                continue
+            if wd not in self.dirs or not name:
+                continue
+            path = os.path.join(self.dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.abspath(path) != self.skip:
+                    out.extend(self._watch_tree(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_candidate(path):
+                out.append(path)
+        return list(dict.fromkeys(out))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def make_watcher(roots: List[str], interval: float = DEFAULT_INTERVAL, poll: bool = False,
+                 skip: Optional[str] = None):
+    """InotifyWatcher على لينكس، وإلا (أو مع poll) PollingWatcher."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots, skip)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots, interval, skip)
+
+
+class RollingStore:
+    """
+    Append decoded entries to out_dir/decoded_NNNN.zip. Each batch opens
+    the current archive in append mode and closes it again, so the archive
+    is valid between batches; a new archive is started past roll_bytes or
+    when a re-decoded file would repeat an entry name.
+    """
+
+    def __init__(self, out_dir: str, roll_bytes: int = ROLL_BYTES):
+        self.out_dir = out_dir
+        self.roll_bytes = roll_bytes
+        os.makedirs(out_dir, exist_ok=True)
+        existing = sorted(fn for fn in os.listdir(out_dir) if fn.startswith("decoded_") and fn.endswith(".zip"))
+        self.seq = int(existing[-1][8:12]) if existing else 1
+        self.names: Set[str] = set()
+        if existing:
+            try:
+                with zipfile.ZipFile(self.current) as z:
+                    self.names = set(z.namelist())
+            except (OSError, zipfile.BadZipFile):
+                self._roll()
+
+    @property
+    def current(self) -> str:
+        return os.path.join(self.out_dir, f"decoded_{self.seq:04d}.zip")
+
+    def _roll(self) -> None:
+        self.seq += 1
+        self.names = set()
+
+    def write(self, batch: List[List[Tuple[str, EntryData]]]) -> str:
+        """يكتب مدخلات عدة ملفات في الأرشيف الحالي ويعيد مساره."""
+        if os.path.exists(self.current) and os.path.getsize(self.current) >= self.roll_bytes:
+            self._roll()
+        if any(name in self.names for entries in batch for name, _ in entries):
+            self._roll()
+        with zipfile.ZipFile(self.current, "a", compression=zipfile.ZIP_DEFLATED) as z:
+            for entries in batch:
+                write_entries(z, entries)
+                self.names.update(name for name, _ in entries)
+        return self.current
+
+
+class WatchState:
+    """path -> (size, mtime_ns, sha256) لكل ملف فُك، محفوظ في out_dir/state.json."""
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, STATE_FILE)
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.files: Dict[str, list] = json.load(f)
+        except (OSError, ValueError):
+            self.files = {}
+
+    def is_new(self, path: str, sig: Signature) -> Tuple[bool, str]:
+        """(يحتاج فكاً؟, sha256). التوقيع المطابق يُغني عن قراءة الملف."""
+        old = self.files.get(path)
+        if old and Signature(old[0], old[1]) == sig:
+            return False, old[2]
+        digest = file_sha256(path)
+        if old and old[2] == digest:
+            self.files[path] = [sig.size, sig.mtime_ns, digest]
+            return False, digest
+        return True, digest
+
+    def record(self, path: str, sig: Signature, digest: str) -> None:
+        self.files[path] = [sig.size, sig.mtime_ns, digest]
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.files, f)
+        os.replace(tmp, self.path)
+
+
+def _ignore_sigint() -> None:
+    # Ctrl+C يصل للعملية الرئيسية فقط، وهي تنتظر العينات الجارية قبل الخروج
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _root_base(path: str, roots: List[str]) -> str:
+    # نفس تسمية الخيار 1: المجلد المراقَب يظهر كأول مكوّن في أسماء المدخلات
+    ap = os.path.abspath(path)
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isdir(root) and ap.startswith(root + os.sep):
+            return os.path.dirname(root)
+    return ""
+
+
+def watch(roots: List[str], out_dir: str, workers: int = 1, interval: float = DEFAULT_INTERVAL,
+          poll: bool = False, cache_path: Optional[str] = None, telemetry: Optional[str] = None,
+          once: bool = False, roll_bytes: int = ROLL_BYTES) -> int:
+    """
+    Decode every new or changed candidate under roots until interrupted
+    (or, with once, until the files present at start are done). Returns
+    the number of files decoded. Progress lines go to stdout, one JSON
+    line per file to out_dir/results.jsonl. With $ITSH_SIMILARITY each
+    final layer is fingerprinted and the row carries its cluster id.
+    """
+    out_dir = os.path.abspath(out_dir)
+    roots = [os.path.abspath(r) for r in roots]
+    store = RollingStore(out_dir, roll_bytes)
+    state = WatchState(out_dir)
+    watcher = None if once else make_watcher(roots, interval, poll, out_dir)
+    similar = open_similarity()
+    pending: Dict[Future, Tuple[str, Signature, str, float]] = {}
+    # ملفات تغيّرت أثناء فكها: تُعاد بعد انتهاء المهمة الجارية بدل أن يضيع التغيير
+    dirty: Set[str] = set()
+    decoded = 0
+
+    def submit(paths: Iterable[str]) -> None:
+        inflight = {job[0] for job in pending.values()}
+        for path in paths:
+            sig = signature(path)
+            if sig is None or os.path.abspath(path).startswith(out_dir + os.sep):
+                continue
+            if path in inflight:
+                dirty.add(path)
+                continue
+            try:
+                new, digest = state.is_new(path, sig)
+            except OSError:
+                continue
+            if not new:
+                continue
+            print(f"[بدء] {path}")
+            fut = pool.submit(decode_file_entries, path, _root_base(path, roots), cache_path, telemetry)
+            pending[fut] = (path, sig, digest, time.time())
+            inflight.add(path)
+
+    def collect(timeout: float) -> None:
+        nonlocal decoded
+        if not pending:
+            return
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        batch, rows = [], []
+        for fut in done:
+            path, sig, digest, t0 = pending.pop(fut)
+            row = {"ts": time.time(), "path": path, "sha256": digest, "seconds": round(time.time() - t0, 3)}
+            try:
+                entries = fut.result()
+            except Exception as e:
+                # لا يُسجَّل في state: يُعاد فكه في التشغيل التالي
+                row.update(status="error", error=str(e))
+            else:
+                state.record(path, sig, digest)
+                labels = layer_labels(entries)
+                status = "ok" if labels else "skip"
+                if labels and labels[-1].endswith(TRUNCATED):
+                    status = "truncated"
+                row.update(status=status, chain="->".join(labels))
+                final = final_layer(entries)
+                if similar is not None and final is not None:
+                    row["cluster"] = similar.add(path, final)[1]
+                batch.append(entries)
+            rows.append(row)
+        if batch:
+            archive = store.write(batch)
+            for row in rows:
+                if row["status"] != "error":
+                    row["archive"] = os.path.basename(archive)
+        with open(os.path.join(out_dir, RESULTS_FILE), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                print(f"[{row['status']}] {row['path']} {row.get('chain') or row.get('error', '')}")
+        state.save()
+        decoded += len(rows)
+        again = dirty.intersection(row["path"] for row in rows)
+        if again:
+            dirty.difference_update(again)
+            submit(sorted(again))
+
+    pool = ProcessPoolExecutor(max_workers=max(1, workers), initializer=_ignore_sigint)
+    try:
+        submit(iter_files(roots, out_dir))
+        if once:
+            while pending:
+                collect(None)
+            return decoded
+        print(f"[مراقبة] {', '.join(roots)} ({type(watcher).__name__}) -> {out_dir}  (Ctrl+C للإيقاف)")
+        while True:
+            submit(watcher.changes(0.05 if pending else interval))
+            collect(0)
+    except KeyboardInterrupt:
+        print("\n[إيقاف] انتظار العينات الجارية...")
+        while pending:
+            collect(None)
+        return decoded
+    finally:
+        pool.shutdown()
+        if watcher is not None:
+            watcher.close()
@@ -0,0 +1,205 @@
+"""
+xorkey.py
+استرجاع مفتاح xor تلقائياً (بايت واحد أو مفتاح قصير متكرر) بدون تلميح
+_loader_key_stub في المصدر.
+
+كل العمل الثقيل في C: هستوغرام البايتات عبر Counter، وطول المفتاح من
+معدل التطابق (coincidence) بين البافر ونسخته المزاحة، والفك نفسه عبر
+bytes.translate لكل عمود data[i::L]. فك payload بعدة ميغابايت يأخذ
+أجزاء من الثانية.
+
+القبول (best_xor) لا يكتفي بأن الناتج يُترجم: المطلوب كثافة tokens بايثون
+خارج التعليقات، وكود أكثر من التعليقات، ودرجة أعلى بوضوح من المدخل نفسه
+بلا xor (المفتاح 0)؛ وإلا يبقى النص الإنجليزي العادي "مفكوكاً" بمفتاح يحوّل
+المسافات إلى #.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+MAX_KEY_LEN = 16
+SAMPLE_SIZE = 64 * 1024
+COMPILE_MAX = 1024 * 1024  # الأكبر يُقيَّم بالـ tokens فقط
+# شروط القبول في best_xor: نص يُترجم وحده لا يكفي (مفتاح يحوّل المسافات إلى #
+# يجعل أي نص إنجليزي "كوداً" من اسم وتعليق)
+MIN_TOKENS_PER_KB = 4.0   # كثافة tokens بايثون خارج التعليقات
+MIN_CODE_RATIO = 0.3      # نسبة البايتات (بلا مسافات) خارج التعليقات
+MIN_GAIN = 0.25           # فارق الدرجة المطلوب فوق المدخل نفسه بلا xor
+
+_PRINTABLE = bytes(range(32, 127)) + b"\t\r\n"
+# وزن كل بايت ناتج عند حلّ عمود واحد: الأحرف والمسافات هي غالب كود بايثون
+_WEIGHT = [0.0] * 256
+for _b in _PRINTABLE:
+    _WEIGHT[_b] = 1.0
+for _b in b" \nabcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_":
+    _WEIGHT[_b] = 2.0
+for _b in set(range(256)) - set(_PRINTABLE):
+    _WEIGHT[_b] = -4.0
+
+_PY_TOKENS = (b"import ", b"def ", b"print(", b"return", b"self", b" = ", b"\n    ", b"):", b"exec(",
+              b"from ", b"class ", b"if ", b"for ", b"lambda")
+
+_COMMENT_RE = re.compile(rb"#[^\n]*")
+_SPACE = b" \t\r\n"
+
+_TABLES = {}
+
+
+def xor_table(key_byte: int) -> bytes:
+    table = _TABLES.get(key_byte)
+    if table is None:
+        table = _TABLES[key_byte] = bytes(b ^ key_byte for b in range(256))
+    return table
+
+
+def xor_bytes(data: bytes, key: bytes) -> bytes:
+    """data xor مفتاح متكرر، عموداً عموداً عبر translate."""
+    if len(key) == 1:
+        return data.translate(xor_table(key[0]))
+    out = bytearray(len(data))
+    for i, k in enumerate(key):
+        out[i::len(key)] = data[i::len(key)].translate(xor_table(k))
+    return bytes(out)
+
+
+def coincidence(data: bytes, shift: int) -> float:
+    """نسبة المواضع التي data[i] == data[i + shift] (عبر xor لأعداد كبيرة)."""
+    n = len(data) - shift
+    if n <= 0:
+        return 0.0
+    x = int.from_bytes(data[:n], "big") ^ int.from_bytes(data[shift:], "big")
+    return x.to_bytes(n, "big").count(0) / n
+
+
+def key_lengths(sample: bytes, max_len: int = MAX_KEY_LEN, top: int = 3) -> List[int]:
+    """
+    Likely repeating-key lengths, best first. Plaintext bytes repeat far more
+    often than random ones, so shifting by the key period (or a multiple of
+    it) gives a visibly higher coincidence rate. Multiples of a better
+    shorter period are dropped.
+    """
+    rates = {n: coincidence(sample, n) for n in range(1, min(max_len, len(sample) // 4) + 1)}
+    if not rates:
+        return [1]
+    best = max(rates.values())
+    # أقصر طول قريب من الأفضل يكفي؛ مضاعفاته تعطي نفس المفتاح مكرراً
+    near = sorted(n for n in rates if rates[n] >= 0.9 * best)
+    rest = sorted((n for n in rates if rates[n] < 0.9 * best), key=rates.get, reverse=True)
+    picked: List[int] = []
+    for n in near + rest:
+        if any(n % p == 0 for p in picked):
+            continue
+        picked.append(n)
+        if len(picked) >= top:
+            break
+    return picked if 1 in picked else picked + [1]
+
+
+def _column_keys(column: bytes, top: int = 1) -> List[int]:
+    """أفضل قيم بايت المفتاح لعمود واحد حسب أوزان الناتج."""
+    items = list(Counter(column).items())
+    scores = []
+    for k in range(256):
+        scores.append((sum(c * _WEIGHT[v ^ k] for v, c in items), k))
+    scores.sort(reverse=True)
+    return [k for _, k in scores[:top]]
+
+
+def _shortest_period(key: bytes) -> bytes:
+    for n in range(1, len(key)):
+        if len(key) % n == 0 and key == key[:n] * (len(key) // n):
+            return key[:n]
+    return key
+
+
+class XorCandidate(NamedTuple):
+    key: bytes
+    score: float
+    printable: float
+    tokens: int         # خارج التعليقات
+    compiles: bool
+    plaintext: bytes
+    code_ratio: float = 1.0
+
+
+def printable_ratio(data: bytes) -> float:
+    return 1.0 - len(data.translate(None, _PRINTABLE)) / len(data) if data else 0.0
+
+
+def score_plaintext(plain: bytes) -> tuple:
+    """(score, printable, tokens, compiles, code_ratio) لناتج مرشّح؛ tokens تُعدّ خارج التعليقات."""
+    sample = plain[:SAMPLE_SIZE]
+    printable = printable_ratio(sample)
+    code = _COMMENT_RE.sub(b"", sample) if b"#" in sample else sample
+    dense = len(sample.translate(None, _SPACE))
+    code_ratio = len(code.translate(None, _SPACE)) / dense if dense else 0.0
+    tokens = sum(code.count(t) for t in _PY_TOKENS)
+    compiles = False
+    # تعليقات/نصوص UTF-8 (عربية مثلاً) تخفض النسبة دون أن يكون الناتج خاطئاً
+    if printable >= 0.75 and len(plain) <= COMPILE_MAX:
+        try:
+            compile(plain, "<xor>", "exec", dont_inherit=True)
+            compiles = True
+        except Exception:
+            pass
+    per_kb = tokens * 1024 / max(len(sample), 1)
+    score = printable + min(per_kb / 20.0, 1.0) * 0.5 + (1.0 if compiles else 0.0)
+    return score, printable, tokens, compiles, code_ratio
+
+
+def recover_xor(data: bytes, max_key_len: int = MAX_KEY_LEN, top: int = 5,
+                keys: Optional[List[bytes]] = None) -> List[XorCandidate]:
+    """
+    Candidate plaintexts of data under single-byte and short repeating xor
+    keys, best first, ranked by printable ratio, Python token density and
+    whether the result compiles. Extra keys (e.g. from a _loader_key_stub
+    hint) are scored alongside the recovered ones.
+    """
+    if not data:
+        return []
+    sample = data[:SAMPLE_SIZE]
+    tried = {}
+    for key in keys or ():
+        tried.setdefault(bytes(key), None)
+    for n in key_lengths(sample, max_key_len):
+        if n == 1:
+            for k in _column_keys(sample, top=3):
+                tried.setdefault(bytes([k]), None)
+        else:
+            key = bytes(_column_keys(sample[i::n])[0] for i in range(n))
+            tried.setdefault(_shortest_period(key), None)
+
+    # التقييم الكامل (tokens + compile) فقط لأفضل المرشحين على العيّنة
+    quick = sorted(tried, key=lambda k: printable_ratio(xor_bytes(sample, k)), reverse=True)[:top]
+    out = []
+    for key in quick:
+        plain = xor_bytes(data, key)
+        score, printable, tokens, compiles, code_ratio = score_plaintext(plain)
+        out.append(XorCandidate(key, score, printable, tokens, compiles, plain, code_ratio))
+    out.sort(key=lambda c: (c.score, -len(c.key)), reverse=True)
+    return out
+
+
+def plausible_python(candidate: XorCandidate, size: int) -> bool:
+    """كود بايثون فعلاً وليس نصاً يصادف أنه يُترجم: كثافة tokens خارج التعليقات."""
+    per_kb = candidate.tokens * 1024 / max(min(size, SAMPLE_SIZE), 1)
+    return per_kb >= MIN_TOKENS_PER_KB and candidate.code_ratio >= MIN_CODE_RATIO
+
+
+def best_xor(data: bytes, min_printable: float = 0.75, **kwargs) -> Optional[XorCandidate]:
+    """
+    The best candidate if it is convincing Python: printable, dense in
+    Python tokens outside comments, and clearly better than data itself
+    (the identity key) scored the same way. Otherwise None.
+    """
+    found = recover_xor(data, **kwargs)
+    if not found or not found[0].key.strip(b"\0"):
+        return None
+    best = found[0]
+    if best.printable < min_printable or not plausible_python(best, len(data)):
+        return None
+    baseline = score_plaintext(data)[0]
+    return best if best.score >= baseline + MIN_GAIN else None
@@ -105,13 +105,17 @@ def read_pyc_header(path):
     return {'magic': magic.hex(), 'raw_header': rest.hex()}
 
 def try_load_codeobj(path):
+    # الإصدار من MAGIC: marshal المفسّر إن طابق، وإلا القارئ المستقل عن الإصدار
+    from itsh_decode.pymarshal import load_any, version_from_magic
     try:
         with open(path, 'rb') as f:
             magic = f.read(4)
             header = f.read(12)
             data = f.read()
-        code = marshal.loads(data)
-        return {'ok': True, 'type': type(code).__name__, 'co_name': getattr(code, 'co_name', None), 'co_consts_len': len(getattr(code, 'co_consts', []))}
+        version = version_from_magic(magic)
+        code = load_any(data, version)
+        return {'ok': True, 'type': type(code).__name__, 'version': '%d.%d' % version if version else None,
+                'co_name': getattr(code, 'co_name', None), 'co_consts_len': len(getattr(code, 'co_consts', []))}
     except Exception as e:
         return {'ok': False, 'error': str(e)}
 